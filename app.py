@@ -1,10 +1,14 @@
 import os
 import json
+import atexit
+import socket
 from dotenv import load_dotenv, set_key
 import time
 import threading
-from datetime import datetime
-from flask import Flask, current_app, render_template, request, jsonify, redirect, url_for, flash, session
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from flask import Flask, Response, current_app, make_response, render_template, request, jsonify, redirect, url_for, flash, session, send_from_directory
 from flask import request
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
@@ -13,9 +17,14 @@ import pandas as pd
 import logging
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.events import (
+    EVENT_JOB_ADDED, EVENT_JOB_REMOVED, EVENT_JOB_MODIFIED, EVENT_JOB_SUBMITTED, EVENT_ALL_JOBS_REMOVED
+)
 import sqlite3
-from sqlalchemy import event
+from sqlalchemy import bindparam, event, inspect, text
 from sqlalchemy.engine import Engine
+from sqlalchemy.orm import aliased
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
@@ -28,11 +37,32 @@ load_dotenv(dotenv_path)
 # Import the existing WhatsApp sender
 from whatsapp_sender.sender import WhatsAppBulkSender
 from whatsapp_sender.config import CONFIG
+from whatsapp_sender.templating import MessageTemplate, build_context, render_in_batches
+from whatsapp_sender.retry import SendOutcome, SendResult, RetryPolicy, DeferredRetryQueue, classify_exception
+from whatsapp_sender.scheduling import FairShareScheduler
+from whatsapp_sender.metrics import REGISTRY, DB_FLUSH_SECONDS, QUEUE_DEPTH, ACTIVE_CAMPAIGNS, SESSIONS_ALIVE
+from whatsapp_sender.tracing import Tracer
+from whatsapp_sender.upload_cache import UPLOAD_CACHE
+from whatsapp_sender.recipients import read_table, normalize_columns, normalize_contacts
+from whatsapp_sender.phones import digits_only, normalize_phone, normalize_phones
+from whatsapp_sender.capping import parse_frequency_caps
+from whatsapp_sender.backup import (
+    write_backup, restore_backup as restore_ndjson_backup, is_backup_file, TOMBSTONE_TABLE, BACKUP_LOG_TABLE,
+    SEND_HISTORY_TABLE, TABLE_VERSION_TABLE, SEGMENT_MEMBER_TABLE, EXCLUDED_TABLES
+)
 
 # Global WhatsApp sender instance - singleton pattern
 whatsapp_sender = None
 _sender_lock = threading.Lock()
 
+# With SENDER_SOCKET set, the browser sessions, campaign runs and scheduler live in the sender daemon
+# (sender_daemon.py) and web workers reach them through sender operations over that socket, so the
+# web tier can run with any number of gunicorn workers. Unset, they live in this process as before.
+sender_rpc = None
+if CONFIG['sender_socket']:
+    from whatsapp_sender.rpc import RpcClient
+    sender_rpc = RpcClient(CONFIG['sender_socket'], timeout=float(CONFIG['sender_rpc_timeout']))
+
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 
@@ -41,7 +71,7 @@ app.secret_key = os.environ.get("SESSION_SECRET", "whatsapp-bulk-sender-secret-k
 CORS(app)
 
 # Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///'+os.path.join(app.instance_path, 'whatsapp_bulk.db')
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///'+os.path.join(app.instance_path, 'whatsapp_bulk.db'))
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
 db = SQLAlchemy(app)
@@ -56,10 +86,16 @@ def _set_sqlite_pragma(dbapi_connection, connection_record):
         cursor.close()
 
 # --- APScheduler Configuration ---
-jobstores = {'default': SQLAlchemyJobStore(url=app.config['SQLALCHEMY_DATABASE_URI'])}
-scheduler = BackgroundScheduler(jobstores=jobstores)
+# The live schedule is kept in memory and rebuilt from Campaign.scheduled_at at startup, so job
+# polling never competes with campaign progress writes for the SQLite lock. SCHEDULER_JOBSTORE=sqlalchemy
+# keeps a persistent job store instead, in its own database file.
+if CONFIG['scheduler_jobstore'] == 'sqlalchemy':
+    jobstores = {'default': SQLAlchemyJobStore(url='sqlite:///' + os.path.join(app.instance_path, 'scheduler_jobs.db'))}
+else:
+    jobstores = {'default': MemoryJobStore()}
+# Campaigns whose time passed while the app was down still run (once) when it comes back
+scheduler = BackgroundScheduler(jobstores=jobstores, job_defaults={'coalesce': True, 'misfire_grace_time': None})
 
-# --- ADD THIS CODE BLOCK ---
 def start_scheduler():
     """
     Starts the APScheduler, ensuring it only runs in the main process,
@@ -74,30 +110,21 @@ def start_scheduler():
         scheduler.start()
         app.logger.info("APScheduler started successfully.")
 
-# Call the function to start the scheduler
-start_scheduler()
-
 # Configuration
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {
-    'recipients': {'xlsx', 'xls'},
+    'recipients': {'xlsx', 'xls', 'csv', 'parquet'},
     'attachments': {'pdf', 'jpg', 'jpeg', 'png', 'gif', 'doc', 'docx', 'txt'}
 }
 
 # Ensure upload directory exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# Global variables for progress tracking
-current_progress = {
-    'is_active': False,
-    'current': 0,
-    'total': 0,
-    'logs': [],
-    'success_count': 0,
-    'failure_count': 0,
-    'start_time': None,
-    'end_time': None
-}
+# Progress tracking, one entry per campaign that has been dispatched
+campaign_progress = {}
+
+# Recipient statuses that count as sent, in the order the ticks advance
+SENT_STATUSES = ('sent', 'delivered', 'read')
 
 # Database Models
 class Customer(db.Model):
@@ -107,6 +134,17 @@ class Customer(db.Model):
     email = db.Column(db.String(120), nullable=True)
     status = db.Column(db.String(20), default='Opted In')
     created_at = db.Column(db.DateTime, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, index=True)
+    # Extra spreadsheet columns (JSON object), available as {placeholders} in campaign messages
+    custom_fields = db.Column(db.Text, nullable=True)
+
+    def get_custom_fields(self):
+        if not self.custom_fields:
+            return {}
+        try:
+            return json.loads(self.custom_fields)
+        except ValueError:
+            return {}
 
     def to_dict(self):
         return {
@@ -115,6 +153,7 @@ class Customer(db.Model):
             'phone': self.phone,
             'email': self.email or '',
             'status': self.status,
+            'custom_fields': self.get_custom_fields(),
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S')
         }
 
@@ -126,9 +165,15 @@ class Campaign(db.Model):
     status = db.Column(db.String(20), default='draft')
     created_at = db.Column(db.DateTime, default=datetime.now)
     scheduled_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, index=True)
     sent_count = db.Column(db.Integer, default=0)
     failed_count = db.Column(db.Integer, default=0)
-    # attachment_path=db.Column(db.String(100),nullable=True)
+    # Higher priority gets a proportionally larger share of the sessions while campaigns overlap
+    priority = db.Column(db.Integer, default=1)
+    deadline = db.Column(db.DateTime, nullable=True)
+    attachment_path = db.Column(db.String(255), nullable=True)
+    # Send the message once and forward it to recipients in batches (identical messages only)
+    broadcast = db.Column(db.Boolean, default=False)
 
     # CHANGED: Use back_populates to explicitly link to the 'campaign' attribute on the other model
     recipients = db.relationship(
@@ -152,10 +197,17 @@ class Campaign(db.Model):
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'), #Changed the format to include time
             'sent_count': self.sent_count,
             'failed_count': self.failed_count,
+            'priority': self.priority or 1,
+            'deadline': self.deadline.strftime('%Y-%m-%dT%H:%M') if self.deadline else None,
+            'broadcast': bool(self.broadcast),
             # 'attachments':self.attachment_path
         }
 
 class CampaignRecipient(db.Model):
+    __table_args__ = (
+        db.Index('ix_campaign_recipient_campaign_status', 'campaign_id', 'status'),
+        db.Index('ix_campaign_recipient_campaign_phone', 'campaign_id', 'recipient_phone'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     campaign_id = db.Column(db.Integer, db.ForeignKey('campaign.id', ondelete='CASCADE'), nullable=False)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id', ondelete='CASCADE'), nullable=False)
@@ -167,6 +219,12 @@ class CampaignRecipient(db.Model):
     recipient_name = db.Column(db.String(100), nullable=False)
     recipient_phone = db.Column(db.String(20), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, index=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    # Worker currently sending this (pending) recipient, and when its claim lapses unless renewed
+    lease_owner = db.Column(db.String(100), nullable=True, index=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
 
     customer = db.relationship('Customer', lazy='joined')
     campaign = db.relationship('Campaign', back_populates='recipients')
@@ -178,31 +236,330 @@ class CampaignRecipient(db.Model):
             'recipient_name': self.recipient_name,
             'recipient_phone': self.recipient_phone,
             'status': self.status,
+            'attempts': self.attempts or 0,
+            'sent_at': self.sent_at.strftime('%Y-%m-%d %H:%M:%S') if self.sent_at else None,
+            'last_error': self.last_error,
             'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S')
         }
 
+class DeletedRow(db.Model):
+    """Tombstone written by a database trigger whenever a tracked row is deleted (for incremental backups)."""
+    __tablename__ = TOMBSTONE_TABLE
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class BackupRecord(db.Model):
+    """One backup file. An incremental backup exports what changed since the previous record's cut."""
+    __tablename__ = BACKUP_LOG_TABLE
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    since = db.Column(db.DateTime, nullable=True)
+    cut_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+
+class SendHistory(db.Model):
+    """
+    One message delivered to a number, across all campaigns, for frequency capping. Derived from
+    CampaignRecipient outcomes, so it is left out of backups and rebuilt when empty.
+    """
+    __tablename__ = SEND_HISTORY_TABLE
+    __table_args__ = (db.Index('ix_send_history_phone_sent_at', 'phone', 'sent_at'),)
+    id = db.Column(db.Integer, primary_key=True)
+    phone = db.Column(db.String(20), nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=False)
+    campaign_id = db.Column(db.Integer, nullable=True)
+    recipient_id = db.Column(db.Integer, nullable=True)
+
+class TableVersion(db.Model):
+    """Change counter per table, bumped by triggers on every write; list endpoints turn it into an ETag."""
+    __tablename__ = TABLE_VERSION_TABLE
+    table_name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class Segment(db.Model):
+    """
+    A saved audience: customers matching every condition in `filters`, a JSON list of
+    {"field", "op", "value"}. Members are materialised in SegmentMember.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+    filters = db.Column(db.Text, nullable=False, default='[]')
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, index=True)
+
+    def get_filters(self):
+        try:
+            return json.loads(self.filters or '[]')
+        except ValueError:
+            return []
+
+    def to_dict(self, member_count=None):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'filters': self.get_filters(),
+            'member_count': member_count,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+class SegmentMember(db.Model):
+    """
+    Customer ids currently matching a segment. Derived from Segment filters and Customer rows, so it
+    is left out of backups and rebuilt; FK cascades drop the rows of deleted customers and segments.
+    """
+    __tablename__ = SEGMENT_MEMBER_TABLE
+    segment_id = db.Column(db.Integer, db.ForeignKey('segment.id', ondelete='CASCADE'), primary_key=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id', ondelete='CASCADE'), primary_key=True, index=True)
+
+# Tables whose deletes leave tombstones
+TRACKED_MODELS = (Customer, Campaign, CampaignRecipient, Segment)
+
+def _ensure_columns():
+    """Add columns/indexes declared on the models but missing from an existing database file."""
+    inspector = inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+def _ensure_tombstone_triggers():
+    """Record deletes (including FK cascades and bulk deletes) as tombstones at the database level."""
+    dialect = db.engine.dialect.name
+    if dialect not in ('sqlite', 'postgresql'):
+        print(f"Warning: no delete triggers for {dialect}; incremental backups will not carry deletes")
+        return
+    with db.engine.begin() as conn:
+        if dialect == 'postgresql':
+            conn.execute(text(
+                f"CREATE OR REPLACE FUNCTION {TOMBSTONE_TABLE}_record() RETURNS trigger AS $$ BEGIN "
+                f"INSERT INTO {TOMBSTONE_TABLE} (table_name, row_id, deleted_at) "
+                f"VALUES (TG_TABLE_NAME, OLD.id, date_trunc('second', localtimestamp)); RETURN NULL; "
+                f"END $$ LANGUAGE plpgsql"
+            ))
+        for model in TRACKED_MODELS:
+            table = model.__tablename__
+            if dialect == 'postgresql':
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {table}_tombstone ON {table}"))
+                conn.execute(text(
+                    f"CREATE TRIGGER {table}_tombstone AFTER DELETE ON {table} "
+                    f"FOR EACH ROW EXECUTE FUNCTION {TOMBSTONE_TABLE}_record()"
+                ))
+                continue
+            # second resolution, local time: the same format SQLAlchemy reads back for DateTime columns
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_tombstone AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {TOMBSTONE_TABLE} (table_name, row_id, deleted_at) "
+                f"VALUES ('{table}', OLD.id, strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime')); END"
+            ))
+
+# Tables whose writes bump their TableVersion
+VERSIONED_MODELS = (Customer, Campaign)
+
+def _ensure_version_triggers():
+    """Keep TableVersion current for every insert, update and delete, whoever issues it."""
+    versions = TableVersion.__tablename__
+    dialect = db.engine.dialect.name
+    if dialect not in ('sqlite', 'postgresql'):
+        print(f"Warning: no version triggers for {dialect}; cached reads may go stale")
+        return
+    with db.engine.begin() as conn:
+        if dialect == 'postgresql':
+            conn.execute(text(
+                f"CREATE OR REPLACE FUNCTION {versions}_bump() RETURNS trigger AS $$ BEGIN "
+                f"UPDATE {versions} SET version = version + 1 WHERE table_name = TG_TABLE_NAME; RETURN NULL; "
+                f"END $$ LANGUAGE plpgsql"
+            ))
+        for model in VERSIONED_MODELS:
+            table = model.__tablename__
+            conn.execute(text(
+                f"INSERT INTO {versions} (table_name, version) VALUES ('{table}', 0) "
+                f"ON CONFLICT (table_name) DO NOTHING"
+            ))
+            if dialect == 'postgresql':
+                # once per statement is enough to move the version
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {table}_version ON {table}"))
+                conn.execute(text(
+                    f"CREATE TRIGGER {table}_version AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                    f"FOR EACH STATEMENT EXECUTE FUNCTION {versions}_bump()"
+                ))
+                continue
+            for operation in ('INSERT', 'UPDATE', 'DELETE'):
+                conn.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS {table}_version_{operation.lower()} AFTER {operation} ON {table} "
+                    f"BEGIN UPDATE {versions} SET version = version + 1 "
+                    f"WHERE table_name = '{table}'; END"
+                ))
+
+HISTORY_REBUILD_BATCH = 5000
+
+def _rebuild_send_history():
+    """Fill an empty send history from the recipients already sent (first start, or after a restore)."""
+    if SendHistory.query.first() is not None:
+        return
+    rows = db.session.query(
+        CampaignRecipient.id, CampaignRecipient.campaign_id, CampaignRecipient.recipient_phone,
+        CampaignRecipient.sent_at
+    ).filter(
+        CampaignRecipient.status.in_(SENT_STATUSES), CampaignRecipient.sent_at.isnot(None)
+    ).order_by(CampaignRecipient.id).yield_per(HISTORY_REBUILD_BATCH)
+
+    def flush(batch):
+        phones = normalize_phones([phone for _, _, phone, _ in batch])
+        db.session.bulk_insert_mappings(SendHistory, [
+            {'phone': phone, 'sent_at': sent_at, 'campaign_id': campaign_id, 'recipient_id': recipient_id}
+            for (recipient_id, campaign_id, _, sent_at), phone in zip(batch, phones) if phone
+        ])
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= HISTORY_REBUILD_BATCH:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+    db.session.commit()
+
+# Customer fields a segment condition can test; any other field name is a custom field
+SEGMENT_FIELDS = ('name', 'phone', 'email', 'status')
+SEGMENT_OPERATORS = ('eq', 'ne', 'contains', 'in')
+SEGMENT_REFRESH_BATCH = 500
+
+def parse_segment_filters(filters):
+    """Validated segment conditions, or ValueError describing the first bad one."""
+    if not isinstance(filters, list):
+        raise ValueError('filters must be a list of conditions')
+    parsed = []
+    for rule in filters:
+        if not isinstance(rule, dict) or not str(rule.get('field') or '').strip():
+            raise ValueError('Every condition needs a field')
+        op = rule.get('op', 'eq')
+        if op not in SEGMENT_OPERATORS:
+            raise ValueError(f"Unknown operator {op!r}; use one of {', '.join(SEGMENT_OPERATORS)}")
+        value = rule.get('value')
+        if op == 'in':
+            if not isinstance(value, list) or not value:
+                raise ValueError("'in' needs a non-empty list of values")
+            value = [str(v) for v in value]
+        else:
+            value = '' if value is None else str(value)
+        parsed.append({'field': str(rule['field']).strip(), 'op': op, 'value': value})
+    return parsed
+
+def _segment_column(field):
+    if field in SEGMENT_FIELDS:
+        return getattr(Customer, field)
+    dialect = db.engine.dialect.name
+    # custom_fields is a text column: PostgreSQL needs a real cast to JSON, while SQLite and MySQL read
+    # JSON straight from text (and a CAST there would turn the document into a number)
+    if dialect == 'postgresql':
+        document = db.cast(Customer.custom_fields, db.JSON)
+    else:
+        document = db.type_coerce(Customer.custom_fields, db.JSON)
+    value = document[field.replace('"', '')].as_string()
+    if dialect == 'sqlite':
+        # rows written before custom fields were validated must not abort the whole query
+        return db.case((db.func.json_valid(Customer.custom_fields) == 1, value))
+    return value
+
+def _segment_clause(filters):
+    """SQL condition matching the customers in a segment (text comparisons ignore case)."""
+    clauses = []
+    for rule in filters:
+        column = db.func.lower(_segment_column(rule['field']))
+        op, value = rule['op'], rule['value']
+        if op == 'in':
+            clauses.append(column.in_([v.lower() for v in value]))
+        elif op == 'contains':
+            clauses.append(column.contains(value.lower(), autoescape=True))
+        elif op == 'ne':
+            clauses.append(db.or_(column.is_(None), column != value.lower()))
+        else:
+            clauses.append(column == value.lower())
+    return db.and_(db.true(), *clauses)
+
+def _refresh_segment_members(customer_ids=None, segments=None):
+    """
+    Recompute segment membership for `customer_ids` (all customers when None) in `segments` (all when
+    None) with a DELETE and an INSERT ... SELECT per batch. Runs in the caller's transaction.
+    """
+    if segments is None:
+        segments = Segment.query.all()
+    table = SegmentMember.__table__
+    if customer_ids is None:
+        batches = [None]
+    else:
+        customer_ids = list(customer_ids)
+        batches = [customer_ids[i:i + SEGMENT_REFRESH_BATCH] for i in range(0, len(customer_ids), SEGMENT_REFRESH_BATCH)]
+    for segment in segments:
+        clause = _segment_clause(parse_segment_filters(segment.get_filters()))
+        for ids in batches:
+            delete = table.delete().where(table.c.segment_id == segment.id)
+            matches = db.select(db.literal(segment.id), Customer.id).where(clause)
+            if ids is not None:
+                delete = delete.where(table.c.customer_id.in_(ids))
+                matches = matches.where(Customer.id.in_(ids))
+            db.session.execute(delete)
+            db.session.execute(table.insert().from_select(['segment_id', 'customer_id'], matches))
+
+def _rebuild_segment_members():
+    """Fill empty segment membership (e.g. after a backup was replayed from the command line)."""
+    if SegmentMember.query.first() is not None or Segment.query.first() is None:
+        return
+    _refresh_segment_members()
+    db.session.commit()
+
 # Initialize database
 with app.app_context():
     db.create_all()
+    _ensure_columns()
+    _ensure_tombstone_triggers()
+    _ensure_version_triggers()
+    _rebuild_send_history()
+    _rebuild_segment_members()
 
 def allowed_file(filename, file_type):
     """Check if file extension is allowed"""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS[file_type]
 
-def normalize_phone_to_digits(phone):
-    """Return phone digits only. Caller should ensure country code is present when needed."""
-    if not phone:
-        return ''
-    s = ''.join(ch for ch in str(phone) if ch.isdigit())
-    return s
-
 class WhatsAppBulkSenderAPI(WhatsAppBulkSender):
     """Extended WhatsApp sender with API progress tracking"""
 
     def __init__(self, progress_tracker=None):
         super().__init__()
 
+# Columns recipient_context() reads, selected as plain rows rather than loading ORM objects
+RECIPIENT_CONTEXT_COLUMNS = (
+    CampaignRecipient.recipient_name, CampaignRecipient.recipient_phone,
+    Customer.id.label('customer_id'), Customer.name.label('customer_name'),
+    Customer.phone.label('customer_phone'), Customer.email.label('customer_email'),
+    Customer.status.label('customer_status'), Customer.custom_fields.label('customer_custom_fields'),
+)
+
+def recipient_context(row):
+    """Placeholder values for one recipient row (customer fields + custom columns)."""
+    if row.customer_id is None:
+        return build_context(name=row.recipient_name, phone=row.recipient_phone)
+    return build_context(
+        name=row.customer_name,
+        phone=row.customer_phone,
+        email=row.customer_email,
+        status=row.customer_status,
+        custom_fields=row.customer_custom_fields
+    )
+
 def get_whatsapp_sender():
     """Get or create WhatsApp sender instance (singleton pattern)"""
     global whatsapp_sender
@@ -212,195 +569,739 @@ def get_whatsapp_sender():
         return whatsapp_sender
 
 
-def process_campaign_async(campaign_id, attachment_path=None):
+# --- Sender operations ---
+# Everything that touches the browser or the in-memory campaign runs goes through _sender_call, which
+# runs the operation here or, when SENDER_SOCKET is set, in the sender daemon. Arguments and results
+# must be JSON-serialisable.
+SENDER_OPERATIONS = {}
+
+
+def sender_operation(func):
+    SENDER_OPERATIONS[func.__name__] = func
+    return func
+
+
+def _sender_call(name, *args):
+    if sender_rpc is not None:
+        return sender_rpc.call(name, *args)
+    return SENDER_OPERATIONS[name](*args)
+
+
+if sender_rpc is not None:
+    from whatsapp_sender.rpc import SenderUnavailable, RemoteError
+
+    @app.errorhandler(SenderUnavailable)
+    def sender_unavailable(e):
+        return jsonify({'error': str(e)}), 503
+
+    @app.errorhandler(RemoteError)
+    def sender_failed(e):
+        app.logger.error(f"Sender daemon error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+# --- Campaign dispatching ---
+# Every ready campaign gets a CampaignRun; session workers pull recipients from the runs in
+# weighted fair-share order so overlapping campaigns interleave instead of racing for the browser.
+SESSION_NAMES = ['default']
+campaign_queue = FairShareScheduler(
+    avg_send_seconds=int(CONFIG['delay_between_messages']) + 10,
+    sessions=len(SESSION_NAMES)
+)
+campaign_runs = {}
+_session_workers = {}
+_dispatch_lock = threading.Lock()
+# Held by whoever drives the browser: a session worker while it sends, or the receipt sweep
+_browser_lock = threading.Lock()
+# Recipients settled before sending (invalid/duplicate numbers) are updated this many ids at a time
+SETTLE_BATCH_SIZE = 500
+# Recipients read per page while a campaign is prepared
+PREPARE_PAGE_SIZE = 5000
+FREQUENCY_CAPS = parse_frequency_caps(CONFIG['frequency_caps'])
+# Recipients are leased from the database in small batches, so workers on several hosts can send one
+# campaign. A lease is renewed while its worker lives; one that lapses is taken over by another worker.
+WORKER_ID = CONFIG['worker_id'] or f"{socket.gethostname()}:{os.getpid()}"
+LEASE_SECONDS = int(CONFIG['lease_seconds'])
+LEASE_BATCH_SIZE = int(CONFIG['lease_batch_size'])
+# How often a worker looks again when the other workers hold all the remaining recipients
+LEASE_POLL_SECONDS = 5
+
+
+def _lease_recipients(campaign_id, limit):
     """
-    Background thread worker to process a campaign by id.
-    Uses the global whatsapp_sender instance (WhatsAppBulkSenderAPI).
+    Lease up to `limit` pending recipients of a campaign that no live lease covers, lowest ids first,
+    and return their ids. The claim is a single UPDATE, so workers in other threads, processes or
+    hosts never get the same row; the free-lease condition is repeated outside the subquery for
+    databases that re-check a row after waiting on another claim's lock.
     """
-    global whatsapp_sender, current_progress
-
+    now = datetime.now()
+    expires = now + timedelta(seconds=LEASE_SECONDS)
+    free = db.or_(CampaignRecipient.lease_expires_at.is_(None), CampaignRecipient.lease_expires_at < now)
+    candidates = db.select(CampaignRecipient.id).where(
+        CampaignRecipient.campaign_id == campaign_id, CampaignRecipient.status == 'pending', free
+    ).order_by(CampaignRecipient.id).limit(limit)
+    CampaignRecipient.query.filter(
+        CampaignRecipient.id.in_(candidates), CampaignRecipient.status == 'pending', free
+    ).update({'lease_owner': WORKER_ID, 'lease_expires_at': expires}, synchronize_session=False)
+    # read back before committing, so a renewal can't move the expiry in between
+    ids = [rid for (rid,) in db.session.query(CampaignRecipient.id).filter(
+        CampaignRecipient.campaign_id == campaign_id,
+        CampaignRecipient.lease_owner == WORKER_ID,
+        CampaignRecipient.lease_expires_at == expires
+    ).order_by(CampaignRecipient.id)]
+    db.session.commit()
+    return ids
+
+
+def _pending_elsewhere(campaign_id):
+    """Whether pending recipients of the campaign are left that this worker doesn't hold."""
+    return db.session.query(CampaignRecipient.id).filter(
+        CampaignRecipient.campaign_id == campaign_id,
+        CampaignRecipient.status == 'pending',
+        db.or_(CampaignRecipient.lease_owner.is_(None), CampaignRecipient.lease_owner != WORKER_ID)
+    ).first() is not None
+
+
+def _release_leases(campaign_id=None):
+    """Give back this worker's leases (all, or one campaign's) so others can take the rows at once."""
+    query = CampaignRecipient.query.filter(CampaignRecipient.lease_owner == WORKER_ID)
+    if campaign_id is not None:
+        query = query.filter(CampaignRecipient.campaign_id == campaign_id)
+    query.update({'lease_owner': None, 'lease_expires_at': None}, synchronize_session=False)
+    db.session.commit()
+
+
+def _renew_leases():
+    """Scheduled job: extend every lease this worker holds (batched, in flight or awaiting a retry)."""
     with app.app_context():
         try:
-            # Basic fetch & guard
-            campaign = Campaign.query.get(campaign_id)
-            if not campaign:
-                current_app.logger.error(f"Campaign {campaign_id} not found")
-                return
+            CampaignRecipient.query.filter(
+                CampaignRecipient.lease_owner == WORKER_ID,
+                CampaignRecipient.status == 'pending'
+            ).update(
+                {'lease_expires_at': datetime.now() + timedelta(seconds=LEASE_SECONDS)},
+                synchronize_session=False
+            )
+            db.session.commit()
+        except Exception:
+            app.logger.exception("Lease renewal failed")
+            db.session.rollback()
 
-            # Prevent double-processing: only run queued campaigns
-            if campaign.status not in ('queued', 'scheduled'):
-                current_app.logger.info(f"Campaign {campaign_id} status is {campaign.status}; skipping worker start.")
-                return
 
-            # load recipients
-            recipients = CampaignRecipient.query.filter_by(campaign_id=campaign_id).all()
-            total = len(recipients)
-            #print(total,recipients,"\n\n\n\this is the totalt list \n\n\n\n")
-
-            # initialize progress
-            current_progress.update({
-                'is_active': True,
-                'current': 0,
-                'total': total,
-                'logs': [],
-                'success_count': 0,
-                'failure_count': 0,
-                'start_time': datetime.now().isoformat(),
-                'end_time': None
-            })
-            #print("all instance set up done")
-            # ensure sender is initialized using singleton pattern
-            whatsapp_sender = get_whatsapp_sender()
-            if whatsapp_sender and whatsapp_sender.is_driver_active() and not whatsapp_sender.is_busy():
-                print("Previous WhatsApp Session Found.")
-                whatsapp_sender.quit_driver()
-                print("Previous WhatsApp Session Terminated.")
-                
-            whatsapp_sender.busy = True
-            if not whatsapp_sender.is_driver_active():
-                try:
-                    whatsapp_sender.initialize_driver()
-                    whatsapp_sender.login_to_whatsapp_with_wait()
-                except Exception as e:
-                    msg = f"WebDriver init failed: {str(e)}"
-                    current_progress['logs'].append(f"[ERROR] {msg}")
-                    current_progress['is_active'] = False
-                    current_app.logger.exception(msg)
-                    return
+@atexit.register
+def _release_leases_at_exit():
+    # only the process that sends holds leases
+    if sender_rpc is not None:
+        return
+    try:
+        with app.app_context():
+            _release_leases()
+    except Exception:
+        pass
+
+
+def _status_counts(campaign_id):
+    return dict(db.session.query(CampaignRecipient.status, db.func.count()).filter(
+        CampaignRecipient.campaign_id == campaign_id
+    ).group_by(CampaignRecipient.status).all())
+
+
+class CampaignRun:
+    """This worker's send state for one campaign: leased recipients, rendered messages, deferred retries and progress."""
+
+    def __init__(self, campaign_id, attachment_path=None):
+        self.campaign_id = campaign_id
+        self.attachment_path = attachment_path
+        self.lock = threading.RLock()
+        self.policy = RetryPolicy.from_config(CONFIG)
+        self.retry_queue = DeferredRetryQueue()
+        self.tracer = Tracer.for_campaign(campaign_id)
+        self.template = None
+        self.batch = deque()
+        self.next_lease_at = 0.0
+        self.in_flight = 0
+        self.exhausted = False
+        self.cancelled = False
+        self.idx = 0
+        self.total = 0
+        self.skipped = 0
+        self.broadcast = False
+        # joined a campaign another worker started (and may still be sending)
+        self.joined = False
+        self.progress = {
+            'is_active': True,
+            'current': 0,
+            'total': 0,
+            'logs': [],
+            'success_count': 0,
+            'failure_count': 0,
+            'skipped_count': 0,
+            'start_time': datetime.now().isoformat(),
+            'end_time': None
+        }
 
-            # ensure logged in (wait)
-            if not whatsapp_sender.wait_for_login():
-                print("testing login")
-                msg = "WhatsApp login failed or timeout."
-                current_progress['logs'].append(f"[ERROR] {msg}")
-                current_progress['is_active'] = False
-                current_app.logger.error(msg)
-                return
-            #print("login was sucess")
-            # mark campaign running
-            campaign.status = 'running'
+    def prepare(self):
+        """
+        Settle, once per campaign and before any worker sends, the recipients that can't be sent, so
+        missing customers, invalid numbers, repeats of a number and numbers over their frequency cap
+        never reach a session. Recipients are read as (id, number) rows in id-ordered pages, each page's
+        numbers normalised in one go; repeats and caps are then settled by single UPDATEs, so memory
+        stays flat however large the campaign is.
+        """
+        settled = {}
+        last_id = 0
+        while True:
+            page = db.session.query(
+                CampaignRecipient.id, CampaignRecipient.recipient_phone, Customer.phone
+            ).outerjoin(Customer, Customer.id == CampaignRecipient.customer_id).filter(
+                CampaignRecipient.campaign_id == self.campaign_id,
+                CampaignRecipient.status == 'pending',
+                CampaignRecipient.id > last_id
+            ).order_by(CampaignRecipient.id).limit(PREPARE_PAGE_SIZE).all()
+            if not page:
+                break
+            # heartbeat: a 'preparing' campaign left untouched for LEASE_SECONDS is taken over
+            if not Campaign.query.filter_by(id=self.campaign_id, status='preparing').update(
+                {'updated_at': datetime.now()}, synchronize_session=False
+            ):
+                # cancelled, or taken over after this worker stalled
+                db.session.rollback()
+                return False
+            last_id = page[-1][0]
+            ids = [rid for rid, _, _ in page]
+            raw_phones = pd.Series([customer_phone for _, _, customer_phone in page], dtype=object)
+            phones = normalize_phones(raw_phones)
+            self._store_phones(page, phones)
+            missing = raw_phones.isna()
+            invalid = ~missing & (phones == '')
+            self._settle_ids(ids, missing, 'failed', 'Customer not found', settled)
+            self._settle_ids(ids, invalid, 'failed', 'Invalid phone number', settled)
             db.session.commit()
 
-            # iterate recipients one-by-one (DB-driven)
-            idx = 0
-            for r in recipients:
-                # check for cancel request
-                #print("recipets:                ",r,"\n\n\n")
-                db.session.refresh(campaign)
-                if campaign.status == 'cancel_requested':
-                    campaign.status = 'cancelled'
-                    db.session.commit()
-                    current_progress['logs'].append(f"Campaign {campaign_id} cancelled by user.")
-                    break
-
-                idx += 1
-                customer = Customer.query.get(r.customer_id)
-                if not customer:
-                    r.status = 'failed'
-                    r.last_error = 'Customer not found'
-                    r.attempts = (r.attempts or 0) + 1
-                    r.updated_at = datetime.now()
+        self._settle_query(self._duplicates(), 'skipped', 'Duplicate phone number', settled)
+        if FREQUENCY_CAPS:
+            self._settle_query(self._capped(), 'skipped', f"Frequency cap reached ({CONFIG['frequency_caps']})", settled)
+
+        if any(status == 'failed' for status, _ in settled):
+            Campaign.query.filter_by(id=self.campaign_id).update({
+                'failed_count': CampaignRecipient.query.filter_by(campaign_id=self.campaign_id, status='failed').count()
+            })
+            db.session.commit()
+        for (status, error), count in settled.items():
+            if status == 'failed':
+                self.progress['failure_count'] += count
+            else:
+                self.skipped += count
+                self.progress['skipped_count'] = self.skipped
+            self.log(f"{error}: {count} recipient(s) {status}")
+        return True
+
+    def attach(self):
+        """Compile the campaign template and take the campaign's counts; recipients are then leased batch by batch."""
+        campaign = Campaign.query.get(self.campaign_id)
+        counts = _status_counts(self.campaign_id)
+        self.total = sum(counts.values())
+        self.idx = self.total - counts.get('pending', 0)
+        self.progress['total'] = self.total
+        self.progress['current'] = self.idx
+        self.template = MessageTemplate(campaign.message)
+        # forwarding only works when every recipient gets the same text
+        self.broadcast = bool(campaign.broadcast) and self.template.is_static
+        if campaign.broadcast and not self.broadcast:
+            self.log("Message has placeholders, broadcast mode off: sending to each recipient directly")
+        # leases left under this worker id (a restart with a fixed WORKER_ID) are free to take again
+        _release_leases(self.campaign_id)
+
+    def _lease_batch(self):
+        """Lease the next batch of recipients and render their messages (one column query, no ORM objects)."""
+        ids = _lease_recipients(self.campaign_id, LEASE_BATCH_SIZE)
+        if not ids:
+            return []
+        rows = db.session.query(
+            CampaignRecipient.id, CampaignRecipient.attempts, *RECIPIENT_CONTEXT_COLUMNS
+        ).outerjoin(Customer, Customer.id == CampaignRecipient.customer_id).filter(
+            CampaignRecipient.id.in_(ids)
+        ).order_by(CampaignRecipient.id).all()
+        messages = render_in_batches(self.template, [recipient_context(row) for row in rows])
+        return [(row.id, row.recipient_phone, row.attempts or 0, message) for row, message in zip(rows, messages)]
+
+    def _next_leased(self):
+        """Next recipient from the current lease batch, leasing another batch when it runs out."""
+        if not self.batch:
+            if time.monotonic() < self.next_lease_at:
+                return None
+            self.batch.extend(self._lease_batch())
+            if not self.batch:
+                if _pending_elsewhere(self.campaign_id):
+                    # other workers hold the rest; look again in case one of them dies
+                    self.next_lease_at = time.monotonic() + LEASE_POLL_SECONDS
+                else:
+                    self.exhausted = True
+                return None
+        return self.batch.popleft()
+
+    def _store_phones(self, rows, phones):
+        """Keep recipient_phone normalised, so repeats and send history can be matched against it in SQL."""
+        changed = [
+            {'rid': rid, 'phone': phone}
+            for (rid, stored, _), phone in zip(rows, phones) if phone and phone != stored
+        ]
+        if changed:
+            table = CampaignRecipient.__table__
+            db.session.execute(
+                table.update().where(table.c.id == bindparam('rid')).values(recipient_phone=bindparam('phone')),
+                changed
+            )
+
+    def _pending(self):
+        return CampaignRecipient.query.filter(
+            CampaignRecipient.campaign_id == self.campaign_id,
+            CampaignRecipient.status == 'pending'
+        )
+
+    def _duplicates(self):
+        """Pending recipients whose number the campaign already sent to, or a lower-id pending recipient has."""
+        other = aliased(CampaignRecipient)
+        return self._pending().filter(db.exists().where(
+            other.campaign_id == self.campaign_id,
+            other.recipient_phone == CampaignRecipient.recipient_phone,
+            db.or_(other.status.in_(SENT_STATUSES), db.and_(other.status == 'pending', other.id < CampaignRecipient.id))
+        ))
+
+    def _capped(self):
+        """Pending recipients whose number already got FREQUENCY_CAPS messages from other campaigns."""
+        now = datetime.now()
+        over_cap = []
+        for cap in FREQUENCY_CAPS:
+            sent = db.session.query(db.func.count(SendHistory.id)).filter(
+                SendHistory.phone == CampaignRecipient.recipient_phone,
+                SendHistory.sent_at >= now - cap.window,
+                SendHistory.campaign_id != self.campaign_id
+            ).correlate(CampaignRecipient).scalar_subquery()
+            over_cap.append(sent >= cap.limit)
+        return self._pending().filter(db.or_(*over_cap))
+
+    def log(self, line):
+        self.progress['logs'].append(line)
+
+    def remaining(self):
+        return self.total - self.idx + len(self.retry_queue)
+
+    def is_done(self):
+        with self.lock:
+            return self.exhausted and not len(self.retry_queue) and self.in_flight == 0
+
+    def seconds_until_ready(self):
+        waits = [w for w in (self.retry_queue.seconds_until_next(), self.next_lease_at - time.monotonic()) if w is not None and w > 0]
+        return max(min(waits), 0.5) if waits else 1.0
+
+    def _settle_ids(self, recipient_ids, mask, status, error, settled):
+        """Mark the recipients selected by `mask` (failed or skipped) without a send attempt; the caller commits."""
+        ids = [rid for rid, hit in zip(recipient_ids, mask) if hit]
+        for start in range(0, len(ids), SETTLE_BATCH_SIZE):
+            CampaignRecipient.query.filter(CampaignRecipient.id.in_(ids[start:start + SETTLE_BATCH_SIZE])).update(
+                {'status': status, 'last_error': error}, synchronize_session=False
+            )
+        if ids:
+            settled[(status, error)] = settled.get((status, error), 0) + len(ids)
+
+    def _settle_query(self, query, status, error, settled):
+        """Mark every recipient `query` matches (failed or skipped) in one UPDATE."""
+        count = query.update({'status': status, 'last_error': error}, synchronize_session=False)
+        db.session.commit()
+        if count:
+            settled[(status, error)] = settled.get((status, error), 0) + count
+
+    def next_task(self):
+        """Return the next (recipient_id, phone, message, attempt, label) to send, or None if none is ready."""
+        with self.lock:
+            if self.cancelled:
+                return None
+            # check for cancel request (possibly already taken up by another worker)
+            status = db.session.query(Campaign.status).filter_by(id=self.campaign_id).scalar()
+            if status in ('cancel_requested', 'cancelled'):
+                if status == 'cancel_requested':
+                    Campaign.query.filter_by(id=self.campaign_id).update({'status': 'cancelled'})
                     db.session.commit()
-                    current_progress['failure_count'] += 1
-                    current_progress['current'] = idx
-                    current_progress['logs'].append(f"[{idx}/{total}] Customer {r.customer_id} not found")
+                self.cancelled = True
+                self.exhausted = True
+                self.retry_queue = DeferredRetryQueue()
+                self.log(f"Campaign {self.campaign_id} cancelled by user.")
+                return None
+
+            task = self.retry_queue.pop_ready()
+            if task is not None:
+                self.in_flight += 1
+                return task
+
+            if self.exhausted:
+                return None
+            item = self._next_leased()
+            if item is None:
+                return None
+            recipient_id, phone, attempts, message = item
+            self.idx += 1
+            self.progress['current'] = self.idx
+            self.in_flight += 1
+            # attempts made by a worker that lost the lease count towards the retry limit
+            return (recipient_id, phone, message, attempts + 1, f"[{self.idx}/{self.total}]")
+
+    def next_tasks(self, limit):
+        """Up to `limit` further tasks that are ready now (used to fill a broadcast batch)."""
+        tasks = []
+        while len(tasks) < limit:
+            task = self.next_task()
+            if task is None:
+                break
+            tasks.append(task)
+        return tasks
+
+    def release(self, task):
+        """Give back a task that was picked but never sent."""
+        with self.lock:
+            self.in_flight -= 1
+
+    def complete(self, task, result):
+        """Record the outcome of a send attempt; transient failures are deferred for a later retry."""
+        recipient_id, phone, message, attempt, label = task
+        with self.lock:
+            self.in_flight -= 1
+            values = {'attempts': db.func.coalesce(CampaignRecipient.attempts, 0) + 1}
+            if result:
+                # the send acknowledgement may already show the second tick
+                values['status'] = result.receipt if result.receipt in SENT_STATUSES else 'sent'
+                values['sent_at'] = datetime.now()
+                values['last_error'] = None
+                db.session.add(SendHistory(
+                    phone=phone, sent_at=values['sent_at'], campaign_id=self.campaign_id, recipient_id=recipient_id
+                ))
+                self.progress['success_count'] += 1
+                self.log(f"{label} ✓ Sent to {phone}")
+            elif not self.cancelled and self.policy.should_retry(result, attempt):
+                delay = self.policy.next_delay(attempt)
+                self.retry_queue.push((recipient_id, phone, message, attempt + 1, f"[retry {attempt}]"), delay)
+                self.log(f"{label} {result.outcome} for {phone}, retrying in {int(delay)}s")
+            else:
+                values['status'] = 'failed'
+                self.progress['failure_count'] += 1
+                self.log(f"{label} ✗ Failed for {phone}: {result.outcome} {result.error or ''}")
+            if not result:
+                values['last_error'] = f"{result.outcome}: {result.error}" if result.error else result.outcome
+            if 'status' in values:
+                values['lease_owner'] = None
+                values['lease_expires_at'] = None
+
+            with DB_FLUSH_SECONDS.time():
+                CampaignRecipient.query.filter_by(id=recipient_id).update(values, synchronize_session=False)
+                # bump the counter in the same statement so concurrent workers never lose an update;
+                # finish() recounts them from the recipient rows
+                counter = 'sent_count' if result else 'failed_count' if values.get('status') == 'failed' else None
+                if counter:
+                    column = getattr(Campaign, counter)
+                    Campaign.query.filter_by(id=self.campaign_id).update(
+                        {column: db.func.coalesce(column, 0) + 1}, synchronize_session=False
+                    )
+                db.session.commit()
+
+    def finish(self):
+        """
+        Close this worker's part of the campaign. The worker that finds no recipient pending sets the
+        final status (unless cancelled) from the counts of every worker.
+        """
+        campaign = Campaign.query.get(self.campaign_id)
+        counts = _status_counts(self.campaign_id)
+        sent = sum(counts.get(status, 0) for status in SENT_STATUSES)
+        if campaign:
+            campaign.sent_count = sent
+            campaign.failed_count = counts.get('failed', 0)
+            db.session.commit()
+        if campaign and campaign.status != 'cancelled' and not counts.get('pending'):
+            total = sum(counts.values())
+            if total == 0:
+                campaign.status = 'failed'
+            elif sent == total - counts.get('skipped', 0):
+                campaign.status = 'completed'
+            elif sent > 0:
+                campaign.status = 'partial_failed'
+            else:
+                campaign.status = 'failed'
+            db.session.commit()
+
+        self.progress['is_active'] = False
+        self.progress['end_time'] = datetime.now().isoformat()
+        if campaign:
+            self.log(f"Campaign {self.campaign_id} finished. Sent: {campaign.sent_count}, Failed: {campaign.failed_count}")
+
+    def abort(self, msg):
+        """
+        Stop this worker's part of the campaign after an unrecoverable error. The campaign is marked
+        failed only by the worker that started it; one that joined leaves it to the other workers.
+        """
+        self.log(f"[ERROR] {msg}")
+        self.progress['is_active'] = False
+        self.progress['end_time'] = datetime.now().isoformat()
+        if self.joined:
+            return
+        try:
+            Campaign.query.filter_by(id=self.campaign_id).update({'status': 'failed'})
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+
+
+def _retire_run(run, msg=None):
+    if msg:
+        run.abort(msg)
+    else:
+        run.finish()
+    try:
+        # rows batched but not sent (cancel, abort) go back to the other workers
+        _release_leases(run.campaign_id)
+    except Exception:
+        db.session.rollback()
+    run.tracer.close()
+    campaign_queue.remove(run.campaign_id)
+    campaign_runs.pop(run.campaign_id, None)
+
+
+def _start_session():
+    """Bring the WhatsApp session up (or reuse it) and mark it busy."""
+    global whatsapp_sender
+    whatsapp_sender = get_whatsapp_sender()
+    if whatsapp_sender and whatsapp_sender.is_driver_active() and not whatsapp_sender.is_busy():
+        print("Previous WhatsApp Session Found.")
+        whatsapp_sender.quit_driver()
+        print("Previous WhatsApp Session Terminated.")
+
+    whatsapp_sender.busy = True
+    if not whatsapp_sender.is_driver_active():
+        whatsapp_sender.initialize_driver()
+        whatsapp_sender.login_to_whatsapp_with_wait()
+
+    # ensure logged in (wait)
+    if not whatsapp_sender.wait_for_login():
+        whatsapp_sender.busy = False
+        raise RuntimeError("WhatsApp login failed or timeout.")
+    return whatsapp_sender
+
+
+def _pick_task(timeout):
+    """Next (run, task) in fair-share order, or None if nothing is ready within `timeout` seconds."""
+    deadline = time.monotonic() + timeout
+    while True:
+        key = campaign_queue.acquire(timeout=max(deadline - time.monotonic(), 0))
+        if key is None:
+            return None
+
+        run = campaign_runs.get(key)
+        if run is None:
+            campaign_queue.remove(key)
+            continue
+
+        task = run.next_task()
+        campaign_queue.update_remaining(key, run.remaining())
+        if task is None:
+            if run.is_done():
+                _retire_run(run)
+            else:
+                campaign_queue.hold(key, run.seconds_until_ready())
+            continue
+
+        campaign_queue.charge(key)
+        return run, task
+
+
+def _send_direct(run, task, sender, next_contact=None, next_attachment=None):
+    """Send one recipient's message through its own chat and record the result."""
+    recipient_id, phone, message, attempt, label = task
+    run.log(f"{label} Sending to {phone}")
+    started = time.monotonic()
+    with run.tracer.recipient(phone, attempt) as trace:
+        try:
+            result = sender.send_message(
+                phone, message, run.attachment_path,
+                next_contact=next_contact, next_attachment=next_attachment
+            )
+        except Exception as e:
+            current_app.logger.exception(f"Error sending to {phone}: {e}")
+            result = SendResult(classify_exception(e), str(e))
+        trace.outcome = result.outcome
+    run.complete(task, result)
+    campaign_queue.record_send_time(time.monotonic() - started)
+    return result
+
+
+def _send_broadcast_batch(run, first_task, sender):
+    """
+    Broadcast mode: forward the campaign's message to a batch of recipients with one dialog, paying
+    for a single chat load. Recipients the forward dialog can't pick are sent directly.
+    """
+    tasks = [first_task] + run.next_tasks(sender.forward_batch_size() - 1)
+    for _ in tasks[1:]:
+        campaign_queue.charge(run.campaign_id)
+    phones = [task[1] for task in tasks]
+    for recipient_id, phone, message, attempt, label in tasks:
+        run.log(f"{label} Forwarding to {phone}")
+
+    started = time.monotonic()
+    with run.tracer.recipient(','.join(phones), first_task[3]) as trace:
+        forwarded = sender.forward_message(run.campaign_id, first_task[2], run.attachment_path, phones)
+        trace.outcome = f"forwarded {len(forwarded)}/{len(phones)}"
+    if forwarded:
+        campaign_queue.record_send_time((time.monotonic() - started) / len(forwarded))
+
+    results = []
+    for task in tasks:
+        result = forwarded.get(task[1])
+        if result is None:
+            result = _send_direct(run, task, sender)
+        else:
+            run.complete(task, result)
+            # each forwarded recipient waits delay_between_messages, as a direct send does
+            sender._pace(result)
+        results.append(result)
+    return results
+
+
+def _session_worker(session_name):
+    """Send for whichever campaign the fair-share queue picks next; go idle when the queue drains."""
+    with app.app_context():
+        sender = None
+        # with pipelining on, the following recipient is picked early so its chat can pre-load
+        lookahead = None
+        while True:
+            run = None
+            try:
+                picked = lookahead or _pick_task(timeout=5)
+                lookahead = None
+                if picked is None:
+                    if sender is not None:
+                        sender.busy = False
+                        sender = None
+                        _browser_lock.release()
                     continue
 
-                raw_phone = customer.phone
-                phone = normalize_phone_to_digits(raw_phone)
-                message = campaign.message or ''
-
-                current_progress['logs'].append(f"[{idx}/{total}] Sending to {phone}")
-                current_progress['current'] = idx
-
-                success = False
-                last_err = None
-                attempts = 0
-                max_retries = int(getattr(whatsapp_sender, 'config', {}).get('max_retries', 2))
-
-                # Quick phone validation (basic)
-                if not phone or len(phone) < 8:
-                    last_err = "Invalid phone number"
-                    attempts = (r.attempts or 0) + 1
-                    r.attempts = attempts
-                    r.last_error = last_err
-                    r.status = 'failed'
-                    r.updated_at = datetime.now()
-                    db.session.commit()
-                    current_progress['failure_count'] += 1
-                    current_progress['logs'].append(f"[{idx}/{total}] Invalid phone for customer {customer.id}")
-                    # short sleep and continue
-                    time.sleep(0.5)
+                run, task = picked
+                if run.cancelled:
+                    run.release(task)
                     continue
-                #print("max apptemps",max_retries)
-                # perform attempts with backoff
-                for attempt in range(1, max_retries + 1):
-                    attempts = attempt
+
+                if sender is None:
+                    _browser_lock.acquire()
                     try:
-                        ok = whatsapp_sender.send_message(phone, message, attachment_path)
-                        if ok:
-                            success = True
-                            break
-                        else:
-                            last_err = 'send_message returned False'
+                        sender = _start_session()
                     except Exception as e:
-                        last_err = str(e)
-                        current_app.logger.exception(f"Error sending to {phone}: {e}")
-
-                    # small backoff before next retry
-                    time.sleep(int(getattr(whatsapp_sender, 'config', {}).get('max_retries', 2)))
-
-                # update recipient row
-                r.attempts = (r.attempts or 0) + attempts
-                r.last_error = last_err
-                r.updated_at = datetime.now()
-
-                if success:
-                    r.status = 'sent'
-                    r.sent_at = datetime.now()
-                    current_progress['success_count'] += 1
-                    current_progress['logs'].append(f"[{idx}/{total}] ✓ Sent to {phone}")
+                        _browser_lock.release()
+                        current_app.logger.exception("WebDriver init failed")
+                        _retire_run(run, f"WebDriver init failed: {str(e)}")
+                        continue
+
+                if run.broadcast:
+                    results = _send_broadcast_batch(run, task, sender)
                 else:
-                    r.status = 'failed'
-                    current_progress['failure_count'] += 1
-                    current_progress['logs'].append(f"[{idx}/{total}] ✗ Failed for {phone}: {last_err}")
+                    next_contact = next_attachment = None
+                    if sender.pipelining_enabled():
+                        lookahead = _pick_task(timeout=0)
+                        if lookahead is not None:
+                            next_contact = lookahead[1][1]
+                            next_attachment = lookahead[0].attachment_path
+                    results = [_send_direct(run, task, sender, next_contact, next_attachment)]
+
+                lost = any(r.outcome == SendOutcome.SESSION_LOST for r in results)
+                if lost and not sender.is_driver_active():
+                    run.log(f"[WARN] WhatsApp session '{session_name}' lost, reconnecting...")
+                    sender.quit_driver()
+                    sender = None
+                    _browser_lock.release()
+                    continue
 
-                db.session.commit()
+            except Exception as ex:
+                current_app.logger.exception("Worker exception")
+                db.session.rollback()
+                if run is not None:
+                    _retire_run(run, f"Worker exception: {str(ex)}")
 
-                # update campaign counters incrementally (safe approach)
-                campaign.sent_count = CampaignRecipient.query.filter_by(campaign_id=campaign_id, status='sent').count()
-                campaign.failed_count = CampaignRecipient.query.filter_by(campaign_id=campaign_id, status='failed').count()
-                db.session.commit()
 
-                # human-like jitter
-                time.sleep(int(getattr(whatsapp_sender, 'config', {}).get('delay_between_messages', 1.5)) + 0.3)
+def _ensure_session_workers():
+    with _dispatch_lock:
+        for name in SESSION_NAMES:
+            worker = _session_workers.get(name)
+            if worker is None or not worker.is_alive():
+                worker = threading.Thread(target=_session_worker, args=(name,), daemon=True)
+                _session_workers[name] = worker
+                worker.start()
 
-            # finalize campaign status if not cancelled
-            if campaign.status != 'cancelled':
-                sent = campaign.sent_count or 0
-                failed = campaign.failed_count or 0
-                if total == 0:
-                    campaign.status = 'failed'
-                elif sent == total:
-                    campaign.status = 'completed'
-                elif sent > 0:
-                    campaign.status = 'partial_failed'
-                else:
-                    campaign.status = 'failed'
-                campaign.updated_at = datetime.now()
+
+def process_campaign_async(campaign_id, attachment_path=None):
+    """
+    Start sending a campaign, or join one that another worker started. Called from the send endpoint,
+    from APScheduler jobs and from the cluster join poll; the campaign's recipients are interleaved
+    with any other ready campaigns by fair share.
+    """
+    with app.app_context():
+        joined = False
+        try:
+            # Basic fetch & guard
+            campaign = Campaign.query.get(campaign_id)
+            if not campaign:
+                current_app.logger.error(f"Campaign {campaign_id} not found")
+                return
+
+            # Prevent double-processing: one run per campaign in this worker
+            if campaign_id in campaign_runs:
+                current_app.logger.info(f"Campaign {campaign_id} is already being sent here; skipping worker start.")
+                return
+
+            run = CampaignRun(campaign_id, attachment_path or campaign.attachment_path)
+            if campaign.status in ('queued', 'scheduled', 'preparing'):
+                # exactly one worker prepares the campaign; the others join once it is running. One left
+                # 'preparing' by a worker that died (no heartbeat for LEASE_SECONDS) is prepared again.
+                started = Campaign.query.filter(
+                    Campaign.id == campaign_id,
+                    db.or_(Campaign.status.in_(('queued', 'scheduled')), _stale_preparing_clause())
+                ).update({'status': 'preparing', 'updated_at': datetime.now()}, synchronize_session=False)
+                db.session.commit()
+                if not started:
+                    current_app.logger.info(f"Campaign {campaign_id} was started by another worker.")
+                    return
+                if not run.prepare():
+                    current_app.logger.info(f"Campaign {campaign_id} stopped preparing here (cancelled or taken over).")
+                    return
+                # mark campaign running (unless it was cancelled meanwhile)
+                Campaign.query.filter_by(id=campaign_id, status='preparing').update({'status': 'running'})
                 db.session.commit()
+            elif campaign.status == 'running':
+                joined = run.joined = True
+            else:
+                current_app.logger.info(f"Campaign {campaign_id} status is {campaign.status}; skipping worker start.")
+                return
 
-            # finalize current_progress
-            current_progress['is_active'] = False
-            current_progress['end_time'] = datetime.now().isoformat()
-            current_progress['logs'].append(
-                f"Campaign {campaign_id} finished. Sent: {campaign.sent_count}, Failed: {campaign.failed_count}"
+            run.attach()
+            campaign_progress[campaign_id] = run.progress
+            campaign_runs[campaign_id] = run
+            campaign_queue.add(
+                campaign_id,
+                priority=campaign.priority or 1,
+                deadline=campaign.deadline,
+                remaining=run.remaining()
             )
+            _ensure_session_workers()
 
         except Exception as ex:
-            current_app.logger.exception("Worker exception")
-            current_progress['logs'].append(f"[ERROR] Worker exception: {str(ex)}")
-            current_progress['is_active'] = False
+            current_app.logger.exception("Failed to queue campaign")
+            db.session.rollback()
+            progress = campaign_progress.setdefault(campaign_id, {'logs': []})
+            progress['logs'].append(f"[ERROR] Worker exception: {str(ex)}")
+            progress['is_active'] = False
+            if joined:
+                # other workers are sending it: give this worker's rows back and leave the status alone
+                campaign_queue.remove(campaign_id)
+                campaign_runs.pop(campaign_id, None)
+                try:
+                    _release_leases(campaign_id)
+                except Exception:
+                    db.session.rollback()
+                return
             try:
                 campaign = Campaign.query.get(campaign_id)
                 if campaign:
@@ -408,23 +1309,236 @@ def process_campaign_async(campaign_id, attachment_path=None):
                     db.session.commit()
             except Exception:
                 pass
+
+
+@sender_operation
+def start_campaign(campaign_id, attachment_path=None):
+    """Queue a campaign in the background; the caller doesn't wait for its recipients to load."""
+    thread = threading.Thread(target=process_campaign_async, args=(campaign_id, attachment_path))
+    thread.daemon = True
+    thread.start()
+
+
+def _stale_preparing_clause():
+    """Campaign left 'preparing' by a worker that sent no heartbeat for LEASE_SECONDS."""
+    stale = datetime.now() - timedelta(seconds=LEASE_SECONDS)
+    return db.and_(
+        Campaign.status == 'preparing',
+        db.or_(Campaign.updated_at.is_(None), Campaign.updated_at < stale)
+    )
+
+
+def _stale_preparing():
+    return [cid for (cid,) in db.session.query(Campaign.id).filter(_stale_preparing_clause())]
+
+
+def take_over_stale_preparing():
+    """Scheduled job: prepare again the campaigns whose preparing worker died."""
+    with app.app_context():
+        try:
+            campaign_ids = _stale_preparing()
+        except Exception:
+            app.logger.exception("Stale preparing check failed")
+            db.session.rollback()
+            return
+        for campaign_id in campaign_ids:
+            app.logger.info(f"Taking over preparation of campaign {campaign_id} as worker {WORKER_ID}.")
+            process_campaign_async(campaign_id)
+
+
+def join_running_campaigns():
+    """
+    Scheduled job (CLUSTER_POLL_SECONDS): join running campaigns that have recipients no worker holds,
+    and take over the preparation of campaigns whose preparing worker died.
+    """
+    with app.app_context():
+        try:
+            now = datetime.now()
+            unclaimed = db.exists().where(
+                CampaignRecipient.campaign_id == Campaign.id,
+                CampaignRecipient.status == 'pending',
+                db.or_(CampaignRecipient.lease_expires_at.is_(None), CampaignRecipient.lease_expires_at < now)
+            )
+            campaign_ids = [cid for (cid,) in db.session.query(Campaign.id).filter(Campaign.status == 'running', unclaimed)]
+            campaign_ids += _stale_preparing()
+        except Exception:
+            app.logger.exception("Cluster join poll failed")
+            db.session.rollback()
+            return
+        for campaign_id in campaign_ids:
+            if campaign_id not in campaign_runs:
+                app.logger.info(f"Joining campaign {campaign_id} as worker {WORKER_ID}.")
+                process_campaign_async(campaign_id)
+
+
+@sender_operation
+def campaign_progress_snapshot(campaign_id):
+    """Copy of the live progress record of a dispatched campaign, or None."""
+    progress = campaign_progress.get(campaign_id)
+    if progress is None:
+        return None
+    return dict(progress, logs=list(progress.get('logs', [])))
+
+
+# --- Delivery/read receipts ---
+# The chat list already shows the tick state of each chat's last message, and ticks on the last
+# message imply the same for everything before it. A periodic sweep reads the list in bulk (no chat
+# is reopened) and advances recent recipients from sent to delivered/read.
+RECEIPT_RANK = {status: rank for rank, status in enumerate(SENT_STATUSES)}
+RECEIPT_UPDATE_BATCH = 500
+
+
+def _phone_key(phone):
+    """Last 10 digits, so numbers match with or without the country code shown in the chat list."""
+    return digits_only(phone)[-10:]
+
+
+def _receipt_candidates():
+    """Recipients of recently finished campaigns whose ticks can still advance, indexed by phone and name."""
+    since = datetime.now() - timedelta(days=int(CONFIG['receipt_sweep_days']))
+    rows = db.session.query(
+        CampaignRecipient.id, CampaignRecipient.status,
+        CampaignRecipient.recipient_phone, CampaignRecipient.recipient_name
+    ).join(Campaign, Campaign.id == CampaignRecipient.campaign_id).filter(
+        Campaign.status.in_(('completed', 'partial_failed')),
+        Campaign.created_at >= since,
+        CampaignRecipient.status.in_(('sent', 'delivered'))
+    ).yield_per(1000)
+    by_phone, names = {}, {}
+    for recipient_id, status, phone, name in rows:
+        key = _phone_key(phone)
+        by_phone.setdefault(key, []).append((recipient_id, status))
+        if name:
+            names.setdefault(name.strip().lower(), set()).add(key)
+    # a saved-contact title only identifies a recipient when no two numbers share the name
+    by_name = {name: by_phone[next(iter(keys))] for name, keys in names.items() if len(keys) == 1}
+    return by_phone, by_name
+
+
+def _apply_receipts(updates):
+    """Write {recipient_id: status} grouped by status in id batches, as one transaction."""
+    by_status = {}
+    for recipient_id, status in updates.items():
+        by_status.setdefault(status, []).append(recipient_id)
+    for status, ids in by_status.items():
+        for i in range(0, len(ids), RECEIPT_UPDATE_BATCH):
+            CampaignRecipient.query.filter(
+                CampaignRecipient.id.in_(ids[i:i + RECEIPT_UPDATE_BATCH])
+            ).update({'status': status}, synchronize_session=False)
+    db.session.commit()
+
+
+def sweep_receipts():
+    """
+    Scheduled job: harvest delivered/read ticks from the chat list for recent campaigns.
+    Only runs on an idle, logged-in session and hands the browser back as soon as a campaign starts.
+    """
+    with app.app_context():
+        if campaign_runs or not _browser_lock.acquire(blocking=False):
+            return
+        try:
+            sender = whatsapp_sender
+            # never start a browser (or interrupt a QR login) just for receipts
+            if sender is None or sender.is_busy() or not sender.get_connection_status():
+                return
+            by_phone, by_name = _receipt_candidates()
+            if not by_phone:
+                return
+
+            updates = {}
+            batches = sender.harvest_receipts(
+                should_stop=lambda: bool(campaign_runs),
+                pause=float(CONFIG['receipt_sweep_pause'])
+            )
+            for batch in batches:
+                for title, state in batch:
+                    if len(digits_only(title)) >= 8:
+                        entries = by_phone.get(_phone_key(title))
+                    else:
+                        entries = by_name.get(title.strip().lower())
+                    for recipient_id, status in entries or ():
+                        if RECEIPT_RANK[state] > RECEIPT_RANK[updates.get(recipient_id, status)]:
+                            updates[recipient_id] = state
+            if updates:
+                _apply_receipts(updates)
+            app.logger.info(f"Receipt sweep updated {len(updates)} recipient(s).")
+        except Exception:
+            app.logger.exception("Receipt sweep failed")
+            db.session.rollback()
         finally:
-            whatsapp_sender.busy = False
+            _browser_lock.release()
+
+# --- Conditional GETs ---
+# Dashboards poll the list endpoints. Each response carries an ETag built from version stamps that
+# only change on writes (table triggers, or counters for settings and the scheduler kept with the sessions), so
+# a poll that finds nothing new is answered 304 without loading or serialising any rows.
+_BOOT_ID = uuid.uuid4().hex[:8]
+_local_versions = {'settings': 0, 'scheduler': 0}
+_local_versions_lock = threading.Lock()
+
+
+def _bump_version(name):
+    with _local_versions_lock:
+        _local_versions[name] += 1
+
+
+def _version_tag(*names):
+    """ETag value for the current version of tables and/or in-process stamps."""
+    tables = [n for n in names if n not in _local_versions]
+    versions = dict(db.session.query(TableVersion.table_name, TableVersion.version).filter(
+        TableVersion.table_name.in_(tables)
+    )) if tables else {}
+    for n in names:
+        if n in _local_versions:
+            # settings and schedule live with the sessions, possibly in the sender daemon
+            versions[n] = _sender_call('local_version', n)
+    # table versions live in the database, so every web worker builds the same tag for the same data
+    return '-'.join(f"{n}.{versions.get(n, 0)}" for n in names)
+
+
+def _conditional(tag, build):
+    """304 Not Modified when the client already holds `tag`, else build() with the tag attached."""
+    if request.if_none_match.contains_weak(tag):
+        response = Response(status=304)
+    else:
+        response = make_response(build())
+    response.set_etag(tag, weak=True)
+    # browsers keep the copy but revalidate it on every request
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _scheduler_changed(event):
+    _bump_version('scheduler')
+
+
+@sender_operation
+def local_version(name):
+    # carries the process's boot id: a restart puts the counters back at 0, which must not match old tags
+    return f"{_BOOT_ID}.{_local_versions[name]}"
+
+
+scheduler.add_listener(
+    _scheduler_changed,
+    EVENT_JOB_ADDED | EVENT_JOB_REMOVED | EVENT_JOB_MODIFIED | EVENT_JOB_SUBMITTED | EVENT_ALL_JOBS_REMOVED
+)
 
 # Dashboard Routes
 @app.route('/')
 def dashboard():
     """Main dashboard with statistics"""
-    customers_count = Customer.query.count()
-    campaigns_list = Campaign.query.all()
-    stats = {
-        'total_customers': customers_count,
-        'total_campaigns': len(campaigns_list),
-        'active_campaigns': len([c for c in campaigns_list if c.status == 'active']),
-        'completed_campaigns': len([c for c in campaigns_list if c.status == 'completed'])
-    }
-    recent_campaigns = Campaign.query.order_by(Campaign.created_at.desc()).limit(5).all()
-    return render_template('dashboard.html', stats=stats, recent_campaigns=recent_campaigns)
+    def render():
+        customers_count = Customer.query.count()
+        campaigns_list = Campaign.query.all()
+        stats = {
+            'total_customers': customers_count,
+            'total_campaigns': len(campaigns_list),
+            'active_campaigns': len([c for c in campaigns_list if c.status == 'active']),
+            'completed_campaigns': len([c for c in campaigns_list if c.status == 'completed'])
+        }
+        recent_campaigns = Campaign.query.order_by(Campaign.created_at.desc()).limit(5).all()
+        return render_template('dashboard.html', stats=stats, recent_campaigns=recent_campaigns)
+    return _conditional(_version_tag('customer', 'campaign'), render)
 
 @app.route('/customers')
 def customers():
@@ -447,7 +1561,8 @@ def whatsapp_connection():
 @app.route('/settings')
 def settings():
     """Settings dashboard"""
-    return render_template('settings.html', config=CONFIG)
+    # the sender daemon holds the live settings once they have been changed at runtime
+    return render_template('settings.html', config=_sender_call('current_config'))
 
 @app.route('/api/campaigns/<int:campaign_id>/progress', methods=['GET'])
 def get_campaign_progress(campaign_id):
@@ -457,18 +1572,41 @@ def get_campaign_progress(campaign_id):
 
         # Get campaign recipients for accurate counts
         total_recipients = CampaignRecipient.query.filter_by(campaign_id=campaign_id).count()
-        sent_count = CampaignRecipient.query.filter_by(campaign_id=campaign_id, status='sent').count()
+        sent_count = CampaignRecipient.query.filter(
+            CampaignRecipient.campaign_id == campaign_id,
+            CampaignRecipient.status.in_(SENT_STATUSES)
+        ).count()
+        delivered_count = CampaignRecipient.query.filter(
+            CampaignRecipient.campaign_id == campaign_id,
+            CampaignRecipient.status.in_(('delivered', 'read'))
+        ).count()
+        read_count = CampaignRecipient.query.filter_by(campaign_id=campaign_id, status='read').count()
         failed_count = CampaignRecipient.query.filter_by(campaign_id=campaign_id, status='failed').count()
         pending_count = CampaignRecipient.query.filter_by(campaign_id=campaign_id, status='pending').count()
-        processed_count = sent_count + failed_count
+        skipped_count = CampaignRecipient.query.filter_by(campaign_id=campaign_id, status='skipped').count()
+        processed_count = sent_count + failed_count + skipped_count
+        # recipients each worker holds right now (several hosts can share one campaign)
+        workers = dict(db.session.query(CampaignRecipient.lease_owner, db.func.count()).filter(
+            CampaignRecipient.campaign_id == campaign_id,
+            CampaignRecipient.status == 'pending',
+            CampaignRecipient.lease_expires_at >= datetime.now()
+        ).group_by(CampaignRecipient.lease_owner).all())
 
         # Check if this campaign is currently active/running
-        is_active = campaign.status in ['running', 'queued']
+        is_active = campaign.status in ['running', 'queued', 'preparing']
 
         # If this is the active campaign, return real-time progress
-        if is_active and current_progress['is_active']:
-            progress_data = current_progress.copy()
+        progress = _sender_call('campaign_progress_snapshot', campaign_id) if is_active else None
+        if is_active and progress and progress.get('is_active'):
+            progress_data = progress.copy()
+            # counts come from the database, so they cover every worker, not just this one
             progress_data.update({
+                'current': processed_count,
+                'total': total_recipients,
+                'success_count': sent_count,
+                'failure_count': failed_count,
+                'skipped_count': skipped_count,
+                'workers': workers,
                 'campaign_id': campaign_id,
                 'campaign_name': campaign.name,
                 'campaign_status': campaign.status
@@ -481,9 +1619,13 @@ def get_campaign_progress(campaign_id):
                 'current': processed_count,
                 'total': total_recipients,
                 'success_count': sent_count,
+                'delivered_count': delivered_count,
+                'read_count': read_count,
                 'failure_count': failed_count,
                 'pending_count': pending_count,
-                'logs': current_progress.get('logs', [f"Campaign '{campaign.name}' status: {campaign.status}"]),
+                'skipped_count': skipped_count,
+                'workers': workers,
+                'logs': progress['logs'] if progress else [f"Campaign '{campaign.name}' status: {campaign.status}"],
                 'campaign_status': campaign.status,
                 'campaign_id': campaign_id,
                 'campaign_name': campaign.name
@@ -495,14 +1637,18 @@ def get_campaign_progress(campaign_id):
 @app.route('/api/customers', methods=['GET'])
 def get_customers():
     """Get all customers"""
-    customers_list = Customer.query.all()
-    return jsonify([customer.to_dict() for customer in customers_list])
+    return _conditional(
+        _version_tag('customer'),
+        lambda: jsonify([customer.to_dict() for customer in Customer.query.all()])
+    )
 
 @app.route('/api/campaigns', methods=['GET'])
 def get_campaigns():
     """Get all campaigns"""
-    campaigns_list = Campaign.query.all()
-    return jsonify([campaign.to_dict() for campaign in campaigns_list])
+    return _conditional(
+        _version_tag('campaign'),
+        lambda: jsonify([campaign.to_dict() for campaign in Campaign.query.all()])
+    )
 
 # Customer Management API Endpoints
 @app.route('/api/customers', methods=['POST'])
@@ -514,21 +1660,28 @@ def add_customer():
         # Validate required fields
         if not data.get('name') or not data.get('phone'):
             return jsonify({'error': 'Name and phone are required'}), 400
+        # stored as E.164 digits; campaign preparation still normalizes rows written before this
+        phone = normalize_phone(data['phone'])
+        if not phone:
+            return jsonify({'error': f"Invalid phone number: {data['phone']}"}), 400
 
         # Check if phone already exists
-        existing_customer = Customer.query.filter_by(phone=data['phone']).first()
+        existing_customer = Customer.query.filter_by(phone=phone).first()
         if existing_customer:
             return jsonify({'error': 'Customer with this phone number already exists'}), 400
 
         # Create new customer
         customer = Customer(
             name=data['name'],
-            phone=data['phone'],
+            phone=phone,
             email=data.get('email', ''),
-            status=data.get('status', 'Opted In')
+            status=data.get('status', 'Opted In'),
+            custom_fields=json.dumps(data['custom_fields']) if data.get('custom_fields') else None
         )
 
         db.session.add(customer)
+        db.session.flush()
+        _refresh_segment_members([customer.id])
         db.session.commit()
 
         return jsonify({'message': 'Customer added successfully', 'customer': customer.to_dict()}), 201
@@ -554,16 +1707,23 @@ def update_customer(customer_id):
         if 'name' in data:
             customer.name = data['name']
         if 'phone' in data:
+            phone = normalize_phone(data['phone'])
+            if not phone:
+                return jsonify({'error': f"Invalid phone number: {data['phone']}"}), 400
             # Check if new phone already exists for another customer
-            existing = Customer.query.filter(Customer.phone == data['phone'], Customer.id != customer_id).first()
+            existing = Customer.query.filter(Customer.phone == phone, Customer.id != customer_id).first()
             if existing:
                 return jsonify({'error': 'Phone number already exists'}), 400
-            customer.phone = data['phone']
+            customer.phone = phone
         if 'email' in data:
             customer.email = data['email']
         if 'status' in data:
             customer.status = data['status']
+        if 'custom_fields' in data:
+            customer.custom_fields = json.dumps(data['custom_fields']) if data['custom_fields'] else None
 
+        db.session.flush()
+        _refresh_segment_members([customer_id])
         db.session.commit()
         return jsonify({'message': 'Customer updated successfully', 'customer': customer.to_dict()})
 
@@ -573,7 +1733,7 @@ def update_customer(customer_id):
 
 @app.route('/api/customers/<int:customer_id>', methods=['DELETE'])
 def delete_customer(customer_id):
-    """Delete a customer"""
+    """Delete a customer (its segment memberships go with it through the FK cascade)"""
     try:
         customer = Customer.query.get_or_404(customer_id)
         db.session.delete(customer)
@@ -586,7 +1746,7 @@ def delete_customer(customer_id):
 
 @app.route('/api/customers/upload', methods=['POST'])
 def upload_customers():
-    """Upload customers from Excel file"""
+    """Upload customers from an Excel, CSV or Parquet file"""
     try:
         if 'file' not in request.files:
             print("file issue")
@@ -599,15 +1759,19 @@ def upload_customers():
 
         if not allowed_file(file.filename, 'recipients'):
             print("123")
-            return jsonify({'error': 'Invalid file format. Please upload Excel files only.'}), 400
+            return jsonify({'error': 'Invalid file format. Please upload an Excel, CSV or Parquet file.'}), 400
 
-        # Save file
+        data = file.read()
         filename = secure_filename(file.filename)
         filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
 
-        # Read Excel file
-        df = pd.read_excel(filepath)
+        def parse_upload():
+            # only a workbook not seen before is saved and parsed
+            with open(filepath, 'wb') as f:
+                f.write(data)
+            return read_table(data, filename)
+
+        df = normalize_columns(UPLOAD_CACHE.load(data, parse_upload))
         print(df.head(1))
         # Validate columns
         required_columns = ['Name', 'Contact']
@@ -620,16 +1784,23 @@ def upload_customers():
         added_customers = []
         errors = []
         print("congrats u came till here")
+        # Any other column (City, Message, ...) is kept as a custom field for message placeholders
+        extra_columns = [col for col in df.columns if col not in ('Name', 'Contact', 'Email')]
+        # stored as E.164 digits, so the same number written two ways is one customer
+        phones = normalize_contacts(df['Contact'])
 
         for index, row in df.iterrows():
             try:
-                name = str(row['Name']).strip()
-                phone = str(row['Contact']).strip()
+                name = str(row['Name']).strip() if pd.notna(row['Name']) else ''
+                phone = phones[index]
                 email = str(row.get('Email', '')).strip() if pd.notna(row.get('Email')) else ''
 
-                if not name or not phone:
+                if not name or pd.isna(row['Contact']):
                     errors.append(f'Row {index + 2}: Name and Phone are required')
                     continue
+                if not phone:
+                    errors.append(f"Row {index + 2}: Invalid phone number {str(row['Contact']).strip()}")
+                    continue
 
                 # Check if customer already exists
                 existing = Customer.query.filter_by(phone=phone).first()
@@ -637,7 +1808,13 @@ def upload_customers():
                     errors.append(f'Row {index + 2}: Customer with phone {phone} already exists')
                     continue
                 print("hi")
-                customer = Customer(name=name, phone=phone, email=email)
+                extras = {str(col): row[col] for col in extra_columns if pd.notna(row[col])}
+                customer = Customer(
+                    name=name,
+                    phone=phone,
+                    email=email,
+                    custom_fields=json.dumps(extras, default=str) if extras else None
+                )
                 print("hi2")
                 db.session.add(customer)
                 print("")
@@ -649,6 +1826,8 @@ def upload_customers():
                 print(e)
                 errors.append(f'Row {index + 2}: {str(e)}')
         print("loop done")
+        db.session.flush()
+        _refresh_segment_members([customer.id for customer in added_customers])
         db.session.commit()
 
         # Clean up uploaded file
@@ -663,6 +1842,89 @@ def upload_customers():
         db.session.rollback()
         return jsonify({'error': f'Failed to process file: {str(e)}'}), 500
 
+# Segment API Endpoints
+def _segment_counts():
+    return dict(
+        db.session.query(SegmentMember.segment_id, db.func.count()).group_by(SegmentMember.segment_id).all()
+    )
+
+def _segment_from_request(segment):
+    data = request.get_json(force=True) or {}
+    if 'name' in data or segment.name is None:
+        name = str(data.get('name') or '').strip()
+        if not name:
+            raise ValueError('Segment name is required')
+        if Segment.query.filter(Segment.name == name, Segment.id != segment.id).first():
+            raise ValueError('A segment with this name already exists')
+        segment.name = name
+    if 'filters' in data or segment.filters is None:
+        segment.filters = json.dumps(parse_segment_filters(data.get('filters', [])))
+
+@app.route('/api/segments', methods=['GET'])
+def get_segments():
+    """List saved segments with their current member counts"""
+    counts = _segment_counts()
+    return jsonify([s.to_dict(counts.get(s.id, 0)) for s in Segment.query.order_by(Segment.name).all()])
+
+@app.route('/api/segments', methods=['POST'])
+def add_segment():
+    """Save a segment and materialise its members"""
+    try:
+        segment = Segment()
+        _segment_from_request(segment)
+        db.session.add(segment)
+        db.session.flush()
+        _refresh_segment_members(segments=[segment])
+        db.session.commit()
+        return jsonify({'message': 'Segment saved successfully', 'segment': segment.to_dict(_segment_counts().get(segment.id, 0))}), 201
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to save segment: {str(e)}'}), 500
+
+@app.route('/api/segments/<int:segment_id>', methods=['PUT'])
+def update_segment(segment_id):
+    """Rename a segment or change its filters (members are recomputed)"""
+    try:
+        segment = Segment.query.get_or_404(segment_id)
+        _segment_from_request(segment)
+        db.session.flush()
+        _refresh_segment_members(segments=[segment])
+        db.session.commit()
+        return jsonify({'message': 'Segment updated successfully', 'segment': segment.to_dict(_segment_counts().get(segment.id, 0))})
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to update segment: {str(e)}'}), 500
+
+@app.route('/api/segments/<int:segment_id>/refresh', methods=['POST'])
+def refresh_segment(segment_id):
+    """Recompute a segment from scratch, e.g. after customers were changed outside the API"""
+    try:
+        segment = Segment.query.get_or_404(segment_id)
+        _refresh_segment_members(segments=[segment])
+        db.session.commit()
+        return jsonify({'message': 'Segment refreshed', 'segment': segment.to_dict(_segment_counts().get(segment.id, 0))})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to refresh segment: {str(e)}'}), 500
+
+@app.route('/api/segments/<int:segment_id>', methods=['DELETE'])
+def delete_segment(segment_id):
+    """Delete a segment (its members go with it; campaigns already created keep their recipients)"""
+    try:
+        segment = Segment.query.get_or_404(segment_id)
+        db.session.delete(segment)
+        db.session.commit()
+        return jsonify({'message': 'Segment deleted successfully'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to delete segment: {str(e)}'}), 500
+
 # Campaign Management API Endpoints
 
 def create_campaign(status=None):
@@ -670,6 +1932,7 @@ def create_campaign(status=None):
     attachment_path = None
     recipients_list = []
     scheduled_date_str = None
+    deadline_str = None
 
     # --- Part 1: Get data from the request ---
 
@@ -681,7 +1944,9 @@ def create_campaign(status=None):
         description = data.get('description', '')
         file = request.files.get('attachment')
         scheduled_date_str = data.get('scheduled_date')
+        deadline_str = data.get('deadline')
         recipients_list = json.loads(data.get('recipients', '[]'))
+        segment_id = data.get('segment_id')
         status = status or data.get('status') or ('scheduled' if scheduled_date_str else 'queued')
 
     else: # This path is for JSON requests like 'Save as Draft'
@@ -691,14 +1956,22 @@ def create_campaign(status=None):
         description = data.get('description', '')
         status = status or data.get('status')
         recipients_list = data.get('recipients', [])
+        segment_id = data.get('segment_id')
+        deadline_str = data.get('deadline')
         file = None
+    priority = data.get('priority') or 1
+    broadcast = str(data.get('broadcast', '')).lower() in ('1', 'true', 'on', 'yes')
 
     # --- Part 2: Validate the data ---
 
     if not name or not message:
         raise ValueError({'error': 'Campaign name and message are required'})
 
-    if not recipients_list:
+    segment = Segment.query.get(int(segment_id)) if segment_id else None
+    if segment_id and segment is None:
+        raise ValueError({'error': 'Segment not found'})
+
+    if not recipients_list and segment is None:
         raise ValueError({'error': 'Recipients list is required'})
 
     # ---Part 4: Save attachment (if provided)---
@@ -712,6 +1985,9 @@ def create_campaign(status=None):
             status=status,
             created_at=datetime.now(),
             scheduled_at=datetime.fromisoformat(scheduled_date_str) if scheduled_date_str else None,
+            priority=max(int(priority), 1),
+            deadline=datetime.fromisoformat(deadline_str) if deadline_str else None,
+            broadcast=broadcast,
         )
     except Exception as e:
         raise ValueError(f"Failed to create campaign: {str(e)}")
@@ -728,10 +2004,13 @@ def create_campaign(status=None):
                 customer_id=cid,
                 status='pending',
                 recipient_name=cust.name,  # <-- Add the customer's name
-                recipient_phone=cust.phone  # <-- Add the customer's phone
+                recipient_phone=normalize_phone(cust.phone) or cust.phone
             )
             db.session.add(cr)
 
+    if segment is not None:
+        _add_segment_recipients(campaign.id, segment.id)
+
     if file and file.filename != '':
         if not allowed_file(file.filename, 'attachments'):
             raise ValueError({'error': 'Attachment type not allowed'})
@@ -740,12 +2019,28 @@ def create_campaign(status=None):
         saved_path = os.path.join(UPLOAD_FOLDER, filename)
         print("LOCATion were the files gets saved",saved_path)
         file.save(saved_path)
-        if hasattr(campaign, 'attachment'):
-            campaign.attachment = filename
+        campaign.attachment_path = saved_path
         attachment_path=saved_path
 
     return campaign, attachment_path
 
+def _add_segment_recipients(campaign_id, segment_id):
+    """Copy a segment's members into the campaign with one INSERT ... SELECT."""
+    now = db.literal(datetime.now(), db.DateTime)
+    members = db.select(
+        db.literal(campaign_id), Customer.id, db.literal('pending'), db.literal(0),
+        Customer.name, Customer.phone, now, now
+    ).select_from(SegmentMember).join(Customer, Customer.id == SegmentMember.customer_id).where(
+        SegmentMember.segment_id == segment_id
+    )
+    # numbers are normalised when the campaign loads, as for any other stored recipient_phone
+    db.session.execute(CampaignRecipient.__table__.insert().from_select(
+        ['campaign_id', 'customer_id', 'status', 'attempts', 'recipient_name', 'recipient_phone',
+         'created_at', 'updated_at'],
+        members
+    ))
+
+@sender_operation
 def schedule_campaign_job(campaign_id, attachment_path):
     """Adds a campaign sending task to the scheduler's job list."""
     with app.app_context():
@@ -754,27 +2049,88 @@ def schedule_campaign_job(campaign_id, attachment_path):
             app.logger.warning(f"Could not schedule campaign {campaign_id}: Campaign not found or has no scheduled date.")
             return
 
-        job_id = f'campaign__{campaign.id}'
-
         try:
-            # Convert datetime to UTC to avoid timezone serialization issues
-            # from datetime import timezone
-            # run_date = campaign.scheduled_at.replace(tzinfo=timezone.utc) if campaign.scheduled_at.tzinfo is None else campaign.scheduled_at
-            # print(run_date,"this is the run date")
-            scheduler.add_job(
-                id=job_id,
-                func=process_campaign_async,
-                trigger='date',
-                run_date=campaign.scheduled_at,
-                args=[campaign.id, attachment_path],
-                replace_existing=True
-            )
-            # Log the successful scheduling of the job
-            #app.logger.info(f"Successfully scheduled campaign {campaign_id} with job ID {job_id} to run at {run_date}.")
+            _add_campaign_job(campaign.id, campaign.scheduled_at, attachment_path)
         except Exception as e:
             # Log any errors that occur during scheduling
             app.logger.error(f"Failed to schedule campaign {campaign_id}: {e}", exc_info=True)
 
+def _add_campaign_job(campaign_id, run_date, attachment_path):
+    scheduler.add_job(
+        id=f'campaign__{campaign_id}',
+        func=process_campaign_async,
+        trigger='date',
+        run_date=run_date,
+        args=[campaign_id, attachment_path],
+        replace_existing=True
+    )
+
+@sender_operation
+def restore_scheduled_campaigns():
+    """
+    Rebuild the in-memory schedule from the campaign table. The database stays the source of truth:
+    only status transitions (scheduled -> running/cancelled) are ever written back.
+    """
+    rows = db.session.query(Campaign.id, Campaign.scheduled_at, Campaign.attachment_path).filter(
+        Campaign.status == 'scheduled',
+        Campaign.scheduled_at.isnot(None)
+    ).yield_per(1000)
+    restored = 0
+    for campaign_id, scheduled_at, attachment_path in rows:
+        _add_campaign_job(campaign_id, scheduled_at, attachment_path)
+        restored += 1
+    app.logger.info(f"Restored {restored} scheduled campaign(s).")
+    return restored
+
+# Rebuild the schedule before the scheduler starts so the jobs are added in one batch
+# (the sender daemon does both itself when sessions run there)
+if sender_rpc is None:
+    with app.app_context():
+        restore_scheduled_campaigns()
+
+if int(CONFIG['receipt_sweep_minutes']) > 0:
+    scheduler.add_job(
+        id='receipt_sweep',
+        func=sweep_receipts,
+        trigger='interval',
+        minutes=int(CONFIG['receipt_sweep_minutes']),
+        max_instances=1,
+        replace_existing=True
+    )
+
+scheduler.add_job(
+    id='lease_renewal',
+    func=_renew_leases,
+    trigger='interval',
+    seconds=max(LEASE_SECONDS // 3, 1),
+    max_instances=1,
+    replace_existing=True
+)
+
+if int(CONFIG['cluster_poll_seconds']) > 0:
+    scheduler.add_job(
+        id='cluster_join',
+        func=join_running_campaigns,
+        trigger='interval',
+        seconds=int(CONFIG['cluster_poll_seconds']),
+        max_instances=1,
+        replace_existing=True
+    )
+else:
+    # the join poll covers this when it runs
+    scheduler.add_job(
+        id='prepare_takeover',
+        func=take_over_stale_preparing,
+        trigger='interval',
+        seconds=LEASE_SECONDS,
+        max_instances=1,
+        replace_existing=True
+    )
+
+# Call the function to start the scheduler
+if sender_rpc is None:
+    start_scheduler()
+
 
 @app.route('/api/campaigns/draft', methods=['POST'])
 def save_campaign_draft():
@@ -802,12 +2158,10 @@ def send_campaign():
         db.session.commit()
 
         if campaign.status == 'queued':
-            thread = threading.Thread(target=process_campaign_async, args=(campaign.id, attachment_path))
-            thread.daemon = True
-            thread.start()
+            _sender_call('start_campaign', campaign.id, attachment_path)
         elif campaign.status == 'scheduled':
             # ADD THIS: Use the scheduler for 'scheduled' status
-            schedule_campaign_job(campaign.id, attachment_path)
+            _sender_call('schedule_campaign_job', campaign.id, attachment_path)
 
         return jsonify({'message': 'Campaign sent successfully', 'campaign': campaign.to_dict()}), 201
 
@@ -858,23 +2212,20 @@ def cancel_campaign(campaign_id):
         campaign = Campaign.query.get_or_404(campaign_id)
 
         # You can only cancel campaigns that are in these states
-        valid_states_to_cancel = ['queued', 'running', 'scheduled']
+        valid_states_to_cancel = ['queued', 'preparing', 'running', 'scheduled']
         if campaign.status not in valid_states_to_cancel:
             return jsonify({'error': f"Cannot cancel a campaign with status '{campaign.status}'"}), 400
 
         # If the campaign is scheduled, remove it from the scheduler directly
         if campaign.status == 'scheduled':
-            job_id = f'campaign__{campaign.id}'
-            if scheduler.get_job(job_id):
-                scheduler.remove_job(job_id)
-                app.logger.info(f"Removed scheduled job {job_id} for campaign {campaign_id}.")
+            _sender_call('unschedule_campaign', campaign.id)
             
             # Directly mark as cancelled
             campaign.status = 'cancelled'
             message = 'Scheduled campaign has been cancelled successfully.'
 
         # If it's already running or waiting in the queue, request a stop
-        else: # Status is 'queued' or 'running'
+        else: # Status is 'queued', 'preparing' or 'running'
             campaign.status = 'cancel_requested'
             message = 'Cancellation has been requested for the active campaign.'
 
@@ -886,9 +2237,17 @@ def cancel_campaign(campaign_id):
         app.logger.error(f"Failed to cancel campaign {campaign_id}: {e}")
         return jsonify({'error': 'An unexpected error occurred while trying to cancel the campaign.'}), 500
 
-@app.route('/api/scheduler/jobs', methods=['GET']) #campaign schedule job endpoints
-def list_scheduled_jobs():
-    """An endpoint to view all currently scheduled jobs."""
+@sender_operation
+def unschedule_campaign(campaign_id):
+    job_id = f'campaign__{campaign_id}'
+    if scheduler.get_job(job_id):
+        scheduler.remove_job(job_id)
+        app.logger.info(f"Removed scheduled job {job_id} for campaign {campaign_id}.")
+        return True
+    return False
+
+@sender_operation
+def scheduled_jobs():
     jobs_list = []
     for job in scheduler.get_jobs():
         jobs_list.append({
@@ -897,11 +2256,54 @@ def list_scheduled_jobs():
             'trigger': str(job.trigger),
             'next_run_time': str(job.next_run_time)
         })
-    return jsonify(jobs=jobs_list)
+    return jobs_list
+
+@sender_operation
+def dispatch_queue():
+    return {
+        'depth': campaign_queue.depth(),
+        'active_campaigns': len(campaign_queue),
+        'sessions': len(SESSION_NAMES),
+        'avg_send_seconds': round(campaign_queue.avg_send_seconds, 2),
+        'campaigns': campaign_queue.snapshot(),
+    }
+
+@sender_operation
+def render_metrics():
+    QUEUE_DEPTH.set(campaign_queue.depth())
+    ACTIVE_CAMPAIGNS.set(len(campaign_queue))
+    for name in SESSION_NAMES:
+        worker = _session_workers.get(name)
+        browser_up = whatsapp_sender is not None and whatsapp_sender.driver is not None
+        SESSIONS_ALIVE.set(1 if worker and worker.is_alive() and browser_up else 0, session=name)
+    return REGISTRY.render()
+
+@app.route('/api/scheduler/jobs', methods=['GET']) #campaign schedule job endpoints
+def list_scheduled_jobs():
+    """An endpoint to view all currently scheduled jobs."""
+    return _conditional(_version_tag('scheduler'), lambda: jsonify(jobs=_sender_call('scheduled_jobs')))
+
+@app.route('/api/scheduler/queue', methods=['GET'])
+def get_dispatch_queue():
+    """Campaigns waiting for or sharing the WhatsApp sessions, with expected start/finish times."""
+    upcoming = Campaign.query.filter_by(status='scheduled').order_by(Campaign.scheduled_at).all()
+    queue = _sender_call('dispatch_queue')
+    queue['scheduled'] = [{
+        'campaign_id': c.id,
+        'priority': c.priority or 1,
+        'expected_start': c.scheduled_at.isoformat() if c.scheduled_at else None
+    } for c in upcoming]
+    return jsonify(queue)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint: per-step send latency, outcomes, DB flush time, queue and session gauges."""
+    # the sends (and so the metrics) happen wherever the sessions run
+    return Response(_sender_call('render_metrics'), mimetype='text/plain; version=0.0.4')
 
 # QR Code API
-@app.route('/api/whatsapp/qr', methods=['GET'])
-def get_qr_code():
+@sender_operation
+def whatsapp_qr():
     """Get QR code from WhatsApp Web, keeping the browser session alive."""
     #print("api call for qr code")
 
@@ -917,28 +2319,28 @@ def get_qr_code():
 
         if qr_result == "already_connected":
             print("WhatsApp Web already connected")
-            return jsonify({
+            return {
                 'success': True,
                 'already_connected': True,
                 'message': 'WhatsApp Web is already connected.',
                 'timestamp': datetime.now().isoformat()
-            })
+            }
         elif qr_result:
             print("QR code captured successfully")
             # The browser is intentionally left open for the user to scan
-            return jsonify({
+            return {
                 'success': True,
                 'qr_code': qr_result,
                 'message': 'Scan the QR code in the new browser window.',
                 'timestamp': datetime.now().isoformat()
-            })
+            }
         else:
             print("QR code capture failed")
-            return jsonify({
+            return {
                 'success': False,
                 'message': 'Could not capture QR code. Please try again.',
                 'timestamp': datetime.now().isoformat()
-            })
+            }
 
     except Exception as e:
         print(f"Error in get_qr_code: {str(e)}")
@@ -946,33 +2348,33 @@ def get_qr_code():
         if whatsapp_sender:
             whatsapp_sender.quit_driver()
             whatsapp_sender = None
-        return jsonify({
+        return {
             'success': False,
             'message': f'An error occurred: {str(e)}',
             'timestamp': datetime.now().isoformat()
-        })
+        }
 
 # WhatsApp Connection API
-@app.route('/api/whatsapp/status', methods=['GET'])
-def get_whatsapp_status():
+@sender_operation
+def whatsapp_status():
     """Check WhatsApp connection status using the global sender instance."""
     try:
         whatsapp_sender = get_whatsapp_sender()
         if not whatsapp_sender.is_driver_active():
-            return jsonify({
+            return {
                 'connected': False,
                 'status': 'disconnected',
                 'message': 'Not connected. Please get QR code first.',
                 'timestamp': datetime.now().isoformat()
-            })
+            }
 
     except Exception as e:
-        return jsonify({
+        return {
             'connected': False,
             'status': 'error',
             'message': f'Connection check failed: {str(e)}',
             'timestamp': datetime.now().isoformat()
-        })
+        }
     try:
         if whatsapp_sender.get_connection_status():
             status = {
@@ -988,18 +2390,18 @@ def get_whatsapp_status():
                 'message': 'QR code scan required to connect',
                 'timestamp': datetime.now().isoformat()
             }
-        return jsonify(status)
+        return status
     except Exception as e:
-        return jsonify({
+        return {
             'connected': False,
             'status': 'error',
             'message': f'Connection check failed: {str(e)}',
             'timestamp': datetime.now().isoformat()
-        })
+        }
     
 #Disconnected API
-@app.route('/api/whatsapp/disconnect', methods=['POST'])
-def disconnect_whatsapp():
+@sender_operation
+def whatsapp_disconnect():
     """Disconnect the WhatsApp session."""
     global whatsapp_sender  # Directly access the global variable to modify it
     try:
@@ -1013,26 +2415,51 @@ def disconnect_whatsapp():
             whatsapp_sender = None
             message = "WhatsApp was already disconnected."
 
-        return jsonify({
+        return {
             'success': True,
             'message': message,
             'timestamp': datetime.now().isoformat()
-        })
+        }
 
     except Exception as e:
         # Ensure the variable is cleared even if an error occurs
         whatsapp_sender = None
-        return jsonify({
+        return {
             'success': False,
             'message': f'An error occurred during disconnection: {str(e)}',
             'timestamp': datetime.now().isoformat()
-        })
+        }
+
+@app.route('/api/whatsapp/qr', methods=['GET'])
+def get_qr_code():
+    """Get QR code from WhatsApp Web (the browser stays open for the scan)."""
+    return jsonify(_sender_call('whatsapp_qr'))
+
+@app.route('/api/whatsapp/status', methods=['GET'])
+def get_whatsapp_status():
+    """Check WhatsApp connection status."""
+    return jsonify(_sender_call('whatsapp_status'))
+
+@app.route('/api/whatsapp/disconnect', methods=['POST'])
+def disconnect_whatsapp():
+    """Disconnect the WhatsApp session."""
+    return jsonify(_sender_call('whatsapp_disconnect'))
 
 # Settings API
 @app.route('/api/settings', methods=['GET'])
 def get_settings():
     """Get current settings"""
-    return jsonify(CONFIG)
+    return _conditional(_version_tag('settings'), lambda: jsonify(_sender_call('current_config')))
+
+@sender_operation
+def current_config():
+    return dict(CONFIG)
+
+@sender_operation
+def update_config(values):
+    """Apply changed settings where the sessions run (.env keeps them for the next start)."""
+    CONFIG.update(values)
+    _bump_version('settings')
 
 #updating profile values
 @app.route('/api/settings/profile', methods=['POST'])
@@ -1054,8 +2481,7 @@ def update_settings_profile():
         set_key(dotenv_path, "CHROME_PROFILE_NAME", profile_name)
 
         # Also update the in-memory CONFIG for the current session
-        CONFIG['user_data_dir'] = user_data_dir
-        CONFIG['profile_name'] = profile_name
+        _sender_call('update_config', {'user_data_dir': user_data_dir, 'profile_name': profile_name})
 
         # Update the environment variables for the current running process
         os.environ['CHROME_USER_DATA_DIR'] = user_data_dir
@@ -1095,7 +2521,7 @@ def update_settings_webdriver():
             os.environ[key] = str(value)
         
         # 3. Finally, update the in-memory CONFIG dictionary so changes take effect immediately
-        CONFIG.update({
+        _sender_call('update_config', {
             'max_retries': str(settings_to_update['MAX_RETRIES']),
             'delay_between_messages': str(settings_to_update['DELAY_BETWEEN_MESSAGES']),
             'upload_timeout': str(settings_to_update['UPLOAD_TIMEOUT']),
@@ -1126,8 +2552,7 @@ def update_settings_api():
         set_key(dotenv_path, "MAX_FILE_SIZE_MB", str(max_file_size_mb))
         set_key(dotenv_path, "LOG_LEVEL", log_level)
         
-        CONFIG['max_file_size_mb'] = max_file_size_bytes
-        CONFIG['log_level'] = log_level
+        _sender_call('update_config', {'max_file_size_mb': max_file_size_bytes, 'log_level': log_level})
 
         os.environ['MAX_FILE_SIZE_MB'] = str(max_file_size_mb)
         os.environ['LOG_LEVEL'] = log_level
@@ -1139,45 +2564,97 @@ def update_settings_api():
         return jsonify({'error': 'Failed to update settings permanently'}), 500
 
 # Backup and Restore API
+BACKUP_FOLDER = os.path.join(UPLOAD_FOLDER, 'backups')
+
+def _backup_tables():
+    return [t for t in db.metadata.sorted_tables if t.name not in EXCLUDED_TABLES]
+
 @app.route('/api/backup', methods=['GET'])
 def create_backup():
-    """Create database backup"""
+    """
+    Create a database backup: every table streamed into a gzip-compressed NDJSON file.
+    ?mode=incremental exports only rows changed (and ids deleted) since the previous backup.
+    """
     try:
-        import json
-        from datetime import datetime
-
-        # Get all data
-        customers = Customer.query.all()
-        campaigns = Campaign.query.all()
-
-        backup_data = {
-            'timestamp': datetime.now().isoformat(),
-            'customers': [customer.to_dict() for customer in customers],
-            'campaigns': [campaign.to_dict() for campaign in campaigns],
-            'settings': CONFIG
-        }
-
-        # Save backup file
-        backup_filename = f"whatsapp_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        backup_path = os.path.join(UPLOAD_FOLDER, backup_filename)
+        mode = request.args.get('mode', 'full')
+        cut = datetime.now()
+        since = None
+        if mode == 'incremental':
+            last = BackupRecord.query.order_by(BackupRecord.cut_at.desc()).first()
+            if last is None:
+                return jsonify({'error': 'No previous backup to build on; create a full backup first'}), 400
+            # a second of overlap: tombstones have second resolution and replaying a row twice is harmless
+            since = last.cut_at - timedelta(seconds=1)
+        elif mode != 'full':
+            return jsonify({'error': 'mode must be full or incremental'}), 400
+
+        os.makedirs(BACKUP_FOLDER, exist_ok=True)
+        backup_filename = f"whatsapp_backup_{cut.strftime('%Y%m%d_%H%M%S')}_{mode}.ndjson.gz"
+        backup_path = os.path.join(BACKUP_FOLDER, backup_filename)
+
+        counts = write_backup(
+            db.engine, _backup_tables(), backup_path, settings=_sender_call('current_config'),
+            since=since, cut=cut, tombstones=DeletedRow.__table__
+        )
 
-        with open(backup_path, 'w') as f:
-            json.dump(backup_data, f, indent=2)
+        db.session.add(BackupRecord(kind=mode, filename=backup_filename, since=since, cut_at=cut))
+        if mode == 'full':
+            # older tombstones are only needed by deltas on top of older full backups
+            DeletedRow.query.filter(DeletedRow.deleted_at < cut - timedelta(seconds=1)).delete(synchronize_session=False)
+        db.session.commit()
 
         return jsonify({
             'message': 'Backup created successfully',
+            'kind': mode,
+            'since': since.isoformat() if since else None,
             'filename': backup_filename,
             'path': backup_path,
-            'customers_count': len(customers),
-            'campaigns_count': len(campaigns)
+            'customers_count': counts.get(Customer.__tablename__, 0),
+            'campaigns_count': counts.get(Campaign.__tablename__, 0),
+            'recipients_count': counts.get(CampaignRecipient.__tablename__, 0),
+            'deleted_count': counts.get('deleted', 0),
+            'size_bytes': os.path.getsize(backup_path)
         })
 
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': f'Failed to create backup: {str(e)}'}), 500
 
+@app.route('/api/backup/<path:filename>', methods=['GET'])
+def download_backup(filename):
+    """Download a backup file created by /api/backup"""
+    return send_from_directory(os.path.abspath(BACKUP_FOLDER), secure_filename(filename), as_attachment=True)
+
+def _restore_legacy_json(backup_data):
+    """Restore a backup written before the NDJSON format (customers and campaigns only)."""
+    Campaign.query.delete()
+    Customer.query.delete()
+
+    for customer_data in backup_data.get('customers', []):
+        db.session.add(Customer(
+            name=customer_data['name'],
+            phone=customer_data['phone'],
+            email=customer_data.get('email', ''),
+            status=customer_data.get('status', 'Opted In')
+        ))
+
+    for campaign_data in backup_data.get('campaigns', []):
+        db.session.add(Campaign(
+            name=campaign_data['name'],
+            description=campaign_data.get('description', ''),
+            message=campaign_data.get('message', ''),
+            status=campaign_data.get('status', 'draft')
+        ))
+
+    db.session.commit()
+    return {
+        Customer.__tablename__: len(backup_data.get('customers', [])),
+        Campaign.__tablename__: len(backup_data.get('campaigns', []))
+    }
+
 @app.route('/api/restore', methods=['POST'])
 def restore_backup():
-    """Restore from backup file"""
+    """Restore from backup file (parsed as it is read and bulk-inserted in one transaction)"""
     try:
         if 'file' not in request.files:
             return jsonify({'error': 'No backup file provided'}), 400
@@ -1186,50 +2663,62 @@ def restore_backup():
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
 
-        # Save uploaded file
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
-
-        # Read backup data
-        with open(filepath, 'r') as f:
-            backup_data = json.load(f)
-
-        # Clear existing data
-        Campaign.query.delete()
-        Customer.query.delete()
-
-        # Restore customers
-        for customer_data in backup_data.get('customers', []):
-            customer = Customer(
-                name=customer_data['name'],
-                phone=customer_data['phone'],
-                email=customer_data.get('email', ''),
-                status=customer_data.get('status', 'Opted In')
+        head = file.stream.read(2)
+        file.stream.seek(0)
+        if is_backup_file(head):
+            db.session.remove()
+            # the restore's own deletes leave tombstones, and earlier backups no longer chain onto it
+            counts = restore_ndjson_backup(
+                db.engine, _backup_tables(), file.stream,
+                clear=[DeletedRow.__table__, BackupRecord.__table__, SendHistory.__table__, SegmentMember.__table__]
             )
-            db.session.add(customer)
-
-        # Restore campaigns
-        for campaign_data in backup_data.get('campaigns', []):
-            campaign = Campaign(
-                name=campaign_data['name'],
-                description=campaign_data.get('description', ''),
-                message=campaign_data.get('message', ''),
-                status=campaign_data.get('status', 'draft')
-            )
-            db.session.add(campaign)
+        else:
+            counts = _restore_legacy_json(json.load(file.stream))
+            DeletedRow.query.delete()
+            BackupRecord.query.delete()
+            SendHistory.query.delete()
+            SegmentMember.query.delete()
+            db.session.commit()
 
+        # send history and segment membership are derived from the restored rows
+        _rebuild_send_history()
+        _refresh_segment_members()
         db.session.commit()
-
-        # Clean up uploaded file
-        os.remove(filepath)
+        # scheduled campaigns in the backup get their jobs back
+        _sender_call('restore_scheduled_campaigns')
 
         return jsonify({
             'message': 'Backup restored successfully',
-            'customers_restored': len(backup_data.get('customers', [])),
-            'campaigns_restored': len(backup_data.get('campaigns', []))
+            'customers_restored': counts.get(Customer.__tablename__, 0),
+            'campaigns_restored': counts.get(Campaign.__tablename__, 0),
+            'recipients_restored': counts.get(CampaignRecipient.__tablename__, 0)
         })
 
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': f'Failed to restore backup: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'error': f'Failed to restore backup: {str(e)}'}), 500
+
+
+def serve_sender():
+    """
+    Run this process as the sender daemon (see sender_daemon.py): own the WhatsApp sessions, campaign
+    runs and scheduler, and answer the web workers' sender operations on SENDER_SOCKET.
+    """
+    global sender_rpc
+    from whatsapp_sender.rpc import RpcServer
+
+    if not CONFIG['sender_socket']:
+        raise SystemExit("Set SENDER_SOCKET to the socket path the web workers are configured with")
+    # operations called from here on (scheduled jobs included) run in this process
+    sender_rpc = None
+    server = RpcServer(CONFIG['sender_socket'], SENDER_OPERATIONS, context=app.app_context)
+    with app.app_context():
+        restore_scheduled_campaigns()
+    start_scheduler()
+    app.logger.info(f"Sender daemon listening on {CONFIG['sender_socket']}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if scheduler.running:
+            scheduler.shutdown(wait=False)
\ No newline at end of file
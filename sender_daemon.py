@@ -0,0 +1,10 @@
+from app import serve_sender
+
+# Owns the WhatsApp browser sessions, campaign sending and the scheduler for web workers started with
+# the same SENDER_SOCKET, e.g.
+#   SENDER_SOCKET=/tmp/whatsflow-sender.sock python sender_daemon.py
+#   SENDER_SOCKET=/tmp/whatsflow-sender.sock gunicorn -w 4 -b 0.0.0.0:5000 app:app
+
+if __name__ == '__main__':
+    print("Starting WhatsApp sender daemon...")
+    serve_sender()
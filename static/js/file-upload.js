@@ -7,7 +7,7 @@ class FileUploadHandler {
     constructor(options = {}) {
         this.options = {
             maxFileSize: 16 * 1024 * 1024, // 16MB
-            allowedRecipientTypes: ['xlsx', 'xls'],
+            allowedRecipientTypes: ['xlsx', 'xls', 'csv', 'parquet'],
             allowedAttachmentTypes: ['pdf', 'jpg', 'jpeg', 'png', 'gif', 'doc', 'docx', 'txt'],
             dragDropEnabled: true,
             validateOnSelect: true,
@@ -224,6 +224,7 @@ class FileUploadHandler {
         const iconMap = {
             'xlsx': 'fas fa-file-excel',
             'xls': 'fas fa-file-excel',
+            'csv': 'fas fa-file-csv',
             'pdf': 'fas fa-file-pdf',
             'doc': 'fas fa-file-word',
             'docx': 'fas fa-file-word',
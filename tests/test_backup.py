@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, MetaData, String, Table, create_engine, select
+
+from whatsapp_sender import backup
+from whatsapp_sender.backup import replay, restore_backup, write_backup
+
+T0 = datetime(2024, 1, 1, 12, 0, 0)
+SEEDED = T0 - timedelta(hours=1)
+
+
+def schema():
+    metadata = MetaData()
+    Table('customer', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('name', String(50)),
+          Column('updated_at', DateTime))
+    Table('campaign_recipient', metadata,
+          Column('id', Integer, primary_key=True),
+          Column('customer_id', Integer, ForeignKey('customer.id')),
+          Column('status', String(20)),
+          Column('updated_at', DateTime))
+    Table(backup.TOMBSTONE_TABLE, metadata,
+          Column('id', Integer, primary_key=True),
+          Column('table_name', String(50)),
+          Column('row_id', Integer),
+          Column('deleted_at', DateTime))
+    Table(backup.BACKUP_LOG_TABLE, metadata, Column('id', Integer, primary_key=True))
+    Table(backup.SEND_HISTORY_TABLE, metadata,
+          Column('id', Integer, primary_key=True),
+          Column('phone', String(20)))
+    Table(backup.TABLE_VERSION_TABLE, metadata,
+          Column('table_name', String(50), primary_key=True),
+          Column('version', Integer))
+    Table(backup.SEGMENT_MEMBER_TABLE, metadata,
+          Column('segment_id', Integer, primary_key=True),
+          Column('customer_id', Integer, primary_key=True))
+    return metadata
+
+
+@pytest.fixture
+def make_db(tmp_path):
+    def make(name):
+        path = tmp_path / f'{name}.db'
+        engine = create_engine(f'sqlite:///{path}')
+        metadata = schema()
+        metadata.create_all(engine)
+        return path, engine, metadata
+    return make
+
+
+def data_tables(metadata):
+    return [t for t in metadata.sorted_tables if t.name not in backup.EXCLUDED_TABLES]
+
+
+def rows(engine, table):
+    with engine.connect() as conn:
+        return conn.execute(select(table).order_by(*table.primary_key.columns)).all()
+
+
+def seed(engine, metadata):
+    customer, recipient = metadata.tables['customer'], metadata.tables['campaign_recipient']
+    with engine.begin() as conn:
+        conn.execute(customer.insert(), [
+            {'id': 1, 'name': 'Alice', 'updated_at': SEEDED},
+            {'id': 2, 'name': 'Bob', 'updated_at': SEEDED},
+            {'id': 3, 'name': 'Ćelia 🎉', 'updated_at': SEEDED},
+        ])
+        conn.execute(recipient.insert(), [
+            {'id': 1, 'customer_id': 1, 'status': 'sent', 'updated_at': SEEDED},
+            {'id': 2, 'customer_id': 2, 'status': 'pending', 'updated_at': SEEDED},
+        ])
+
+
+def test_full_backup_round_trip(tmp_path, make_db):
+    _, source, metadata = make_db('source')
+    seed(source, metadata)
+    path = tmp_path / 'full.ndjson.gz'
+    counts = write_backup(source, data_tables(metadata), path, cut=T0)
+    assert counts == {'customer': 3, 'campaign_recipient': 2}
+
+    _, target, target_metadata = make_db('target')
+    with target.begin() as conn:
+        conn.execute(target_metadata.tables['customer'].insert(), [{'id': 9, 'name': 'Old', 'updated_at': SEEDED}])
+    with open(path, 'rb') as f:
+        restored = restore_backup(target, data_tables(target_metadata), f)
+    assert restored == counts
+    for name in ('customer', 'campaign_recipient'):
+        assert rows(target, target_metadata.tables[name]) == rows(source, metadata.tables[name])
+
+
+def test_incremental_replay_reproduces_the_source(tmp_path, make_db):
+    _, source, metadata = make_db('source')
+    seed(source, metadata)
+    customer, recipient = metadata.tables['customer'], metadata.tables['campaign_recipient']
+    tombstones = metadata.tables[backup.TOMBSTONE_TABLE]
+    full = tmp_path / 'full.ndjson.gz'
+    write_backup(source, data_tables(metadata), full, cut=T0)
+
+    later = T0 + timedelta(hours=1)
+    with source.begin() as conn:
+        conn.execute(customer.update().where(customer.c.id == 1).values(name='Alice B', updated_at=later))
+        conn.execute(customer.insert(), [{'id': 4, 'name': 'Dan', 'updated_at': later}])
+        conn.execute(recipient.update().where(recipient.c.id == 2).values(status='read', updated_at=later))
+        conn.execute(recipient.delete().where(recipient.c.id == 1))
+        conn.execute(customer.delete().where(customer.c.id == 3))
+        conn.execute(tombstones.insert(), [
+            {'table_name': 'campaign_recipient', 'row_id': 1, 'deleted_at': later},
+            {'table_name': 'customer', 'row_id': 3, 'deleted_at': later},
+        ])
+    delta = tmp_path / 'delta.ndjson.gz'
+    counts = write_backup(source, data_tables(metadata), delta, since=T0 - timedelta(seconds=1), cut=later,
+                          tombstones=tombstones)
+    assert counts == {'deleted': 2, 'customer': 2, 'campaign_recipient': 1}
+
+    _, target, target_metadata = make_db('target')
+    results = dict(replay(target, data_tables(target_metadata), [str(full), str(delta)]))
+    assert results[str(delta)]['deleted'] == 2
+    for name in ('customer', 'campaign_recipient'):
+        assert rows(target, target_metadata.tables[name]) == rows(source, metadata.tables[name])
+
+
+def test_replay_refuses_a_gap_in_the_chain(tmp_path, make_db):
+    _, source, metadata = make_db('source')
+    seed(source, metadata)
+    full = tmp_path / 'full.ndjson.gz'
+    delta = tmp_path / 'delta.ndjson.gz'
+    write_backup(source, data_tables(metadata), full, cut=T0)
+    write_backup(source, data_tables(metadata), delta, since=T0 + timedelta(hours=1), cut=T0 + timedelta(hours=2),
+                 tombstones=metadata.tables[backup.TOMBSTONE_TABLE])
+    _, target, target_metadata = make_db('target')
+    with pytest.raises(ValueError):
+        list(replay(target, data_tables(target_metadata), [str(full), str(delta)]))
+
+
+def test_cli_replay_keeps_versions_and_clears_derived_tables(tmp_path, make_db):
+    _, source, metadata = make_db('source')
+    seed(source, metadata)
+    full = tmp_path / 'full.ndjson.gz'
+    write_backup(source, data_tables(metadata), full, cut=T0)
+
+    target_path, target, target_metadata = make_db('target')
+    with target.begin() as conn:
+        conn.execute(target_metadata.tables[backup.TABLE_VERSION_TABLE].insert(), [{'table_name': 'customer', 'version': 7}])
+        conn.execute(target_metadata.tables[backup.SEND_HISTORY_TABLE].insert(), [{'id': 1, 'phone': '1'}])
+        conn.execute(target_metadata.tables[backup.SEGMENT_MEMBER_TABLE].insert(), [{'segment_id': 1, 'customer_id': 9}])
+
+    backup.main(['--db', str(target_path), str(full)])
+
+    assert rows(target, target_metadata.tables['customer']) == rows(source, metadata.tables['customer'])
+    assert rows(target, target_metadata.tables[backup.TABLE_VERSION_TABLE]) == [('customer', 7)]
+    # derived from the old data; the app rebuilds them from the restored rows
+    assert rows(target, target_metadata.tables[backup.SEND_HISTORY_TABLE]) == []
+    assert rows(target, target_metadata.tables[backup.SEGMENT_MEMBER_TABLE]) == []
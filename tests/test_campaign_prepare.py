@@ -0,0 +1,140 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+# the app binds its database when imported
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db')
+
+import app as whatsflow  # noqa: E402
+from app import Campaign, CampaignRecipient, CampaignRun, Customer, SendHistory, db  # noqa: E402
+from whatsapp_sender.capping import parse_frequency_caps  # noqa: E402
+from whatsapp_sender.retry import SendOutcome, SendResult  # noqa: E402
+
+
+@pytest.fixture
+def ctx(monkeypatch):
+    monkeypatch.setitem(whatsflow.CONFIG, 'default_country_code', '91')
+    with whatsflow.app.app_context():
+        yield
+        db.session.rollback()
+        for model in (SendHistory, CampaignRecipient, Campaign, Customer):
+            model.query.delete()
+        db.session.commit()
+
+
+def campaign_with(recipients):
+    """recipients: [(phone as stored on the customer, status)]; returns (campaign id, [recipient id])."""
+    campaign = Campaign(name='Test', message='Hi {name}', status='preparing')
+    db.session.add(campaign)
+    db.session.flush()
+    ids = []
+    for i, (phone, status) in enumerate(recipients):
+        customer = Customer.query.filter_by(phone=phone).first()
+        if customer is None:
+            customer = Customer(name=f'Customer {i}', phone=phone)
+            db.session.add(customer)
+            db.session.flush()
+        recipient = CampaignRecipient(
+            campaign_id=campaign.id, customer_id=customer.id, recipient_name=customer.name,
+            recipient_phone=phone, status=status
+        )
+        db.session.add(recipient)
+        db.session.flush()
+        ids.append(recipient.id)
+    db.session.commit()
+    return campaign.id, ids
+
+
+def statuses(ids):
+    db.session.expire_all()
+    return [(r.status, r.last_error) for r in (db.session.get(CampaignRecipient, rid) for rid in ids)]
+
+
+def test_invalid_and_repeated_numbers_are_settled(ctx):
+    campaign_id, ids = campaign_with([
+        ('9876543210', 'pending'),
+        ('+91 98765 43210', 'pending'),   # same number, written differently
+        ('12', 'pending'),
+        ('9876500000', 'pending'),
+    ])
+    run = CampaignRun(campaign_id)
+    assert run.prepare()
+    assert statuses(ids) == [
+        ('pending', None),
+        ('skipped', 'Duplicate phone number'),
+        ('failed', 'Invalid phone number'),
+        ('pending', None),
+    ]
+    assert run.progress['failure_count'] == 1
+    assert run.progress['skipped_count'] == 1
+    assert db.session.get(Campaign, campaign_id).failed_count == 1
+
+
+@pytest.mark.parametrize('earlier_status', ['sent', 'delivered', 'read'])
+def test_number_already_sent_in_the_campaign_is_skipped(ctx, earlier_status):
+    campaign_id, ids = campaign_with([('919876543210', earlier_status), ('09876543210', 'pending')])
+    assert CampaignRun(campaign_id).prepare()
+    assert statuses(ids)[1] == ('skipped', 'Duplicate phone number')
+
+
+def test_failed_earlier_recipient_does_not_block_a_repeat(ctx):
+    campaign_id, ids = campaign_with([('919876543210', 'failed'), ('09876543210', 'pending')])
+    assert CampaignRun(campaign_id).prepare()
+    assert statuses(ids)[1] == ('pending', None)
+
+
+def test_frequency_caps_count_other_campaigns_only(ctx, monkeypatch):
+    monkeypatch.setattr(whatsflow, 'FREQUENCY_CAPS', parse_frequency_caps('1/24h'))
+    monkeypatch.setitem(whatsflow.CONFIG, 'frequency_caps', '1/24h')
+    campaign_id, ids = campaign_with([
+        ('919876543210', 'pending'),
+        ('919876500000', 'pending'),
+        ('919876511111', 'pending'),
+    ])
+    now = datetime.now()
+    db.session.add_all([
+        # another campaign messaged the first number an hour ago
+        SendHistory(phone='919876543210', sent_at=now - timedelta(hours=1), campaign_id=campaign_id + 1000),
+        # ... and the second one two days ago, outside the window
+        SendHistory(phone='919876500000', sent_at=now - timedelta(days=2), campaign_id=campaign_id + 1000),
+        # a send of this very campaign never counts against it
+        SendHistory(phone='919876511111', sent_at=now - timedelta(hours=1), campaign_id=campaign_id),
+    ])
+    db.session.commit()
+    run = CampaignRun(campaign_id)
+    assert run.prepare()
+    assert statuses(ids) == [
+        ('skipped', 'Frequency cap reached (1/24h)'),
+        ('pending', None),
+        ('pending', None),
+    ]
+    assert run.progress['skipped_count'] == 1
+
+
+def test_prepare_stops_when_the_campaign_is_no_longer_preparing(ctx):
+    campaign_id, ids = campaign_with([('12', 'pending')])
+    Campaign.query.filter_by(id=campaign_id).update({'status': 'cancelled'})
+    db.session.commit()
+    assert not CampaignRun(campaign_id).prepare()
+    assert statuses(ids) == [('pending', None)]
+
+
+def test_send_outcomes_bump_the_campaign_counters(ctx):
+    campaign_id, ids = campaign_with([('919876543210', 'pending'), ('919876500000', 'pending')])
+    run = CampaignRun(campaign_id)
+    run.in_flight = 2
+    run.complete((ids[0], '919876543210', 'Hi', 1, ''), SendResult(SendOutcome.SENT, receipt='delivered'))
+    run.complete((ids[1], '919876500000', 'Hi', 1, ''), SendResult(SendOutcome.INVALID_NUMBER))
+    db.session.expire_all()
+    campaign = db.session.get(Campaign, campaign_id)
+    assert (campaign.sent_count, campaign.failed_count) == (1, 1)
+    assert statuses(ids) == [('delivered', None), ('failed', 'invalid_number')]
+
+    # counters that drifted (rows edited outside a run) are recounted when the run finishes
+    Campaign.query.filter_by(id=campaign_id).update({'sent_count': 5, 'failed_count': 0})
+    db.session.commit()
+    run.finish()
+    campaign = db.session.get(Campaign, campaign_id)
+    assert (campaign.sent_count, campaign.failed_count, campaign.status) == (1, 1, 'partial_failed')
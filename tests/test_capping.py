@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+import pytest
+
+from whatsapp_sender.capping import parse_frequency_caps
+
+
+def test_parse_rules():
+    caps = parse_frequency_caps(' 1/24h, 3/7D ,10/1w,2/30m')
+    assert [(c.limit, c.window, c.label) for c in caps] == [
+        (1, timedelta(hours=24), '1/24h'),
+        (3, timedelta(days=7), '3/7d'),
+        (10, timedelta(weeks=1), '10/1w'),
+        (2, timedelta(minutes=30), '2/30m'),
+    ]
+
+
+@pytest.mark.parametrize('spec', ['', None, ' , '])
+def test_empty_spec_means_no_caps(spec):
+    assert parse_frequency_caps(spec) == []
+
+
+@pytest.mark.parametrize('spec', ['1/24', 'x/1d', '1/1y', '1-1d'])
+def test_invalid_rule(spec):
+    with pytest.raises(ValueError):
+        parse_frequency_caps(spec)
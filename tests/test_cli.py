@@ -0,0 +1,90 @@
+import json
+
+from whatsapp_sender import cli
+from whatsapp_sender.retry import SendOutcome, SendResult
+
+
+class FakeSender:
+    def __init__(self, name='default', logs_in=True):
+        self.session_name = name
+        self.config = {'max_retries': '0'}
+        self.logs_in = logs_in
+        self.sent = []
+
+    def is_driver_active(self):
+        return self.logs_in
+
+    def initialize_driver(self):
+        pass
+
+    def login_to_whatsapp_with_wait(self):
+        pass
+
+    def wait_for_login(self):
+        return self.logs_in
+
+    def quit_driver(self):
+        pass
+
+    def send_message(self, contact, message, attachment_path=None):
+        self.sent.append((contact, message))
+        return SendResult(SendOutcome.SENT, receipt='sent')
+
+
+class FlakySender(FakeSender):
+    """Times out on the first attempt for every contact in `flaky`, or on every attempt in `broken`."""
+
+    def __init__(self, flaky=(), broken=()):
+        super().__init__()
+        self.config = {'max_retries': '3', 'retry_base_delay': '0.2', 'retry_max_delay': '0.2'}
+        self.flaky = set(flaky)
+        self.broken = set(broken)
+
+    def send_message(self, contact, message, attachment_path=None):
+        self.sent.append((contact, message))
+        if contact in self.broken:
+            return SendResult(SendOutcome.LOAD_TIMEOUT, 'Chat did not load')
+        if contact in self.flaky:
+            self.flaky.discard(contact)
+            return SendResult(SendOutcome.LOAD_TIMEOUT, 'Chat did not load')
+        return SendResult(SendOutcome.SENT, receipt='sent')
+
+
+def recipients_file(tmp_path, count):
+    path = tmp_path / 'recipients.csv'
+    path.write_text('Name,Contact\n' + ''.join(f'R{i},+9198765{i:05d}\n' for i in range(count)))
+    return str(path)
+
+
+def test_batch_is_shared_between_sessions(tmp_path):
+    senders = [FakeSender('a'), FakeSender('b')]
+    results = tmp_path / 'results.jsonl'
+    summary = cli.run_batch(recipients_file(tmp_path, 20), senders, 'Hi {name}', results_path=str(results))
+    assert summary['outcomes'] == {SendOutcome.SENT: 20}
+    assert (summary['unprocessed'], sorted(summary['connected'])) == (0, ['a', 'b'])
+    assert sum(len(s.sent) for s in senders) == 20
+    assert len(results.read_text().splitlines()) == 20
+
+
+def test_no_session_logging_in_leaves_every_row_unprocessed(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(cli, 'WhatsAppBulkSender', lambda session_name: FakeSender(session_name, logs_in=False))
+    path = recipients_file(tmp_path, 20)
+    assert cli.main([path, '-m', 'Hi', '-s', 'a,b', '-r', str(tmp_path / 'results.jsonl')]) == 2
+    summary = json.loads(next(line for line in capsys.readouterr().out.splitlines() if line.startswith('{')))
+    assert (summary['outcomes'], summary['unprocessed'], summary['connected']) == ({}, 20, [])
+
+
+def test_retries_wait_without_holding_up_the_session(tmp_path):
+    path = recipients_file(tmp_path, 5)
+    first, last = '919876500000', '919876500004'
+    sender = FlakySender(flaky=[first], broken=[last])
+    results = tmp_path / 'results.jsonl'
+    summary = cli.run_batch(path, [sender], 'Hi', results_path=str(results))
+    assert summary['outcomes'] == {SendOutcome.SENT: 4, SendOutcome.LOAD_TIMEOUT: 1}
+    contacts = [contact for contact, _ in sender.sent]
+    # the rest of the file went out while the first contact was waiting for its retry
+    assert contacts[:5] == [f'9198765{i:05d}' for i in range(5)]
+    assert contacts.count(first) == 2 and contacts.count(last) == 3
+    records = {r['contact']: r for r in map(json.loads, results.read_text().splitlines())}
+    assert (records[first]['outcome'], records[first]['attempts']) == (SendOutcome.SENT, 2)
+    assert (records[last]['outcome'], records[last]['attempts']) == (SendOutcome.LOAD_TIMEOUT, 3)
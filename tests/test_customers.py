@@ -0,0 +1,71 @@
+import io
+import os
+import tempfile
+
+import pytest
+
+# the app binds its database when imported
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db')
+
+import app as whatsflow  # noqa: E402
+from app import Customer, db  # noqa: E402
+from whatsapp_sender.upload_cache import ParsedUploadCache  # noqa: E402
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setitem(whatsflow.CONFIG, 'default_country_code', '91')
+    monkeypatch.setattr(whatsflow, 'UPLOAD_FOLDER', str(tmp_path))
+    monkeypatch.setattr(whatsflow, 'UPLOAD_CACHE', ParsedUploadCache(str(tmp_path / 'parsed'), 0))
+    with whatsflow.app.app_context():
+        yield whatsflow.app.test_client()
+        db.session.rollback()
+        Customer.query.delete()
+        db.session.commit()
+
+
+def phones():
+    db.session.expire_all()
+    return sorted(c.phone for c in Customer.query.all())
+
+
+def test_upload_stores_normalized_numbers_and_reports_invalid_rows(client):
+    csv = (
+        'Name,Contact\n'
+        'Asha,098765 43210\n'
+        'Ben,+44 20 7946 0958\n'
+        'Asha again,+91 98765 43210\n'
+        'Chen,12\n'
+        'Dev,\n'
+    )
+    response = client.post('/api/customers/upload', data={
+        'file': (io.BytesIO(csv.encode()), 'customers.csv'),
+    }, content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert response.json['errors'] == [
+        'Row 4: Customer with phone 919876543210 already exists',
+        'Row 5: Invalid phone number 12',
+        'Row 6: Name and Phone are required',
+    ]
+    assert phones() == ['442079460958', '919876543210']
+
+
+def test_added_and_updated_numbers_are_normalized(client):
+    response = client.post('/api/customers', json={'name': 'Asha', 'phone': '098765 43210'})
+    assert response.status_code == 201
+    customer_id = response.json['customer']['id']
+    assert client.post('/api/customers', json={'name': 'Asha', 'phone': '+91 98765 43210'}).status_code == 400
+
+    response = client.put(f'/api/customers/{customer_id}', json={'phone': '0044 20 7946 0958'})
+    assert response.status_code == 200
+    assert phones() == ['442079460958']
+
+
+@pytest.mark.parametrize('phone', ['12', 'call me'])
+def test_invalid_numbers_are_rejected(client, phone):
+    response = client.post('/api/customers', json={'name': 'Asha', 'phone': phone})
+    assert response.status_code == 400
+    assert 'Invalid phone number' in response.json['error']
+    customer_id = client.post('/api/customers', json={'name': 'Ben', 'phone': '9876500000'}).json['customer']['id']
+    assert client.put(f'/api/customers/{customer_id}', json={'phone': phone}).status_code == 400
+    assert phones() == ['919876500000']
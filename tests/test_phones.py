@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+from whatsapp_sender.phones import normalize_phone, normalize_phones
+
+SAMPLES = [
+    '+91 98765 43210',
+    '098765 43210',
+    '9876543210',
+    '0091 9876543210',
+    '919876543210',
+    919876543210,
+    919876543210.0,
+    '919876543210.0',
+    9876543210.0,
+    '+44 20 7946 0958',
+    '00442079460958',
+    '+1 (212) 555-0100',
+    '2125550100',
+    '0612345678',
+    '+39 06 1234 5678',
+    '  +971 50 123 4567',
+    '12345',
+    '+0 123',
+    'abc',
+    '',
+    None,
+    float('nan'),
+]
+
+
+@pytest.mark.parametrize('country_code', ['', '91', '1', '39'])
+def test_vectorised_matches_scalar(country_code):
+    vectorised = list(normalize_phones(pd.Series(SAMPLES, dtype=object), country_code))
+    assert vectorised == [normalize_phone(value, country_code) for value in SAMPLES]
+
+
+@pytest.mark.parametrize('value, country_code, expected', [
+    ('+91 98765 43210', '', '919876543210'),
+    ('0091 9876543210', '', '919876543210'),
+    ('098765 43210', '91', '919876543210'),
+    ('9876543210', '91', '919876543210'),
+    ('919876543210.0', '', '919876543210'),
+    (919876543210.0, '', '919876543210'),
+    ('+1 (212) 555-0100', '', '12125550100'),
+    ('2125550100', '1', '12125550100'),
+    # Italian landlines keep their leading 0
+    ('0612345678', '39', '390612345678'),
+    ('+91 12345', '', ''),
+    ('+0 123', '', ''),
+    (None, '91', ''),
+])
+def test_normalize_phone(value, country_code, expected):
+    assert normalize_phone(value, country_code) == expected
+
+
+def test_float_column_keeps_whole_numbers():
+    phones = normalize_phones(pd.Series([919876543210.0, 9876543210.0, None]), '91')
+    assert list(phones) == ['919876543210', '919876543210', '']
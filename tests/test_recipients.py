@@ -0,0 +1,29 @@
+import pytest
+
+from whatsapp_sender import recipients
+from whatsapp_sender.phones import normalize_phones
+from whatsapp_sender.recipients import read_table
+
+CSV = (
+    'Name,Contact,Age\n'
+    'Asha,098765 43210,31\n'
+    'Ben,+44 20 7946 0958,\n'
+    'Chen,0091 9876500000,42\n'
+)
+
+
+def check_contacts(df):
+    assert list(df['Contact']) == ['098765 43210', '+44 20 7946 0958', '0091 9876500000']
+    assert list(normalize_phones(df['Contact'], '91')) == ['919876543210', '442079460958', '919876500000']
+
+
+@pytest.mark.parametrize('data', [CSV.encode(), ('﻿' + CSV.replace(',', ';')).encode()])
+def test_csv_contacts_are_read_as_written(data):
+    check_contacts(read_table(data, 'recipients.csv'))
+
+
+def test_csv_contacts_are_read_as_written_without_pyarrow(monkeypatch):
+    def no_pyarrow(data, delimiter):
+        raise ImportError('pyarrow')
+    monkeypatch.setattr(recipients, '_arrow_csv', no_pyarrow)
+    check_contacts(read_table(CSV.encode(), 'recipients.csv'))
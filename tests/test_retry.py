@@ -0,0 +1,65 @@
+import time
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from whatsapp_sender.retry import (
+    DeferredRetryQueue, RetryPolicy, SendOutcome, SendResult, classify_exception
+)
+
+
+def test_sent_and_permanent_failures_are_not_retried():
+    policy = RetryPolicy(max_retries=3)
+    assert not policy.should_retry(SendResult(SendOutcome.SENT), 1)
+    assert not policy.should_retry(SendResult(SendOutcome.INVALID_NUMBER), 1)
+
+
+def test_transient_failures_retry_until_max_retries():
+    policy = RetryPolicy(max_retries=3)
+    result = SendResult(SendOutcome.LOAD_TIMEOUT)
+    assert policy.should_retry(result, 1)
+    assert policy.should_retry(result, 2)
+    assert not policy.should_retry(result, 3)
+
+
+def test_backoff_doubles_with_full_jitter_and_is_capped():
+    policy = RetryPolicy(base_delay=10, max_delay=60)
+    for _ in range(50):
+        assert 5 <= policy.next_delay(1) <= 10
+        assert 10 <= policy.next_delay(2) <= 20
+        assert 30 <= policy.next_delay(10) <= 60
+
+
+def test_from_config_reads_strings():
+    policy = RetryPolicy.from_config({'max_retries': '5', 'retry_base_delay': '2', 'retry_max_delay': '8'})
+    assert (policy.max_retries, policy.base_delay, policy.max_delay) == (5, 2.0, 8.0)
+
+
+def test_classify_exception():
+    assert classify_exception(TimeoutException()) == SendOutcome.LOAD_TIMEOUT
+    assert classify_exception(WebDriverException('invalid session id')) == SendOutcome.SESSION_LOST
+    assert classify_exception(WebDriverException('element not interactable')) == SendOutcome.ERROR
+    assert classify_exception(ValueError('boom')) == SendOutcome.ERROR
+
+
+def test_deferred_queue_releases_items_after_their_delay_in_order():
+    queue = DeferredRetryQueue()
+    queue.push('later', 0.2)
+    queue.push('first', 0)
+    queue.push('second', 0)
+    assert queue.pop_ready() == 'first'
+    assert queue.pop_ready() == 'second'
+    assert queue.pop_ready() is None
+    assert 0 < queue.seconds_until_next() <= 0.2
+    time.sleep(0.25)
+    assert queue.pop_ready() == 'later'
+    assert len(queue) == 0
+    assert queue.seconds_until_next() is None
+
+
+def test_drain_returns_everything_still_waiting():
+    queue = DeferredRetryQueue()
+    queue.push('last', 60)
+    queue.push('next', 30)
+    queue.push('ready', 0)
+    assert queue.drain() == ['ready', 'next', 'last']
+    assert len(queue) == 0
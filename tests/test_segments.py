@@ -0,0 +1,43 @@
+import json
+import os
+import tempfile
+
+import pytest
+
+# the app binds its database when imported
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db')
+
+import app as whatsflow  # noqa: E402
+from app import Customer, _segment_clause, db, parse_segment_filters  # noqa: E402
+
+
+@pytest.fixture
+def customers():
+    with whatsflow.app.app_context():
+        db.session.add_all([
+            Customer(name='Asha', phone='919876500001', custom_fields=json.dumps({'Tier': 'Gold', 'orders': 12})),
+            Customer(name='Ben', phone='919876500002', custom_fields=json.dumps({'Tier': 'silver', 'orders': 3})),
+            Customer(name='Chen', phone='919876500003', custom_fields=None),
+            Customer(name='Dev', phone='919876500004', custom_fields='not json'),
+        ])
+        db.session.commit()
+        yield
+        db.session.rollback()
+        Customer.query.delete()
+        db.session.commit()
+
+
+def names(filters):
+    clause = _segment_clause(parse_segment_filters(filters))
+    return sorted(c.name for c in Customer.query.filter(clause))
+
+
+@pytest.mark.parametrize('filters, expected', [
+    ([{'field': 'Tier', 'value': 'gold'}], ['Asha']),
+    ([{'field': 'Tier', 'op': 'in', 'value': ['GOLD', 'Silver']}], ['Asha', 'Ben']),
+    ([{'field': 'Tier', 'op': 'ne', 'value': 'gold'}], ['Ben', 'Chen', 'Dev']),
+    ([{'field': 'orders', 'value': 12}], ['Asha']),
+    ([{'field': 'name', 'op': 'contains', 'value': 'e'}, {'field': 'Tier', 'op': 'ne', 'value': 'x'}], ['Ben', 'Chen', 'Dev']),
+])
+def test_custom_field_conditions(customers, filters, expected):
+    assert names(filters) == expected
@@ -0,0 +1,19 @@
+from whatsapp_sender.templating import MessageTemplate, build_context
+
+
+def test_fields_are_filled_case_insensitively():
+    template = MessageTemplate('Hi {Name}, order {ORDER_ID} costs {price:.2f}')
+    context = build_context(name='Asha Rao', custom_fields={'Order_Id': 'A-17', 'price': 12.5})
+    assert template.render(context) == 'Hi Asha Rao, order A-17 costs 12.50'
+
+
+def test_unknown_field_is_left_as_written():
+    template = MessageTemplate('Hi {first_name}, use {Coupon} or {discount:>5}{}')
+    assert template.render(build_context(name='Asha Rao')) == 'Hi Asha, use {Coupon} or {discount:>5}{}'
+    # ... while a field that is present but empty renders as nothing
+    context = build_context(name='Asha Rao', custom_fields={'coupon': None, 'discount': '10%'})
+    assert template.render(context) == 'Hi Asha, use  or   10%{}'
+
+
+def test_unbalanced_braces_are_literal():
+    assert MessageTemplate('Hi {name').render(build_context(name='Asha')) == 'Hi {name'
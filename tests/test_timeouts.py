@@ -0,0 +1,70 @@
+from whatsapp_sender.timeouts import TimeoutController
+
+
+def controller(**config):
+    config.setdefault('adaptive_timeouts', 'true')
+    return TimeoutController(config, min_samples=5)
+
+
+def test_ceiling_until_enough_samples():
+    timeouts = controller(confirm_timeout='10')
+    for _ in range(4):
+        timeouts.observe('confirm', 0.5)
+    assert timeouts.timeout_for('confirm') == 10.0
+
+
+def test_learned_timeout_is_a_multiple_of_p95_within_bounds():
+    timeouts = controller(confirm_timeout='10', timeout_safety_multiple='3', min_wait_timeout='1')
+    for _ in range(20):
+        timeouts.observe('confirm', 1.0)
+    assert timeouts.timeout_for('confirm') == 3.0
+    for _ in range(20):
+        timeouts.observe('confirm', 0.1)
+    # p95 still covers the slower waits; the floor keeps it from collapsing
+    assert timeouts.timeout_for('confirm') == 3.0
+
+
+def test_adaptive_off_uses_the_ceiling():
+    timeouts = controller(adaptive_timeouts='false', chat_load_timeout='50')
+    for _ in range(20):
+        timeouts.observe('open_chat', 0.5)
+    assert timeouts.timeout_for('open_chat') == 50.0
+
+
+def test_timeouts_widen_the_limit_again():
+    timeouts = controller(confirm_timeout='10', timeout_safety_multiple='3', min_wait_timeout='1')
+    for _ in range(40):
+        timeouts.observe('confirm', 0.5)
+    limit = timeouts.timeout_for('confirm')
+    assert limit == 1.5
+    # the network slows down: every wait now gives up at the learned limit
+    limits = []
+    for _ in range(3):
+        timeouts.observe_timeout('confirm', limit)
+        limit = timeouts.timeout_for('confirm')
+        limits.append(limit)
+    assert limits[-1] == 10.0
+    # a slow wait that now succeeds keeps a wide limit
+    timeouts.observe('confirm', 4.0)
+    assert timeouts.timeout_for('confirm') > 4.0
+
+
+def test_consecutive_timeouts_fall_back_to_the_ceiling_until_a_success():
+    timeouts = controller(confirm_timeout='10', timeout_misses_to_ceiling='2')
+    for _ in range(200):
+        timeouts.observe('confirm', 0.5)
+    timeouts.observe_timeout('confirm', 1.5)
+    assert timeouts.timeout_for('confirm') < 10.0
+    timeouts.observe_timeout('confirm', 1.5)
+    assert timeouts.timeout_for('confirm') == 10.0
+    timeouts.observe('confirm', 0.5)
+    assert timeouts.timeout_for('confirm') < 10.0
+
+
+def test_step_ceilings_come_from_config():
+    timeouts = controller(chat_load_wait_timeout='7', attach_button_timeout='4', confirm_timeout='12',
+                          chat_load_timeout='40', upload_timeout='90')
+    assert timeouts.ceiling('chat_load') == 7.0
+    assert timeouts.ceiling('attach_button') == 4.0
+    assert timeouts.ceiling('confirm') == 12.0
+    assert timeouts.max_ceiling() == 90.0
@@ -0,0 +1,285 @@
+"""
+Streaming database backup: every table as gzip-compressed NDJSON, written and restored in constant memory.
+
+One JSON value per line:
+
+    {"format": "whatsflow-backup", "version": 2, "kind": "full", "cut": "...", "since": null, ...}
+    {"deleted": "customer"}                 <- incremental only: tombstones, one [id] per line
+    [17]
+    {"table": "customer", "columns": ["id", "name", ...]}
+    [1, "Alice", ...]                       <- one array per row, in column order
+    ...
+
+An incremental backup holds only rows whose updated_at is at or after `since` plus the ids deleted
+since then. Replay a full backup and its chain of incremental ones into a database with:
+
+    python -m whatsapp_sender.backup --db instance/whatsapp_bulk.db full.ndjson.gz delta1.ndjson.gz ...
+"""
+import argparse
+import gzip
+import json
+from datetime import date, datetime
+
+from sqlalchemy import Date, DateTime, MetaData, create_engine, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+FORMAT = 'whatsflow-backup'
+VERSION = 2
+FETCH_SIZE = 1000
+INSERT_CHUNK = 5000
+
+
+def _encode(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _decoder(column):
+    if isinstance(column.type, DateTime):
+        return lambda v: datetime.fromisoformat(v) if v else None
+    if isinstance(column.type, Date):
+        return lambda v: date.fromisoformat(v) if v else None
+    return None
+
+
+def _dump(record):
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str) + '\n'
+
+
+def write_backup(engine, tables, path, settings=None, since=None, cut=None, tombstones=None):
+    """
+    Stream `tables` (parents first) from server-side cursors into a gzip NDJSON file.
+    With `since`, only rows updated since then are written, preceded by the ids recorded in the
+    `tombstones` table (table_name, row_id, deleted_at) since then. Returns {table name: rows written}.
+    """
+    counts = {}
+    cut = cut or datetime.now()
+    with gzip.open(path, 'wt', encoding='utf-8', compresslevel=6) as out, engine.connect() as conn:
+        out.write(_dump({
+            'format': FORMAT,
+            'version': VERSION,
+            'kind': 'incremental' if since else 'full',
+            'since': _encode(since),
+            'cut': _encode(cut),
+            'created_at': datetime.now().isoformat(),
+            'settings': settings or {},
+        }))
+        if since is not None and tombstones is not None:
+            counts['deleted'] = _write_tombstones(conn, out, tombstones, since)
+        for table in tables:
+            out.write(_dump({'table': table.name, 'columns': [c.name for c in table.columns]}))
+            query = select(table).order_by(*table.primary_key.columns)
+            if since is not None and 'updated_at' in table.columns:
+                query = query.where(table.c.updated_at >= since)
+            result = conn.execution_options(stream_results=True, yield_per=FETCH_SIZE).execute(query)
+            written = 0
+            for row in result:
+                out.write(_dump([_encode(v) for v in row]))
+                written += 1
+            counts[table.name] = written
+    return counts
+
+
+def _write_tombstones(conn, out, tombstones, since):
+    query = select(tombstones.c.table_name, tombstones.c.row_id).where(
+        tombstones.c.deleted_at >= since
+    ).order_by(tombstones.c.table_name, tombstones.c.row_id)
+    current = None
+    written = 0
+    for table_name, row_id in conn.execution_options(stream_results=True, yield_per=FETCH_SIZE).execute(query):
+        if table_name != current:
+            out.write(_dump({'deleted': table_name}))
+            current = table_name
+        out.write(_dump([row_id]))
+        written += 1
+    return written
+
+
+def _upsert(conn, table):
+    """INSERT ... ON CONFLICT (pk) DO UPDATE for replaying changed rows."""
+    insert = sqlite_insert if conn.dialect.name == 'sqlite' else postgresql_insert
+    stmt = insert(table)
+    keys = [c.name for c in table.primary_key.columns]
+    return stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={c.name: stmt.excluded[c.name] for c in table.columns if c.name not in keys}
+    )
+
+
+class _TableLoader:
+    """Buffers the rows of one backup section and bulk-inserts (or upserts) them in chunks."""
+
+    def __init__(self, conn, table, columns, upsert=False):
+        self.conn = conn
+        self.table = table
+        self.statement = _upsert(conn, table) if upsert else table.insert()
+        self.count = 0
+        self._rows = []
+        # (position in the backup row, column name, decoder) for columns the model still has
+        self._fields = [
+            (i, name, _decoder(table.columns[name]))
+            for i, name in enumerate(columns) if name in table.columns
+        ]
+
+    def add(self, values):
+        row = {}
+        for i, name, decode in self._fields:
+            value = values[i] if i < len(values) else None
+            row[name] = decode(value) if decode else value
+        self._rows.append(row)
+        if len(self._rows) >= INSERT_CHUNK:
+            self.flush()
+
+    def flush(self):
+        if self._rows:
+            self.conn.execute(self.statement, self._rows)
+            self.count += len(self._rows)
+            self._rows = []
+
+
+def is_backup_file(head):
+    """True when the first bytes of a file look like a gzip stream."""
+    return head[:2] == b'\x1f\x8b'
+
+
+def _read_header(src):
+    header = json.loads(next(src, 'null'))
+    if not isinstance(header, dict) or header.get('format') != FORMAT:
+        raise ValueError('Not a WhatsFlow backup file')
+    return header
+
+
+def _load_sections(conn, src, by_name, upsert, counts):
+    """Apply the row and tombstone sections that follow the header."""
+    loader = None
+    deleting = None
+    deleted_ids = []
+
+    def finish_section():
+        if loader is not None:
+            loader.flush()
+            counts[loader.table.name] = counts.get(loader.table.name, 0) + loader.count
+        for i in range(0, len(deleted_ids), INSERT_CHUNK):
+            key = next(iter(deleting.primary_key.columns))
+            conn.execute(deleting.delete().where(key.in_(deleted_ids[i:i + INSERT_CHUNK])))
+        if deleted_ids:
+            counts['deleted'] = counts.get('deleted', 0) + len(deleted_ids)
+        deleted_ids.clear()
+
+    for line in src:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if isinstance(record, dict):
+            finish_section()
+            loader = deleting = None
+            # sections for tables that no longer exist are skipped
+            if 'deleted' in record:
+                deleting = by_name.get(record['deleted'])
+            elif record.get('table') in by_name:
+                loader = _TableLoader(conn, by_name[record['table']], record['columns'], upsert=upsert)
+        elif loader is not None:
+            loader.add(record)
+        elif deleting is not None:
+            deleted_ids.append(record[0])
+    finish_section()
+
+
+def restore_backup(engine, tables, fileobj, clear=()):
+    """
+    Replace the contents of `tables` with a full backup, parsing it line by line and inserting in
+    chunks, all in one transaction (a bad file leaves the database untouched). Tables in `clear`
+    (e.g. tombstones produced by the restore's own deletes) are emptied at the end.
+    Returns {table name: rows restored}.
+    """
+    counts = {}
+    with gzip.open(fileobj, 'rt', encoding='utf-8') as src, engine.begin() as conn:
+        header = _read_header(src)
+        if header.get('kind', 'full') != 'full':
+            raise ValueError('This is an incremental backup; replay it on top of its full backup')
+
+        for table in reversed(tables):
+            conn.execute(table.delete())
+        _load_sections(conn, src, {table.name: table for table in tables}, False, counts)
+        for table in clear:
+            conn.execute(table.delete())
+    return counts
+
+
+def apply_incremental(engine, tables, fileobj, clear=()):
+    """
+    Replay one incremental backup in one transaction: tombstoned ids are deleted first, then changed
+    rows are upserted (parents before children). Returns (header, {table name: rows applied}).
+    """
+    counts = {}
+    with gzip.open(fileobj, 'rt', encoding='utf-8') as src, engine.begin() as conn:
+        header = _read_header(src)
+        if header.get('kind') != 'incremental':
+            raise ValueError('Not an incremental backup')
+        _load_sections(conn, src, {table.name: table for table in tables}, True, counts)
+        for table in clear:
+            conn.execute(table.delete())
+    return header, counts
+
+
+def read_header(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as src:
+        return _read_header(src)
+
+
+def replay(engine, tables, paths, clear=()):
+    """
+    Restore a full backup followed by its chain of incremental backups, checking that each one
+    starts no later than the previous one's cut so no changes fall into a gap.
+    """
+    headers = [read_header(path) for path in paths]
+    if not headers or headers[0].get('kind', 'full') != 'full':
+        raise ValueError('The first file must be a full backup')
+    for previous, header, path in zip(headers, headers[1:], paths[1:]):
+        if header.get('kind') != 'incremental':
+            raise ValueError(f'{path} is not an incremental backup')
+        if header['since'] > previous['cut']:
+            raise ValueError(f'{path} starts at {header["since"]}, after the previous backup ended ({previous["cut"]})')
+
+    with open(paths[0], 'rb') as f:
+        yield paths[0], restore_backup(engine, tables, f, clear)
+    for path in paths[1:]:
+        with open(path, 'rb') as f:
+            yield path, apply_incremental(engine, tables, f, clear)[1]
+
+
+# Bookkeeping tables that are never part of a backup
+TOMBSTONE_TABLE = 'deleted_row'
+BACKUP_LOG_TABLE = 'backup_record'
+# Tables derived from the backed-up rows, also left out. The app rebuilds send history and segment
+# membership when they are empty (at start-up, and after a restore); table versions are bumped by the
+# restore's own writes.
+SEND_HISTORY_TABLE = 'send_history'
+TABLE_VERSION_TABLE = 'table_version'
+SEGMENT_MEMBER_TABLE = 'segment_member'
+EXCLUDED_TABLES = (TOMBSTONE_TABLE, BACKUP_LOG_TABLE, SEND_HISTORY_TABLE, TABLE_VERSION_TABLE, SEGMENT_MEMBER_TABLE)
+# Emptied once a backup is replayed: the replay's own tombstones, and derived rows of the old data
+CLEARED_AFTER_RESTORE = (TOMBSTONE_TABLE, SEND_HISTORY_TABLE, SEGMENT_MEMBER_TABLE)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a full backup and its incremental backups into a database")
+    parser.add_argument('--db', required=True, help="SQLite file or SQLAlchemy URL of the (already created) database")
+    parser.add_argument('backups', nargs='+', help="Full backup first, then its incremental backups in order")
+    args = parser.parse_args(argv)
+
+    url = args.db if '://' in args.db else f'sqlite:///{args.db}'
+    engine = create_engine(url)
+    metadata = MetaData()
+    metadata.reflect(engine)
+    tables = [t for t in metadata.sorted_tables if t.name not in EXCLUDED_TABLES]
+    clear = [metadata.tables[name] for name in CLEARED_AFTER_RESTORE if name in metadata.tables]
+    for path, counts in replay(engine, tables, args.backups, clear):
+        print(f"{path}: {counts}")
+    print("Send history and segment membership are rebuilt the next time the app starts.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+import re
+from datetime import timedelta
+
+# Frequency caps limit how many campaign messages one number receives across campaigns:
+# comma-separated "N/window" rules, e.g. "1/24h,3/7d" = at most one a day and three a week.
+
+_UNITS = {'m': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks'}
+_RULE_RE = re.compile(r'^(\d+)/(\d+)([mhdw])$')
+
+
+class FrequencyCap:
+    def __init__(self, limit, window, label):
+        self.limit = limit
+        self.window = window
+        self.label = label
+
+    def __repr__(self):
+        return f"FrequencyCap({self.label!r})"
+
+
+def parse_frequency_caps(spec):
+    """List of FrequencyCap from a spec like '1/24h,3/7d'; an empty spec means no caps."""
+    caps = []
+    for part in (spec or '').split(','):
+        rule = re.sub(r'\s+', '', part).lower()
+        if not rule:
+            continue
+        match = _RULE_RE.match(rule)
+        if not match:
+            raise ValueError(f"Invalid frequency cap '{part.strip()}' (expected e.g. 1/24h or 3/7d)")
+        limit, amount, unit = match.groups()
+        caps.append(FrequencyCap(int(limit), timedelta(**{_UNITS[unit]: int(amount)}), rule))
+    return caps
@@ -0,0 +1,298 @@
+"""
+Headless batch runner: send a message to every recipient in a file without the web app, e.g. from cron.
+
+    whatsflow-send recipients.xlsx --message "Hi {first_name}" --attachment brochure.pdf \\
+        --sessions default,second --results results.jsonl
+
+Recipients are streamed from the file and shared between the sessions (one Chrome profile each).
+Every outcome is appended to the results file as one JSON line; running the same command again
+skips recipients already sent or permanently invalid, so an interrupted batch resumes where it stopped.
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+from .config import CONFIG
+from .recipients import iter_recipients
+from .retry import DeferredRetryQueue, RetryPolicy, SendOutcome, SendResult, classify_exception
+from .sender import WhatsAppBulkSender
+from .templating import MessageTemplate, build_context
+
+# Columns with a fixed meaning; any other column is a template placeholder
+BASE_COLUMNS = ('contact', 'name', 'email', 'message', 'invalid')
+# Recipients read ahead of the sessions, per session
+QUEUE_PER_SESSION = 4
+
+
+def load_finished(path):
+    """Contacts in a results file that need no further attempt (sent, or a permanent failure)."""
+    finished = set()
+    if not path or not os.path.exists(path):
+        return finished
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # a line cut short when the previous run was killed
+                continue
+            if record.get('outcome') == SendOutcome.SENT or record.get('outcome') in SendOutcome.PERMANENT:
+                finished.add(record.get('contact'))
+    return finished
+
+
+class ResultsWriter:
+    """Appends one JSON line per recipient, flushed at once so a killed run loses nothing it reported."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8') if path else None
+        self.counts = {}
+
+    def write(self, record, result, attempts, session_name):
+        line = {
+            'contact': record['contact'],
+            'name': record.get('name'),
+            'outcome': result.outcome,
+            'receipt': result.receipt,
+            'error': result.error,
+            'attempts': attempts,
+            'session': session_name,
+            'at': datetime.now().isoformat(timespec='seconds'),
+        }
+        with self._lock:
+            self.counts[result.outcome] = self.counts.get(result.outcome, 0) + 1
+            if self._file:
+                self._file.write(json.dumps(line, ensure_ascii=False, default=str) + '\n')
+                self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+
+def recipient_message(template, record):
+    """The row's own Message cell if it has one, else the template rendered for the row."""
+    own = record.get('message')
+    if own not in (None, ''):
+        return str(own)
+    custom = {k: v for k, v in record.items() if k not in BASE_COLUMNS}
+    return template.render(build_context(
+        name=record.get('name'), phone=record['contact'], email=record.get('email'), custom_fields=custom
+    ))
+
+
+def _connect(sender):
+    """Start the browser if needed and wait until WhatsApp Web is logged in."""
+    if not sender.is_driver_active():
+        sender.initialize_driver()
+        sender.login_to_whatsapp_with_wait()
+    return sender.wait_for_login()
+
+
+def _send_once(sender, contact, message, attachment_path):
+    """One send attempt; a lost session is reconnected so the next attempt has a browser to use."""
+    try:
+        result = sender.send_message(contact, message, attachment_path)
+    except Exception as e:
+        result = SendResult(classify_exception(e), str(e))
+    if result.outcome == SendOutcome.SESSION_LOST and not sender.is_driver_active():
+        print(f"[{sender.session_name}] WhatsApp session lost, reconnecting...")
+        sender.quit_driver()
+        _connect(sender)
+    return result
+
+
+def _session_worker(sender, tasks, results, template, attachment_path, connected):
+    """
+    Send queued recipients with one session until the queue ends or the session can't be kept up.
+    Transient failures wait out their backoff in this session's retry queue while it keeps taking
+    new recipients. The session's name is added to `connected` once it has logged in.
+    """
+    policy = RetryPolicy.from_config(sender.config)
+    retries = DeferredRetryQueue()
+    try:
+        if not _connect(sender):
+            print(f"[{sender.session_name}] WhatsApp login failed or timed out.")
+            return
+        connected.append(sender.session_name)
+        stream_open = True
+        while stream_open or len(retries):
+            item = retries.pop_ready()
+            if item is None:
+                wait = retries.seconds_until_next()
+                if not stream_open:
+                    time.sleep(wait)
+                    continue
+                try:
+                    # wake up for the next retry even if no new recipient comes in
+                    record = tasks.get(timeout=wait)
+                except queue.Empty:
+                    continue
+                if record is None:
+                    stream_open = False
+                    continue
+                if record.get('invalid'):
+                    result = SendResult(SendOutcome.INVALID_NUMBER, 'Invalid phone number')
+                    results.write(record, result, 0, sender.session_name)
+                    continue
+                message = recipient_message(template, record)
+                if not message and not attachment_path:
+                    results.write(record, SendResult(SendOutcome.ERROR, 'Nothing to send'), 0, sender.session_name)
+                    continue
+                attempts = 0
+                print(f"[{sender.session_name}] Sending to {record['contact']}")
+            else:
+                record, message, attempts, _ = item
+                print(f"[{sender.session_name}] [retry {attempts}] Sending to {record['contact']}")
+            result = _send_once(sender, record['contact'], message, attachment_path)
+            attempts += 1
+            if sender.is_driver_active() and policy.should_retry(result, attempts):
+                delay = policy.next_delay(attempts)
+                retries.push((record, message, attempts, result), delay)
+                print(f"[{sender.session_name}] {result.outcome} for {record['contact']}, retrying in {int(delay)}s")
+                continue
+            results.write(record, result, attempts, sender.session_name)
+            if not sender.is_driver_active():
+                print(f"[{sender.session_name}] Browser closed; this session stops here.")
+                return
+    except Exception as e:
+        print(f"[{sender.session_name}] Session failed: {str(e)}")
+    finally:
+        # retries this session can no longer make keep their last failure; a resumed run tries them again
+        for record, _message, attempts, result in retries.drain():
+            results.write(record, result, attempts, sender.session_name)
+        sender.quit_driver()
+
+
+def _put(tasks, item, workers):
+    """Queue an item, giving up once no session is left to take it."""
+    while any(worker.is_alive() for worker in workers):
+        try:
+            tasks.put(item, timeout=1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def run_batch(recipients_path, senders, message='', attachment_path=None, results_path=None, resume=True):
+    """
+    Send `message` (a template) to every recipient in `recipients_path`, sharing the rows between
+    `senders`. Returns a summary dict: counts per outcome, rows skipped as already done, rows left
+    unprocessed because every session went down, and the sessions that managed to log in.
+    """
+    template = MessageTemplate(message)
+    finished = load_finished(results_path) if resume else set()
+    tasks = queue.Queue(maxsize=QUEUE_PER_SESSION * len(senders))
+    results = ResultsWriter(results_path)
+    connected = []
+    workers = [
+        threading.Thread(
+            target=_session_worker, args=(sender, tasks, results, template, attachment_path, connected),
+            name=f"session-{sender.session_name}", daemon=True
+        )
+        for sender in senders
+    ]
+    for worker in workers:
+        worker.start()
+
+    started = datetime.now()
+    skipped = unprocessed = 0
+    seen = set()
+    try:
+        for record in iter_recipients(recipients_path):
+            contact = record['contact']
+            if contact in finished or contact in seen:
+                skipped += 1
+                continue
+            seen.add(contact)
+            if unprocessed or not _put(tasks, record, workers):
+                unprocessed += 1
+        for _ in workers:
+            _put(tasks, None, workers)
+        for worker in workers:
+            worker.join()
+        # rows queued before the last session went down were never taken
+        while True:
+            try:
+                record = tasks.get_nowait()
+            except queue.Empty:
+                break
+            if record is not None:
+                unprocessed += 1
+    finally:
+        results.close()
+
+    return {
+        'outcomes': results.counts,
+        'skipped': skipped,
+        'unprocessed': unprocessed,
+        'connected': connected,
+        'duration': str(datetime.now() - started),
+    }
+
+
+def _session_config(session_name, headless):
+    config = dict(CONFIG)
+    # every extra session needs its own logged-in Chrome profile
+    if session_name != 'default':
+        config['profile_name'] = session_name
+    if headless:
+        config['headless'] = 'true'
+    return config
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send a WhatsApp message to every recipient in a file")
+    parser.add_argument('recipients', help="Recipients file (Excel, CSV or Parquet) with a Contact column")
+    text = parser.add_mutually_exclusive_group()
+    text.add_argument('-m', '--message', default='', help="Message template, e.g. 'Hi {first_name}'")
+    text.add_argument('--message-file', help="Read the message template from a file")
+    parser.add_argument('-a', '--attachment', help="File to attach to every message")
+    parser.add_argument('-s', '--sessions', default='default',
+                        help="Comma-separated sessions; each extra one uses the Chrome profile of that name")
+    parser.add_argument('-r', '--results', help="JSONL results file (default: <recipients>.results.jsonl)")
+    parser.add_argument('--no-resume', action='store_true', help="Send to everyone even if the results file says done")
+    parser.add_argument('--headless', action='store_true', help="Run Chrome headless (profiles must already be logged in)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.recipients):
+        parser.error(f"File not found: {args.recipients}")
+    if args.attachment and not os.path.exists(args.attachment):
+        parser.error(f"File not found: {args.attachment}")
+    message = args.message
+    if args.message_file:
+        with open(args.message_file, encoding='utf-8') as f:
+            message = f.read()
+
+    senders = []
+    for name in dict.fromkeys(s.strip() for s in args.sessions.split(',') if s.strip()):
+        sender = WhatsAppBulkSender(session_name=name)
+        sender.config = _session_config(name, args.headless)
+        senders.append(sender)
+    if not senders:
+        parser.error("No sessions given")
+
+    results_path = args.results or f"{os.path.splitext(args.recipients)[0]}.results.jsonl"
+    summary = run_batch(
+        args.recipients, senders, message, args.attachment, results_path, resume=not args.no_resume
+    )
+    print(json.dumps(summary))
+
+    if not summary['connected']:
+        print("No WhatsApp session could log in; nothing was sent.")
+        return 2
+    if summary['unprocessed']:
+        return 2
+    failed = sum(n for outcome, n in summary['outcomes'].items() if outcome != SendOutcome.SENT)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,9 +3,45 @@ import os
 CONFIG = {
     # WebDriver settings
     'max_retries': os.getenv('MAX_RETRIES', r'3'),
+    'retry_base_delay': os.getenv('RETRY_BASE_DELAY', r'30'),
+    'retry_max_delay': os.getenv('RETRY_MAX_DELAY', r'600'),
+    # Calling code added to numbers written in national format (e.g. 91 for India); empty = numbers must carry one
+    'default_country_code': os.getenv('DEFAULT_COUNTRY_CODE', ''),
     'delay_between_messages': os.getenv('DELAY_BETWEEN_MESSAGES', r'30'),
     'upload_timeout': os.getenv('UPLOAD_TIMEOUT', r'60'),
     'chat_load_timeout': os.getenv('CHAT_LOAD_TIMEOUT', r'50'),
+    # Adaptive waits: timeout = p95 of recent waits x multiple, kept between the floor and the values above
+    'adaptive_timeouts': os.getenv('ADAPTIVE_TIMEOUTS', 'true'),
+    'timeout_safety_multiple': os.getenv('TIMEOUT_SAFETY_MULTIPLE', r'3'),
+    'min_wait_timeout': os.getenv('MIN_WAIT_TIMEOUT', r'2'),
+    # Ceilings of the shorter waits: chat settling after navigation, the attach button, send confirmation
+    'chat_load_wait_timeout': os.getenv('CHAT_LOAD_WAIT_TIMEOUT', r'15'),
+    'attach_button_timeout': os.getenv('ATTACH_BUTTON_TIMEOUT', r'10'),
+    'confirm_timeout': os.getenv('CONFIRM_TIMEOUT', r'10'),
+    # After this many timeouts in a row a step waits its full ceiling again, until one succeeds
+    'timeout_misses_to_ceiling': os.getenv('TIMEOUT_MISSES_TO_CEILING', r'3'),
+    'headless': os.getenv('HEADLESS', 'false'),
+    # Pre-load the next recipient's chat in a second tab during the pacing delay
+    'pipeline_sends': os.getenv('PIPELINE_SENDS', 'false'),
+    'scripted_sends': os.getenv('SCRIPTED_SENDS', 'true'),
+    'send_ack': os.getenv('SEND_ACK', 'true'),
+    'receipt_sweep_minutes': os.getenv('RECEIPT_SWEEP_MINUTES', '15'),
+    'receipt_sweep_days': os.getenv('RECEIPT_SWEEP_DAYS', '7'),
+    'receipt_sweep_pause': os.getenv('RECEIPT_SWEEP_PAUSE', '1.0'),
+    'self_chat_phone': os.getenv('SELF_CHAT_PHONE', ''),
+    'forward_batch_size': os.getenv('FORWARD_BATCH_SIZE', '5'),
+    # Max campaign messages per number across campaigns, e.g. '1/24h,3/7d' (empty = no cap)
+    'frequency_caps': os.getenv('FREQUENCY_CAPS', ''),
+    'scheduler_jobstore': os.getenv('SCHEDULER_JOBSTORE', 'memory'),
+    # Unix socket of the sender daemon (sender_daemon.py); empty = sessions run inside the web process
+    'sender_socket': os.getenv('SENDER_SOCKET', ''),
+    'sender_rpc_timeout': os.getenv('SENDER_RPC_TIMEOUT', '120'),
+    # Several workers (hosts) can send one campaign: recipients are leased in batches, with expiry
+    'worker_id': os.getenv('WORKER_ID', ''),
+    'lease_seconds': os.getenv('LEASE_SECONDS', '300'),
+    'lease_batch_size': os.getenv('LEASE_BATCH_SIZE', '20'),
+    # Join running campaigns started by other workers every N seconds (0 = only send campaigns started here)
+    'cluster_poll_seconds': os.getenv('CLUSTER_POLL_SECONDS', '0'),
 
     # Chrome profile settings (IMPORTANT: Update these paths)
     'user_data_dir': os.getenv('CHROME_USER_DATA_DIR', ''),
@@ -13,8 +49,14 @@ CONFIG = {
     
     # API settings
     'upload_folder': 'uploads',
+    # Parsed recipient sheets, cached as Parquet by file hash (0 MB disables)
+    'parse_cache_dir': os.getenv('PARSE_CACHE_DIR', os.path.join('uploads', 'parsed')),
+    'parse_cache_mb': os.getenv('PARSE_CACHE_MB', '256'),
     'max_file_size': int(os.getenv('MAX_FILE_SIZE_MB', '16')) * 1024 * 1024,
     # Logging
     'log_level': os.getenv('LOG_LEVEL', 'INFO'),
-    'log_file': 'whatsapp_sender.log'
+    'log_file': 'whatsapp_sender.log',
+    # Per-recipient span traces (see whatsapp_sender/tracing.py); adds a span around every WebDriver call
+    'trace_sends': os.getenv('TRACE_SENDS', 'false'),
+    'trace_dir': os.getenv('TRACE_DIR', 'traces'),
 }
@@ -0,0 +1,190 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from selenium.common.exceptions import TimeoutException
+
+# Minimal Prometheus text-format metrics (no client library needed).
+# Everything lives in process memory and is rendered on each scrape of /metrics.
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30, 60, 120)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    body = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs)
+    return '{' + body + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block; adds an `outcome` label (ok/timeout/error) if declared."""
+        started = time.monotonic()
+        outcome = 'ok'
+        try:
+            yield
+        except TimeoutException:
+            outcome = 'timeout'
+            raise
+        except Exception:
+            outcome = 'error'
+            raise
+        finally:
+            if 'outcome' in self.labelnames and 'outcome' not in labels:
+                labels['outcome'] = outcome
+            self.observe(time.monotonic() - started, **labels)
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, state['counts']):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+                lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+SEND_STEP_SECONDS = REGISTRY.register(Histogram(
+    'whatsapp_send_step_seconds',
+    'Time spent in each step of send_message.',
+    ('step', 'session', 'outcome')
+))
+SEND_SECONDS = REGISTRY.register(Histogram(
+    'whatsapp_send_seconds',
+    'End-to-end time of send_message per recipient.',
+    ('session', 'outcome')
+))
+SENDS_TOTAL = REGISTRY.register(Counter(
+    'whatsapp_sends_total',
+    'Send attempts by outcome code.',
+    ('session', 'outcome')
+))
+DB_FLUSH_SECONDS = REGISTRY.register(Histogram(
+    'whatsapp_db_flush_seconds',
+    'Time spent writing a send outcome back to the database.',
+    (),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'whatsapp_queue_depth',
+    'Recipients still queued across dispatched campaigns.'
+))
+ACTIVE_CAMPAIGNS = REGISTRY.register(Gauge(
+    'whatsapp_active_campaigns',
+    'Campaigns currently sharing the sessions.'
+))
+SESSIONS_ALIVE = REGISTRY.register(Gauge(
+    'whatsapp_sessions_alive',
+    'Sessions whose browser is up (1) or down (0).',
+    ('session',)
+))
+SEND_ACK_SECONDS = REGISTRY.register(Histogram(
+    'whatsapp_send_ack_seconds',
+    'Time from the send click until WhatsApp acknowledged the message, by tick state reached.',
+    ('session', 'receipt')
+))
+WAIT_TIMEOUT_SECONDS = REGISTRY.register(Gauge(
+    'whatsapp_wait_timeout_seconds',
+    'Current (adaptive) timeout applied to each WebDriver wait step.',
+    ('step', 'session')
+))
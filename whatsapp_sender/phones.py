@@ -0,0 +1,109 @@
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+from .config import CONFIG
+
+# Phone numbers are normalised to E.164 digits without the '+' (e.g. 919876543210), the form
+# WhatsApp Web's send URL takes. normalize_phones() works on a whole column with pandas string ops;
+# normalize_phone() applies the same rules to a single value.
+#
+# Numbers written without '+' or '00' that match the default country's national format (optionally
+# with its trunk 0) get DEFAULT_COUNTRY_CODE prepended; anything else must already carry a country code.
+
+# Calling code -> national significant number pattern, for the countries we send to most.
+# Calling codes are prefix-free, so at most one entry can match a number.
+NATIONAL_NUMBERS = {
+    '1': r'[2-9]\d{2}[2-9]\d{6}',            # US, Canada (NANP)
+    '7': r'[3-9]\d{9}',                      # Russia, Kazakhstan
+    '20': r'1\d{9}|[2-9]\d{7,8}',            # Egypt
+    '27': r'[1-8]\d{8}',                     # South Africa
+    '33': r'[1-9]\d{8}',                     # France
+    '34': r'[6-9]\d{8}',                     # Spain
+    '39': r'3\d{8,9}|0\d{5,10}',             # Italy (landlines keep their 0)
+    '44': r'[1-9]\d{8,9}',                   # United Kingdom
+    '49': r'1[5-7]\d{8,9}|[2-9]\d{5,10}',    # Germany
+    '52': r'[1-9]\d{9}',                     # Mexico
+    '55': r'[1-9]{2}\d{8,9}',                # Brazil
+    '61': r'[2-478]\d{8}',                   # Australia
+    '62': r'8\d{8,11}|[2-7]\d{6,10}',        # Indonesia
+    '63': r'9\d{9}|[2-8]\d{7,8}',            # Philippines
+    '86': r'1[3-9]\d{9}|[2-9]\d{8,10}',      # China
+    '90': r'[2-5]\d{9}',                     # Turkey
+    '91': r'[1-9]\d{9}',                     # India
+    '92': r'3\d{9}|[2-9]\d{7,9}',            # Pakistan
+    '234': r'[7-9][01]\d{8}|[1-9]\d{7}',     # Nigeria
+    '254': r'[17]\d{8}|[2-6]\d{7,8}',        # Kenya
+    '880': r'1[3-9]\d{8}|[2-9]\d{6,9}',      # Bangladesh
+    '966': r'5\d{8}|1\d{7}',                 # Saudi Arabia
+    '971': r'5\d{8}|[2-9]\d{7}',             # United Arab Emirates
+}
+# Other countries only get the generic E.164 check: 8-15 digits, no leading 0
+_KNOWN_CODES = '|'.join(sorted(NATIONAL_NUMBERS, key=len, reverse=True))
+E164_PATTERN = '(?=\\d{8,15}$)(?:' + '|'.join(
+    f'{code}(?:{national})' for code, national in NATIONAL_NUMBERS.items()
+) + f'|(?!{_KNOWN_CODES})[1-9]\\d*)'
+_E164_RE = re.compile(E164_PATTERN)
+_INTERNATIONAL_RE = re.compile(r'\s*(?:\+|00)')
+# a float printed as text ('919876543210.0'); the '.0' is not part of the number
+_FLOAT_TEXT_RE = re.compile(r'^(\d+)\.0$')
+
+
+def default_country_code(value=None):
+    """Calling code digits from `value`, or from the DEFAULT_COUNTRY_CODE setting."""
+    if value is None:
+        value = CONFIG.get('default_country_code', '')
+    return re.sub(r'\D', '', str(value or ''))
+
+
+@lru_cache(maxsize=None)
+def _local_pattern(country_code):
+    national = NATIONAL_NUMBERS.get(country_code, r'[1-9]\d{5,13}')
+    # "0?" lets a trunk 0 go (0 98765 43210 -> 9876543210) while still matching Italy's 06...
+    return f'^0?({national})$'
+
+
+def digits_only(value):
+    if value is None:
+        return ''
+    return re.sub(r'\D', '', str(value))
+
+
+def normalize_phone(value, country_code=None):
+    """E.164 digits for one phone number, or '' when it isn't a valid number."""
+    if value is None or (isinstance(value, float) and value != value):
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = _FLOAT_TEXT_RE.sub(r'\1', str(value))
+    digits = digits_only(text)
+    if _INTERNATIONAL_RE.match(text):
+        if text.strip().startswith('00'):
+            digits = digits[2:]
+    else:
+        country_code = default_country_code(country_code)
+        if country_code:
+            digits = re.sub(_local_pattern(country_code), country_code + r'\1', digits)
+    return digits if _E164_RE.fullmatch(digits) else ''
+
+
+def normalize_phones(values, country_code=None):
+    """normalize_phone over a whole column (Series or list); invalid numbers become ''."""
+    series = values if isinstance(values, pd.Series) else pd.Series(list(values), dtype=object)
+    if pd.api.types.is_float_dtype(series):
+        # numbers read from spreadsheets: keep whole numbers intact (no '.0' suffix)
+        series = series.round().astype('Int64')
+    # floats mixed into a text column print as '919876543210.0'
+    text = series.astype('string').str.replace(_FLOAT_TEXT_RE.pattern, r'\1', regex=True)
+    digits = text.str.replace(r'\D', '', regex=True)
+    international = text.str.match(_INTERNATIONAL_RE.pattern).fillna(False)
+    digits = digits.mask(international & text.str.strip().str.startswith('00'), digits.str[2:])
+
+    country_code = default_country_code(country_code)
+    if country_code:
+        local = digits.str.replace(_local_pattern(country_code), country_code + r'\1', regex=True)
+        digits = digits.where(international, local)
+
+    valid = digits.str.fullmatch(E164_PATTERN).fillna(False).astype(bool)
+    return digits.where(valid, '').fillna('').astype(object)
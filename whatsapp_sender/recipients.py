@@ -0,0 +1,162 @@
+import csv
+import io
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from .phones import digits_only, normalize_phone, normalize_phones
+
+# Recipient lists: Excel (.xlsx/.xls), CSV or Parquet, told apart by their first bytes rather than
+# the file name. read_table() loads a whole list into a DataFrame (uploads); iter_recipients() streams
+# one row at a time (batch runs). Both name columns the same way: the phone number comes from the
+# "Contact" column, or the second column, or the only column.
+
+CONTACT_COLUMN = 'contact'
+# Columns with a fixed meaning, matched case-insensitively and renamed to these spellings
+KNOWN_COLUMNS = ('Name', 'Contact', 'Email', 'Message')
+CSV_DELIMITERS = ',;\t|'
+SNIFF_BYTES = 64 * 1024
+
+
+def sniff_format(head, filename=''):
+    """'xlsx', 'xls', 'parquet' or 'csv' from the first bytes of a file."""
+    if head.startswith(b'PAR1'):
+        return 'parquet'
+    if head.startswith(b'PK\x03\x04'):
+        return 'xlsx'
+    if head.startswith(b'\xd0\xcf\x11\xe0'):
+        return 'xls'
+    if b'\x00' not in head[:SNIFF_BYTES]:
+        return 'csv'
+    raise ValueError(f"Unrecognised recipients file: {filename or 'upload'}")
+
+
+def _csv_delimiter(head):
+    text = head[:SNIFF_BYTES].decode('utf-8-sig', errors='ignore')
+    try:
+        return csv.Sniffer().sniff(text, delimiters=CSV_DELIMITERS).delimiter
+    except csv.Error:
+        return ','
+
+
+def read_table(data, filename=''):
+    """Parse the bytes of a recipients file (any supported format) into a DataFrame."""
+    kind = sniff_format(data[:SNIFF_BYTES], filename)
+    if kind == 'parquet':
+        return pd.read_parquet(io.BytesIO(data))
+    if kind == 'csv':
+        delimiter = _csv_delimiter(data)
+        try:
+            return _arrow_csv(data, delimiter)
+        except (ImportError, ValueError):
+            # no pyarrow, or a file its strict parser rejects (ragged rows, odd quoting)
+            return pd.read_csv(io.BytesIO(data), sep=delimiter, dtype=str, encoding='utf-8-sig')
+    return pd.read_excel(io.BytesIO(data), sheet_name=0)
+
+
+def _arrow_csv(data, delimiter):
+    # Every column as text: pandas' pyarrow engine infers numbers first (dtype= only casts the result
+    # back), which drops trunk zeros and '00'/'+' prefixes from phone numbers.
+    import pyarrow as pa
+    from pyarrow import csv as arrow_csv
+    head = data[:SNIFF_BYTES].decode('utf-8-sig', errors='ignore')
+    header = next(csv.reader(io.StringIO(head), delimiter=delimiter), [])
+    table = arrow_csv.read_csv(
+        io.BytesIO(data),
+        parse_options=arrow_csv.ParseOptions(delimiter=delimiter),
+        convert_options=arrow_csv.ConvertOptions(
+            column_types={name: pa.string() for name in header}, strings_can_be_null=True
+        ),
+    )
+    return table.to_pandas()
+
+
+def _contact_position(names):
+    names = [str(name).strip().lower() for name in names]
+    if CONTACT_COLUMN in names:
+        return names.index(CONTACT_COLUMN)
+    return 1 if len(names) > 1 else 0
+
+
+def contact_column(columns):
+    """The column holding phone numbers, or None for a sheet without columns."""
+    columns = list(columns)
+    return columns[_contact_position(columns)] if columns else None
+
+
+def normalize_columns(df):
+    """Strip column names and spell the known ones (contact, NAME, ...) the way the app expects."""
+    known = {name.lower(): name for name in KNOWN_COLUMNS}
+    df.columns = [known.get(str(c).strip().lower(), str(c).strip()) for c in df.columns]
+    return df
+
+
+def normalize_contacts(series):
+    """E.164 digits of each phone number ('' where invalid), see whatsapp_sender.phones."""
+    return normalize_phones(series)
+
+
+def _xlsx_rows(path):
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _xls_rows(path):
+    # legacy .xls has no streaming reader; xlrd loads the sheet whole
+    df = pd.read_excel(path, sheet_name=0, header=None, dtype=object)
+    for row in df.itertuples(index=False, name=None):
+        yield tuple(None if pd.isna(v) else v for v in row)
+
+
+def _csv_rows(path):
+    with open(path, 'rb') as f:
+        delimiter = _csv_delimiter(f.read(SNIFF_BYTES))
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        yield from csv.reader(f, delimiter=delimiter)
+
+
+def _parquet_rows(path):
+    import pyarrow.parquet as pq
+    parquet = pq.ParquetFile(path)
+    yield tuple(parquet.schema_arrow.names)
+    for batch in parquet.iter_batches():
+        yield from zip(*(column.to_pylist() for column in batch.columns))
+
+
+_READERS = {
+    'xlsx': _xlsx_rows,
+    'xls': _xls_rows,
+    'csv': _csv_rows,
+    'parquet': _parquet_rows,
+}
+
+
+def iter_recipients(path):
+    """
+    Yield one dict per recipient row: lower-cased column name -> cell value, with 'contact' set to
+    the normalised number. Rows without a number are skipped; a number that fails validation is
+    kept as its digits with 'invalid' set, so it can be reported without a send attempt.
+    """
+    with open(path, 'rb') as f:
+        kind = sniff_format(f.read(SNIFF_BYTES), path)
+
+    rows = _READERS[kind](path)
+    header = next(rows, None)
+    if not header:
+        return
+    columns = [str(h).strip().lower() if h is not None else '' for h in header]
+    contact_index = _contact_position(columns)
+    for values in rows:
+        raw = values[contact_index] if contact_index < len(values) else None
+        digits = digits_only(raw)
+        if not digits:
+            continue
+        record = {name: value for name, value in zip(columns, values) if name and value not in (None, '')}
+        contact = normalize_phone(raw)
+        record[CONTACT_COLUMN] = contact or digits
+        if not contact:
+            record['invalid'] = True
+        yield record
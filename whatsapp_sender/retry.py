@@ -0,0 +1,125 @@
+import heapq
+import itertools
+import random
+import time
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+
+class SendOutcome:
+    """Outcome codes returned by WhatsAppBulkSender.send_message."""
+    SENT = 'sent'
+    INVALID_NUMBER = 'invalid_number'
+    LOAD_TIMEOUT = 'load_timeout'
+    UPLOAD_TIMEOUT = 'upload_timeout'
+    SESSION_LOST = 'session_lost'
+    ERROR = 'error'
+
+    # Retrying these can never succeed
+    PERMANENT = frozenset({INVALID_NUMBER})
+
+
+class SendResult:
+    """
+    Result of a single send attempt. Truthy only when the message was sent.
+    `receipt` is the tick state seen when the send was acknowledged (sent/delivered/read, or pending
+    if it was still on the clock), None when no acknowledgement was observed.
+    """
+
+    def __init__(self, outcome, error=None, receipt=None):
+        self.outcome = outcome
+        self.error = error
+        self.receipt = receipt
+
+    @property
+    def ok(self):
+        return self.outcome == SendOutcome.SENT
+
+    @property
+    def permanent(self):
+        return self.outcome in SendOutcome.PERMANENT
+
+    def __bool__(self):
+        return self.ok
+
+    def __repr__(self):
+        return f"SendResult({self.outcome!r}, {self.error!r}, receipt={self.receipt!r})"
+
+
+_SESSION_LOST_MARKERS = (
+    'invalid session id',
+    'no such window',
+    'chrome not reachable',
+    'disconnected',
+    'session deleted',
+    'target window already closed',
+)
+
+
+def classify_exception(exc):
+    """Map a WebDriver exception to a SendOutcome code."""
+    if isinstance(exc, TimeoutException):
+        return SendOutcome.LOAD_TIMEOUT
+    if isinstance(exc, WebDriverException):
+        message = (exc.msg or str(exc)).lower()
+        if any(marker in message for marker in _SESSION_LOST_MARKERS):
+            return SendOutcome.SESSION_LOST
+    return SendOutcome.ERROR
+
+
+class RetryPolicy:
+    """Decides whether a failed send is retried and how long it waits (exponential backoff + full jitter)."""
+
+    def __init__(self, max_retries=3, base_delay=30, max_delay=600):
+        self.max_retries = int(max_retries)
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            max_retries=config.get('max_retries', 3),
+            base_delay=config.get('retry_base_delay', 30),
+            max_delay=config.get('retry_max_delay', 600),
+        )
+
+    def should_retry(self, result, attempts):
+        """attempts is the number of attempts already made for this recipient."""
+        if result.ok or result.permanent:
+            return False
+        return attempts < self.max_retries
+
+    def next_delay(self, attempts):
+        ceiling = min(self.max_delay, self.base_delay * (2 ** max(attempts - 1, 0)))
+        return random.uniform(ceiling / 2, ceiling)
+
+
+class DeferredRetryQueue:
+    """Tail queue of transient failures that become ready again after their backoff delay."""
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+
+    def push(self, item, delay):
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), item))
+
+    def pop_ready(self):
+        """Return the next item whose delay has elapsed, or None."""
+        if self._heap and self._heap[0][0] <= time.monotonic():
+            return heapq.heappop(self._heap)[2]
+        return None
+
+    def seconds_until_next(self):
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - time.monotonic())
+
+    def drain(self):
+        """Remove and return every item, ready or not, in the order they would become ready."""
+        items = [entry[2] for entry in sorted(self._heap)]
+        self._heap = []
+        return items
+
+    def __len__(self):
+        return len(self._heap)
@@ -0,0 +1,104 @@
+"""
+Line-delimited JSON RPC over a Unix socket, used between the web workers and the sender daemon.
+
+    request:  {"method": "start_campaign", "args": [12, null]}
+    reply:    {"result": ...}  or  {"error": "RuntimeError: WhatsApp login failed"}
+
+One JSON object per line each way. A connection may carry any number of calls; the client opens a
+fresh one per call, which costs next to nothing on a local socket and survives gunicorn forking.
+"""
+import json
+import os
+import socket
+import socketserver
+
+
+class SenderUnavailable(RuntimeError):
+    """The sender daemon isn't running or didn't answer in time."""
+
+
+class RemoteError(RuntimeError):
+    """The call reached the sender daemon and raised there."""
+
+
+class RpcClient:
+    def __init__(self, path, timeout=120.0):
+        self.path = path
+        self.timeout = timeout
+
+    def call(self, method, *args):
+        request = json.dumps({'method': method, 'args': list(args)}, default=str).encode('utf-8') + b'\n'
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.path)
+                with sock.makefile('rwb') as stream:
+                    stream.write(request)
+                    stream.flush()
+                    line = stream.readline()
+        except OSError as e:
+            raise SenderUnavailable(f"Sender daemon on {self.path} is unavailable: {str(e)}") from e
+        if not line:
+            raise SenderUnavailable(f"Sender daemon on {self.path} closed the connection")
+        reply = json.loads(line)
+        if 'error' in reply:
+            raise RemoteError(reply['error'])
+        return reply.get('result')
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                reply = {'result': self.server.dispatch(request['method'], request.get('args') or [])}
+            except Exception as e:
+                reply = {'error': f"{type(e).__name__}: {str(e)}"}
+            self.wfile.write(json.dumps(reply, default=str).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class RpcServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves `handlers` (method name -> callable) on a Unix socket, one thread per connection. Each
+    call runs inside `context()` when given (e.g. a Flask app context). POSIX only.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path, handlers, context=None):
+        self.handlers = handlers
+        self.context = context
+        _remove_stale_socket(path)
+        super().__init__(path, _RequestHandler)
+        # only the user running the app may drive its WhatsApp sessions
+        os.chmod(path, 0o600)
+
+    def dispatch(self, method, args):
+        handler = self.handlers.get(method)
+        if handler is None:
+            raise KeyError(f"Unknown method {method!r}")
+        if self.context is None:
+            return handler(*args)
+        with self.context():
+            return handler(*args)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.remove(self.server_address)
+        except OSError:
+            pass
+
+
+def _remove_stale_socket(path):
+    """Delete a socket file left by a daemon that died, refusing to take over a live one."""
+    if not os.path.exists(path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            os.remove(path)
+            return
+    raise RuntimeError(f"Another sender daemon is already listening on {path}")
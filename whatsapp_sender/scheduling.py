@@ -0,0 +1,133 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class FairShareScheduler:
+    """
+    Decides which ready campaign the next free session sends for.
+
+    Each campaign carries a virtual clock that advances by 1/priority per send; the lowest clock goes
+    next, so a priority-2 campaign gets twice the sends of a priority-1 campaign and a huge campaign
+    can't starve a small one. Campaigns whose deadline is at risk jump ahead (earliest deadline first).
+    """
+
+    def __init__(self, avg_send_seconds=30.0, sessions=1):
+        self._cond = threading.Condition()
+        self._entries = {}
+        self._seq = 0
+        self.avg_send_seconds = float(avg_send_seconds)
+        self.sessions = max(int(sessions), 1)
+
+    def add(self, key, priority=1, deadline=None, remaining=0):
+        with self._cond:
+            clocks = [e['vtime'] for e in self._entries.values()]
+            self._seq += 1
+            self._entries[key] = {
+                'key': key,
+                'priority': max(int(priority or 1), 1),
+                'deadline': deadline,
+                'remaining': remaining,
+                'vtime': min(clocks) if clocks else 0.0,
+                'ready_at': 0.0,
+                'seq': self._seq,
+                'started_at': None,
+                'queued_at': datetime.now(),
+            }
+            self._cond.notify_all()
+
+    def remove(self, key):
+        with self._cond:
+            self._entries.pop(key, None)
+            self._cond.notify_all()
+
+    def update_remaining(self, key, remaining):
+        with self._cond:
+            if key in self._entries:
+                self._entries[key]['remaining'] = remaining
+
+    def hold(self, key, seconds):
+        """Skip this campaign until `seconds` from now (e.g. only deferred retries left)."""
+        with self._cond:
+            if key in self._entries:
+                self._entries[key]['ready_at'] = time.monotonic() + seconds
+
+    def charge(self, key):
+        """Account one send to a campaign (called when its recipient is handed to a session)."""
+        with self._cond:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry['vtime'] += 1.0 / entry['priority']
+                if entry['started_at'] is None:
+                    entry['started_at'] = datetime.now()
+            self._cond.notify_all()
+
+    def record_send_time(self, elapsed):
+        """Fold one send's duration into the running average used for time estimates."""
+        with self._cond:
+            self.avg_send_seconds = 0.9 * self.avg_send_seconds + 0.1 * elapsed
+
+    def _at_risk(self, entry, now):
+        if not entry['deadline']:
+            return False
+        needed = entry['remaining'] * self.avg_send_seconds / self.sessions
+        return now + timedelta(seconds=needed) >= entry['deadline']
+
+    def _order(self, entries):
+        now = datetime.now()
+
+        def sort_key(e):
+            urgent_deadline = e['deadline'] if self._at_risk(e, now) else datetime.max
+            return (urgent_deadline, e['vtime'], -e['priority'], e['seq'])
+
+        return sorted(entries, key=sort_key)
+
+    def acquire(self, timeout=None):
+        """Block until a campaign is ready and return its key (None on timeout)."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                ready = [e for e in self._entries.values() if e['ready_at'] <= now]
+                if ready:
+                    return self._order(ready)[0]['key']
+                waits = [e['ready_at'] - now for e in self._entries.values()]
+                if deadline is not None:
+                    if now >= deadline:
+                        return None
+                    waits.append(deadline - now)
+                self._cond.wait(min(waits) if waits else None)
+
+    def __len__(self):
+        with self._cond:
+            return len(self._entries)
+
+    def depth(self):
+        """Total recipients still queued across all campaigns."""
+        with self._cond:
+            return sum(e['remaining'] for e in self._entries.values())
+
+    def snapshot(self):
+        """Queue state with expected start/finish times for each campaign."""
+        with self._cond:
+            entries = self._order(list(self._entries.values()))
+            total_weight = sum(e['priority'] for e in entries) or 1
+            now = datetime.now()
+            per_slot = self.avg_send_seconds / self.sessions
+            rows = []
+            for rank, e in enumerate(entries):
+                share = e['priority'] / total_weight
+                expected_start = e['started_at'] or now + timedelta(seconds=rank * per_slot)
+                finish_in = e['remaining'] * per_slot / share
+                rows.append({
+                    'campaign_id': e['key'],
+                    'priority': e['priority'],
+                    'deadline': e['deadline'].isoformat() if e['deadline'] else None,
+                    'remaining': e['remaining'],
+                    'share': round(share, 3),
+                    'at_risk': self._at_risk(e, now),
+                    'queued_at': e['queued_at'].isoformat(),
+                    'expected_start': expected_start.isoformat(),
+                    'expected_finish': (now + timedelta(seconds=finish_in)).isoformat(),
+                })
+            return rows
@@ -0,0 +1,239 @@
+# In-page JavaScript used by the scripted fast path of WhatsAppBulkSender.
+# Each snippet does in one execute_script / execute_async_script round-trip what the WebDriver path
+# does with several find/click/poll commands. XPaths are passed in as arguments so xpath.py stays
+# the single source of selectors.
+
+_BY_XPATH = """
+var byXpath = function (xp, context) {
+    return document.evaluate(xp, context || document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+};
+"""
+
+# Maps a message status icon to 'pending' (clock), 'sent', 'delivered' or 'read'.
+_TICK_STATE = """
+var tickState = function (icon) {
+    if (!icon) { return null; }
+    var name = icon.getAttribute('data-icon') || '';
+    var label = (icon.getAttribute('aria-label') || '').toLowerCase();
+    if (name.indexOf('time') !== -1) { return 'pending'; }
+    if (label.indexOf('read') !== -1) { return 'read'; }
+    if (name.indexOf('dblcheck') !== -1) { return 'delivered'; }
+    return 'sent';
+};
+"""
+
+# Remembers which outgoing message rows were already in the chat, so the acknowledgement watcher
+# only considers the bubble of the message being sent.
+_MARK_OUTGOING = """
+var markOutgoing = function (rowsXp) {
+    var rows = document.evaluate(rowsXp, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    var seen = {};
+    for (var i = 0; i < rows.snapshotLength; i++) { seen[rows.snapshotItem(i).getAttribute('data-id')] = true; }
+    window.__waOutgoingSeen = seen;
+};
+"""
+
+# async: (input_box_xpath, invalid_number_xpath, outgoing_rows_xpath, timeout_ms) -> 'ready' | 'invalid' | 'timeout'
+# Polls inside the page until the chat is usable or the number is reported invalid; focuses the box
+# and marks the outgoing messages already present.
+OPEN_CHAT_JS = _BY_XPATH + _MARK_OUTGOING + """
+var inputXp = arguments[0], invalidXp = arguments[1], rowsXp = arguments[2], timeoutMs = arguments[3];
+var done = arguments[arguments.length - 1];
+var started = Date.now();
+(function poll() {
+    if (byXpath(invalidXp)) { done('invalid'); return; }
+    var box = byXpath(inputXp);
+    if (box && box.offsetParent !== null) { markOutgoing(rowsXp); box.focus(); done('ready'); return; }
+    if (Date.now() - started > timeoutMs) { done('timeout'); return; }
+    setTimeout(poll, 100);
+})();
+"""
+
+# async: (xpath, present, timeout_ms) -> true once the element exists (or is gone when present is
+# false), false on timeout
+WAIT_FOR_XPATH_JS = _BY_XPATH + """
+var xp = arguments[0], present = arguments[1], timeoutMs = arguments[2];
+var done = arguments[arguments.length - 1];
+var started = Date.now();
+(function poll() {
+    if (!byXpath(xp) === !present) { done(true); return; }
+    if (Date.now() - started > timeoutMs) { done(false); return; }
+    setTimeout(poll, 100);
+})();
+"""
+
+# sync: (box_xpath, send_button_xpath, text) -> 'sent' | 'no_send_button' | 'no_box' | 'not_inserted'
+# Types text (newlines as line breaks) through the editor's own input handling, then clicks send.
+# With empty text it only clicks send.
+INSERT_AND_SEND_JS = _BY_XPATH + """
+var box = byXpath(arguments[0]), sendXp = arguments[1], text = arguments[2];
+if (text) {
+    if (!box) { return 'no_box'; }
+    box.focus();
+    var lines = text.split('\\n');
+    for (var i = 0; i < lines.length; i++) {
+        if (i > 0) { document.execCommand('insertLineBreak'); }
+        if (lines[i]) { document.execCommand('insertText', false, lines[i]); }
+    }
+    if (!box.textContent) { return 'not_inserted'; }
+}
+var send = byXpath(sendXp);
+if (!send) { return 'no_send_button'; }
+send.click();
+return 'sent';
+"""
+
+# async: (attach_button_xpath, file_input_xpath, timeout_ms) -> file <input> element | 'no_input' | 'no_button'
+# Opens the attach menu and waits for its file input.
+OPEN_ATTACH_MENU_JS = _BY_XPATH + """
+var button = byXpath(arguments[0]), inputXp = arguments[1], timeoutMs = arguments[2];
+var done = arguments[arguments.length - 1];
+if (!button) { done('no_button'); return; }
+button.click();
+var started = Date.now();
+(function poll() {
+    var input = byXpath(inputXp);
+    if (input) { done(input); return; }
+    if (Date.now() - started > timeoutMs) { done('no_input'); return; }
+    setTimeout(poll, 100);
+})();
+"""
+
+# sync: (outgoing_rows_xpath) -> null; marks the outgoing messages already in the chat
+MARK_OUTGOING_JS = _MARK_OUTGOING + """
+markOutgoing(arguments[0]);
+"""
+
+# async: (outgoing_rows_xpath, status_icon_xpath, timeout_ms)
+#     -> 'sent' | 'delivered' | 'read' | 'pending' | 'not_found'
+# Watches the chat with a MutationObserver until the new outgoing bubble leaves the clock (pending)
+# state, resolving the moment WhatsApp accepts it. 'pending' means the bubble was still on the clock
+# at the timeout, 'not_found' that no new bubble showed up.
+AWAIT_ACK_JS = _BY_XPATH + _TICK_STATE + """
+var rowsXp = arguments[0], iconXp = arguments[1], timeoutMs = arguments[2];
+var done = arguments[arguments.length - 1];
+var seen = window.__waOutgoingSeen || {};
+var finished = false, observer = null, timer = null;
+var newRow = function () {
+    var rows = document.evaluate(rowsXp, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    var row = rows.snapshotLength ? rows.snapshotItem(rows.snapshotLength - 1) : null;
+    return row && !seen[row.getAttribute('data-id')] ? row : null;
+};
+var finish = function (result) {
+    if (finished) { return; }
+    finished = true;
+    if (observer) { observer.disconnect(); }
+    clearTimeout(timer);
+    done(result);
+};
+var check = function () {
+    var row = newRow();
+    var state = row && tickState(byXpath(iconXp, row));
+    if (state && state !== 'pending') { finish(state); }
+};
+check();
+if (!finished) {
+    observer = new MutationObserver(check);
+    observer.observe(document.getElementById('main') || document.body, {
+        childList: true, subtree: true, attributes: true, attributeFilter: ['data-icon', 'aria-label']
+    });
+    timer = setTimeout(function () { finish(newRow() ? 'pending' : 'not_found'); }, timeoutMs);
+}
+"""
+
+# async: (pane_xpath, chat_rows_xpath, title_xpath, tick_xpath, pages, settle_ms, from_top)
+#     -> {rows: [[chat title, 'sent'|'delivered'|'read'], ...], atEnd: bool} | null
+# Reads the tick state of each chat's last message straight off the chat list, scrolling it one
+# screen at a time for up to `pages` screens (the list is virtualised, only visible rows exist).
+HARVEST_RECEIPTS_JS = _BY_XPATH + _TICK_STATE + """
+var paneXp = arguments[0], rowsXp = arguments[1], titleXp = arguments[2], tickXp = arguments[3];
+var pages = arguments[4], settleMs = arguments[5], fromTop = arguments[6];
+var done = arguments[arguments.length - 1];
+var pane = byXpath(paneXp);
+if (!pane) { done(null); return; }
+if (fromTop) { pane.scrollTop = 0; }
+var found = {}, page = 0;
+var collect = function () {
+    var rows = document.evaluate(rowsXp, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    for (var i = 0; i < rows.snapshotLength; i++) {
+        var row = rows.snapshotItem(i);
+        var title = byXpath(titleXp, row);
+        var state = tickState(byXpath(tickXp, row));
+        if (title && state && state !== 'pending') { found[title.getAttribute('title')] = state; }
+    }
+};
+(function step() {
+    collect();
+    var atEnd = pane.scrollTop + pane.clientHeight >= pane.scrollHeight - 2;
+    if (atEnd || page >= pages) {
+        done({rows: Object.keys(found).map(function (k) { return [k, found[k]]; }), atEnd: atEnd});
+        return;
+    }
+    page++;
+    pane.scrollTop += Math.floor(pane.clientHeight * 0.8);
+    setTimeout(step, settleMs);
+})();
+"""
+
+# sync: (outgoing_rows_xpath) -> data-id of the last outgoing message in the open chat, or null
+LAST_OUTGOING_ID_JS = """
+var rows = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+return rows.snapshotLength ? rows.snapshotItem(rows.snapshotLength - 1).getAttribute('data-id') : null;
+"""
+
+# async: ([xpath, ...], step_timeout_ms) -> -1 when every element was clicked in turn, else the index
+# of the first one that never showed up (menus render asynchronously after each click)
+CLICK_SEQUENCE_JS = _BY_XPATH + """
+var xpaths = arguments[0], timeoutMs = arguments[1];
+var done = arguments[arguments.length - 1];
+var index = 0, started = Date.now();
+(function step() {
+    if (index >= xpaths.length) { done(-1); return; }
+    var el = byXpath(xpaths[index]);
+    if (el) {
+        el.click();
+        index++;
+        started = Date.now();
+    } else if (Date.now() - started > timeoutMs) {
+        done(index);
+        return;
+    }
+    setTimeout(step, 100);
+})();
+"""
+
+# async: (search_box_xpath, result_xpath, no_result_xpath, query, timeout_ms) -> 'selected' | 'not_found'
+# Searches the forward dialog for one contact and ticks the result row whose title or number is the
+# one searched for; rows left over from before the list filtered are never ticked.
+SELECT_FORWARD_TARGET_JS = _BY_XPATH + """
+var searchXp = arguments[0], resultXp = arguments[1], emptyXp = arguments[2], query = arguments[3];
+var timeoutMs = arguments[4];
+var done = arguments[arguments.length - 1];
+var digits = function (text) { return (text || '').replace(/\\D/g, ''); };
+var wanted = digits(query);
+var matches = function (row) {
+    var spans = row.querySelectorAll('span');
+    for (var i = 0; i < spans.length; i++) {
+        var title = spans[i].getAttribute('title');
+        if (title === query || (wanted && digits(title || spans[i].textContent) === wanted)) { return true; }
+    }
+    return false;
+};
+var search = byXpath(searchXp);
+if (!search) { done('not_found'); return; }
+search.focus();
+document.execCommand('selectAll');
+document.execCommand('delete');
+document.execCommand('insertText', false, query);
+var started = Date.now();
+(function poll() {
+    var results = document.evaluate(resultXp, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    for (var i = 0; i < results.snapshotLength; i++) {
+        var result = results.snapshotItem(i);
+        var row = result.closest('[role="listitem"]') || result.parentNode;
+        if (matches(row)) { result.click(); done('selected'); return; }
+    }
+    if (byXpath(emptyXp) || Date.now() - started > timeoutMs) { done('not_found'); return; }
+    setTimeout(poll, 100);
+})();
+"""
@@ -6,15 +6,28 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
+from selenium.webdriver.common.action_chains import ActionChains
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.service import Service
-from datetime import datetime
 from .config import CONFIG
 from .xpath import *
+from .retry import SendOutcome, SendResult, classify_exception
+from .metrics import SEND_STEP_SECONDS, SEND_SECONDS, SENDS_TOTAL, SEND_ACK_SECONDS
+from .tracing import span, detached, traced_execute, tracing_enabled
+from .timeouts import TimeoutController
+from .upload_cache import UPLOAD_CACHE
+from .recipients import read_table, normalize_columns, contact_column, normalize_contacts
+from .scripts import (
+    OPEN_CHAT_JS, WAIT_FOR_XPATH_JS, INSERT_AND_SEND_JS, OPEN_ATTACH_MENU_JS, MARK_OUTGOING_JS, AWAIT_ACK_JS,
+    HARVEST_RECEIPTS_JS, LAST_OUTGOING_ID_JS, CLICK_SEQUENCE_JS, SELECT_FORWARD_TARGET_JS
+)
+from contextlib import contextmanager
 import logging
 from pathlib import Path 
-import pyperclip
+
+# In-page wait results meaning the script gave up at its timeout
+SCRIPT_TIMED_OUT = ('timeout', 'no_input', 'pending', 'not_found')
 
 # Suppress verbose logging
 logging.getLogger('selenium').setLevel(logging.WARNING)
@@ -41,21 +54,23 @@ class WhatsAppBulkSender:
                 print(f"Error while quitting driver: {e}")
             finally:
                 self.driver = None
+                self._prefetched = None
+                self._forward_seed = None
 
     def is_busy(self):
         """Check if the sender is currently busy."""
         return self.busy
 
-    def __init__(self):
+    def __init__(self, session_name='default'):
+        self.session_name = session_name
         self.busy = False
         self.driver = None
         self.config = CONFIG
-        self.stats = {
-            'success': 0,
-            'failures': 0,
-            'start_time': None,
-            'end_time': None
-        }
+        self.timeouts = TimeoutController(self.config, session_name)
+        # chat pre-loaded in the spare tab for the next recipient (pipelined sending)
+        self._prefetched = None
+        # (campaign key, message data-id) of the broadcast message waiting in the self chat
+        self._forward_seed = None
 
     def initialize_driver(self):
         print("Initializing Chrome with existing profile...")
@@ -78,10 +93,20 @@ class WhatsAppBulkSender:
         options.add_argument('--disable-gpu')
         options.add_argument('--no-sandbox')
         options.add_argument('--log-level=3')
+        if str(self.config.get('headless', '')).lower() in ('1', 'true', 'yes'):
+            options.add_argument('--headless=new')
+            options.add_argument('--window-size=1366,900')
         options.add_experimental_option('excludeSwitches', ['enable-logging'])
         
+        self._prefetched = None
+        self._forward_seed = None
         service = Service(ChromeDriverManager().install())
         self.driver = webdriver.Chrome(service=service, options=options)
+        if tracing_enabled(self.config):
+            # every chromedriver command becomes a span when a recipient is being traced
+            self.driver.execute = traced_execute(self.driver.execute)
+        # scripted waits time themselves out in the page; this only has to outlast the longest one
+        self.driver.set_script_timeout(self.timeouts.max_ceiling() + 10)
         print("Chrome WebDriver initialized with persistent session support.")
 
     def get_connection_status(self):
@@ -199,24 +224,23 @@ class WhatsAppBulkSender:
     def load_recipient_data(self, file_path):
         print(f"Loading recipient data from {file_path}...")
         try:
-            xls = pd.ExcelFile(file_path)
-            sheet_names = xls.sheet_names
-            print(f"Found sheets: {sheet_names}")
-
-            df = pd.read_excel(file_path, sheet_name=sheet_names[0])
-            contact_column = next((col for col in df.columns if col.strip().lower() == 'contact'), None)
-            if contact_column is None:
-                if df.shape[1] > 1:
-                    print("No 'Contact' column found. Using second column for contact numbers.")
-                    df.rename(columns={df.columns[1]: 'Contact'}, inplace=True)
-                elif df.shape[1] > 0:
-                    print("Only one column found. Using first column for contact numbers.")
-                    df.rename(columns={df.columns[0]: 'Contact'}, inplace=True)
-                else:
-                    raise ValueError("Excel sheet is empty or has no columns.")
-
-            df.rename(columns={contact_column: 'Contact'}, inplace=True)
-            df['Contact'] = df['Contact'].astype(str).str.replace(r'\D', '', regex=True)
+            with open(file_path, 'rb') as f:
+                data = f.read()
+            # first sheet only, parsed once (or not at all when the same file was loaded before)
+            df = normalize_columns(UPLOAD_CACHE.load(data, lambda: read_table(data, file_path)))
+            column = contact_column(df.columns)
+            if column is None:
+                raise ValueError("Recipients file is empty or has no columns.")
+            if column != 'Contact':
+                print(f"No 'Contact' column found. Using column '{column}' for contact numbers.")
+                df.rename(columns={column: 'Contact'}, inplace=True)
+            df['Contact'] = normalize_contacts(df['Contact'])
+            invalid = int((df['Contact'] == '').sum())
+            df = df[df['Contact'] != '']
+            duplicates = int(df['Contact'].duplicated().sum())
+            df = df.drop_duplicates('Contact')
+            if invalid or duplicates:
+                print(f"Dropped {invalid} invalid and {duplicates} duplicate numbers.")
 
             if 'Message' not in df.columns:
                 df['Message'] = ''
@@ -227,87 +251,425 @@ class WhatsAppBulkSender:
             print(f"Error loading recipient data: {str(e)}")
             raise
 
-    def send_message(self, contact, message, attachment_path=None):
+    @contextmanager
+    def _step(self, step):
+        """Time one step of the send pipeline (whatsapp_send_step_seconds metric + trace span)."""
+        with SEND_STEP_SECONDS.time(step=step, session=self.session_name), span(step):
+            yield
+
+    def _wait(self, step, condition):
+        """WebDriverWait for a pipeline step using the learned timeout; wait times and timeouts feed the controller."""
+        timeout = self.timeouts.timeout_for(step)
+        started = time.monotonic()
+        try:
+            with self._step(step):
+                result = WebDriverWait(self.driver, timeout).until(condition)
+        except TimeoutException:
+            self.timeouts.observe_timeout(step, timeout)
+            raise
+        self.timeouts.observe(step, time.monotonic() - started)
+        return result
+
+    def send_message(self, contact, message, attachment_path=None, next_contact=None, next_attachment=None):
+        """
+        Send one message. Returns a SendResult (truthy on success) carrying a SendOutcome code.
+        When pipelining is on and next_contact is given, the next chat is pre-loaded in a spare tab
+        during the pacing delay.
+        """
+        started = time.monotonic()
+        result = self._send_message(contact, message, attachment_path)
+        SEND_SECONDS.observe(time.monotonic() - started, session=self.session_name, outcome=result.outcome)
+        SENDS_TOTAL.inc(session=self.session_name, outcome=result.outcome)
+        self._pace(result, next_contact, next_attachment)
+        return result
+
+    def scripted_enabled(self):
+        return str(self.config.get('scripted_sends', 'true')).lower() in ('1', 'true', 'yes')
+
+    def _wait_scripted(self, step, script, *args):
+        """
+        Run an in-page polling script (one round-trip instead of a WebDriverWait poll loop) with the
+        learned timeout for `step` passed in as its last argument. Returns the script's result, or
+        None when the script could not run and the caller should fall back to the WebDriver path.
+        """
+        timeout = self.timeouts.timeout_for(step)
+        started = time.monotonic()
+        try:
+            with self._step(step):
+                result = self.driver.execute_async_script(script, *args, int(timeout * 1000))
+        except WebDriverException as e:
+            print(f"Scripted {step} failed, using WebDriver waits: {str(e)}")
+            return None
+        if result in SCRIPT_TIMED_OUT:
+            self.timeouts.observe_timeout(step, timeout)
+        elif result and result != 'no_button':
+            self.timeouts.observe(step, time.monotonic() - started)
+        return result
+
+    def _run_script(self, script, *args):
+        """execute_script for the scripted path; None when it could not run and the caller should fall back."""
+        try:
+            return self.driver.execute_script(script, *args)
+        except WebDriverException as e:
+            print(f"Scripted step failed, using WebDriver commands: {str(e)}")
+            return None
+
+    def ack_enabled(self):
+        return str(self.config.get('send_ack', 'true')).lower() in ('1', 'true', 'yes')
+
+    def _await_ack(self):
+        """
+        Wait for the new outgoing bubble to leave the clock state. Returns the tick state reached,
+        'pending' if it was still on the clock at the timeout, 'not_found' when no new bubble appeared,
+        or None when the script could not run (the caller then falls back to the old input-box check).
+        """
+        started = time.monotonic()
+        receipt = self._wait_scripted('confirm', AWAIT_ACK_JS, OUTGOING_ROW_XPATH, MESSAGE_STATUS_ICON_XPATH)
+        if receipt in (None, 'not_found'):
+            return receipt
+        SEND_ACK_SECONDS.observe(time.monotonic() - started, session=self.session_name, receipt=receipt)
+        return receipt
+
+    def pipelining_enabled(self):
+        return str(self.config.get('pipeline_sends', 'false')).lower() in ('1', 'true', 'yes')
+
+    def _pace(self, result, next_contact=None, next_attachment=None):
+        """Enforce the delay between messages (kept out of the latency numbers), pre-loading the next chat meanwhile."""
+        delay = int(self.config['delay_between_messages']) if result else 0
+        deadline = time.monotonic() + delay
+        if next_contact and self.pipelining_enabled() and self.driver:
+            self.prefetch(next_contact, next_attachment)
+        remaining = deadline - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def _spare_tab(self):
+        current = self.driver.current_window_handle
+        for handle in self.driver.window_handles:
+            if handle != current:
+                return handle
+        self.driver.switch_to.new_window('tab')
+        handle = self.driver.current_window_handle
+        self.driver.switch_to.window(current)
+        return handle
+
+    def prefetch(self, contact, attachment_path=None):
+        """
+        Open the next recipient's chat in the spare tab: wait for it to load, run the invalid-number
+        check and stage the attachment upload, so the next send starts from a ready chat.
+        """
+        self._prefetched = None
+        current = self.driver.current_window_handle
+        try:
+            handle = self._spare_tab()
+            self.driver.switch_to.window(handle)
+            state = {'contact': contact, 'handle': handle, 'loaded': False, 'invalid': False, 'staged': None}
+            # work for the next recipient: a root span of the trace, not part of this recipient's send
+            with detached(), self._step('prefetch'):
+                self.driver.get(f'https://web.whatsapp.com/send?phone={contact}')
+                try:
+                    self._wait('chat_load', EC.any_of(
+                        EC.presence_of_element_located((By.XPATH, CHAT_INPUT_BOX_XPATH)),
+                        EC.presence_of_element_located((By.XPATH, CHAT_INVALID_NUMBER_XPATH))
+                    ))
+                    state['loaded'] = True
+                except TimeoutException:
+                    pass
+                state['invalid'] = bool(self.driver.find_elements(By.XPATH, CHAT_INVALID_NUMBER_XPATH))
+                if state['loaded'] and not state['invalid'] and attachment_path:
+                    if self._stage_attachment(attachment_path):
+                        state['staged'] = attachment_path
+            self._prefetched = state
+        except Exception as e:
+            print(f"Prefetch of {contact} failed, it will load normally: {str(e)}")
+        finally:
+            try:
+                self.driver.switch_to.window(current)
+            except Exception:
+                pass
+
+    def _take_prefetched(self, contact):
+        prefetched, self._prefetched = self._prefetched, None
+        if prefetched and prefetched['contact'] == contact:
+            return prefetched
+        return None
+
+    def _send_message(self, contact, message, attachment_path=None):
         if not self.driver:
             print("WebDriver not initialized")
-            return False
+            return SendResult(SendOutcome.SESSION_LOST, 'WebDriver not initialized')
             
         print(f"Attempting to send message to {contact}...")
         try:
-            print(f"Opening chat with {contact}...")
-            self.driver.get(f'https://web.whatsapp.com/send?phone={contact}')
-            wait = WebDriverWait(self.driver, self.config['chat_load_timeout'])
-            try:
-                WebDriverWait(self.driver, 15).until(EC.any_of(
-                    EC.presence_of_element_located((By.XPATH, CHAT_INPUT_BOX_XPATH)),
-                    EC.presence_of_element_located((By.XPATH, CHAT_INVALID_NUMBER_XPATH))
-                ))
-            except TimeoutException:
-                print("Chat loading timed out, proceeding anyway")
-            invalid_number = self.driver.find_elements(By.XPATH, CHAT_INVALID_NUMBER_XPATH)
-            if invalid_number:
+            prefetched = self._take_prefetched(contact)
+            if prefetched:
+                print(f"Using pre-loaded chat with {contact}...")
+                self.driver.switch_to.window(prefetched['handle'])
+                if prefetched['invalid']:
+                    print(f"Error: {contact} is not registered on WhatsApp")
+                    return SendResult(SendOutcome.INVALID_NUMBER, 'Number is not on WhatsApp')
+            else:
+                print(f"Opening chat with {contact}...")
+                with self._step('navigate'):
+                    self.driver.get(f'https://web.whatsapp.com/send?phone={contact}')
+            # one in-page wait covers chat load, the invalid-number check and the input box
+            state = None
+            if self.scripted_enabled():
+                state = self._wait_scripted('open_chat', OPEN_CHAT_JS, CHAT_INPUT_BOX_XPATH, CHAT_INVALID_NUMBER_XPATH,
+                                            OUTGOING_ROW_XPATH)
+            if state == 'invalid':
                 print(f"Error: {contact} is not registered on WhatsApp")
-                return False
-            try:
-                input_box = wait.until(EC.element_to_be_clickable(
-                    (By.XPATH, CHAT_INPUT_BOX_XPATH)
-                ))
-            except TimeoutException:
+                return SendResult(SendOutcome.INVALID_NUMBER, 'Number is not on WhatsApp')
+            if state == 'timeout':
                 print("Error: Could not find message input area")
-                return False
+                return SendResult(SendOutcome.LOAD_TIMEOUT, 'Chat did not load')
+            if state is None:
+                if not (prefetched and prefetched['loaded']):
+                    try:
+                        self._wait('chat_load', EC.any_of(
+                            EC.presence_of_element_located((By.XPATH, CHAT_INPUT_BOX_XPATH)),
+                            EC.presence_of_element_located((By.XPATH, CHAT_INVALID_NUMBER_XPATH))
+                        ))
+                    except TimeoutException:
+                        print("Chat loading timed out, proceeding anyway")
+                with self._step('invalid_check'):
+                    invalid_number = self.driver.find_elements(By.XPATH, CHAT_INVALID_NUMBER_XPATH)
+                if invalid_number:
+                    print(f"Error: {contact} is not registered on WhatsApp")
+                    return SendResult(SendOutcome.INVALID_NUMBER, 'Number is not on WhatsApp')
+                try:
+                    input_box = self._wait('input_box', EC.element_to_be_clickable(
+                        (By.XPATH, CHAT_INPUT_BOX_XPATH)
+                    ))
+                except TimeoutException:
+                    print("Error: Could not find message input area")
+                    return SendResult(SendOutcome.LOAD_TIMEOUT, 'Chat did not load')
+                if self.ack_enabled():
+                    self._run_script(MARK_OUTGOING_JS, OUTGOING_ROW_XPATH)
             if attachment_path:
-                if not self._send_attachment(attachment_path, message):
-                    return False
+                staged = bool(prefetched) and prefetched['staged'] == attachment_path
+                with self._step('attach'):
+                    result = self._send_attachment(attachment_path, message, staged=staged)
+                if not result:
+                    return result
             elif message:
-                if not self._send_text_message(message):
-                    return False
+                with self._step('paste'):
+                    result = self._send_text_message(message)
+                if not result:
+                    return result
+            receipt = self._await_ack() if self.ack_enabled() else None
+            if receipt in ('sent', 'delivered', 'read'):
+                print(f"✓ Message sent successfully to {contact} ({receipt})")
+                return SendResult(SendOutcome.SENT, receipt=receipt)
+            if receipt == 'pending':
+                print(f"Warning: message to {contact} is still waiting for the server (clock)")
+                return SendResult(SendOutcome.SENT, receipt=receipt)
+            if receipt == 'not_found':
+                print(f"Error: no outgoing message to {contact} showed up")
+                return SendResult(SendOutcome.ERROR, 'Unconfirmed: no outgoing message appeared')
             try:
-                WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_element_located((By.XPATH, CHAT_INPUT_BOX_XPATH))
-                )
+                self._wait('confirm', EC.presence_of_element_located((By.XPATH, CHAT_INPUT_BOX_XPATH)))
                 print(f"✓ Message sent successfully to {contact}")
-                return True
+                return SendResult(SendOutcome.SENT)
             except TimeoutException:
-                print("Warning: Message send confirmation not detected")
-                return True
+                print("Error: Message send confirmation not detected")
+                return SendResult(SendOutcome.ERROR, 'Unconfirmed: send confirmation not detected')
 
         except Exception as e:
             print(f"Critical error sending to {contact}: {str(e)}")
-            return False
+            return SendResult(classify_exception(e), str(e))
         
-    def _send_attachment(self, file_path, caption):
+    def harvest_receipts(self, should_stop=None, pages_per_call=5, pause=1.0, max_calls=200):
+        """
+        Read the tick state of every chat's last message off the chat list, a few screens per call,
+        without opening any chat. Yields lists of (chat title, 'sent'|'delivered'|'read'); stops at
+        the end of the list or as soon as should_stop() returns True, pausing between calls.
+        """
         if not self.driver:
-            print("WebDriver not initialized")
-            return False
-        try:
-            clip_btn = WebDriverWait(self.driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, ATTACH_BUTTON_XPATH))
+            return
+        self._prefetched = None
+        if not self.get_connection_status():
+            self.driver.get('https://web.whatsapp.com')
+            WebDriverWait(self.driver, self.timeouts.ceiling('open_chat')).until(
+                EC.presence_of_element_located((By.XPATH, PANE_SIDE_XPATH))
             )
-            clip_btn.click()
+        for call in range(max_calls):
+            if should_stop and should_stop():
+                return
+            batch = self.driver.execute_async_script(
+                HARVEST_RECEIPTS_JS, PANE_SIDE_XPATH, CHAT_LIST_ROW_XPATH, CHAT_LIST_TITLE_XPATH,
+                CHAT_LIST_TICK_XPATH, pages_per_call, 300, call == 0
+            )
+            if not batch:
+                return
+            yield [tuple(row) for row in batch['rows']]
+            if batch['atEnd']:
+                return
+            time.sleep(pause)
 
-            ext = os.path.splitext(file_path)[1].lower()
-            if ext in ('.jpg', '.jpeg', '.png', '.gif', '.mp4'):
-                file_input = self.driver.find_element(By.XPATH, MEDIA_INPUT_XPATH)
-            else:
-                file_input = self.driver.find_element(By.XPATH, FILE_INPUT_XPATH)
-                
-            file_input.send_keys(os.path.abspath(file_path))
+    def forward_batch_size(self):
+        # WhatsApp Web forwards one message to at most 5 chats at a time
+        return max(1, min(int(self.config.get('forward_batch_size', 5)), 5))
+
+    def _seed_xpath(self):
+        return f'//div[@id="main"]//div[@data-id="{self._forward_seed[1]}"]'
+
+    def _open_forward_seed(self, key, message, attachment_path=None):
+        """
+        Make sure the self chat is open with this campaign's message in it, sending it there first if
+        needed (so a shared attachment is uploaded once per campaign). Returns the seed row XPath or None.
+        """
+        self_phone = ''.join(ch for ch in str(self.config.get('self_chat_phone', '')) if ch.isdigit())
+        if not self_phone:
+            print("Broadcast mode needs SELF_CHAT_PHONE, sending directly instead")
+            return None
+        if self._forward_seed and self._forward_seed[0] == key:
+            if self.driver.find_elements(By.XPATH, self._seed_xpath()):
+                return self._seed_xpath()
+            with self._step('navigate'):
+                self.driver.get(f'https://web.whatsapp.com/send?phone={self_phone}')
             try:
-                WebDriverWait(self.driver, self.config['upload_timeout']).until(
-                    EC.presence_of_element_located((By.XPATH, SEND_BUTTON_XPATH))
-                )
+                self._wait('seed_load', EC.presence_of_element_located((By.XPATH, self._seed_xpath())))
+                return self._seed_xpath()
             except TimeoutException:
-                print("Error: Attachment upload took too long")
-                self.driver.find_element(By.XPATH,CLOSE_BUTTON_XPATH).click()
-                print("Attachment upload cancelled")
-                return False
+                pass  # no longer in view, seed it again
+
+        self._forward_seed = None
+        result = self._send_message(self_phone, message, attachment_path)
+        if not result:
+            print(f"Could not send the broadcast message to the self chat: {result.outcome}")
+            return None
+        seed_id = self._run_script(LAST_OUTGOING_ID_JS, OUTGOING_ROW_XPATH)
+        if not seed_id:
+            return None
+        self._forward_seed = (key, seed_id)
+        return self._seed_xpath()
+
+    def _dismiss(self):
+        ActionChains(self.driver).send_keys(Keys.ESCAPE).perform()
+
+    def forward_message(self, key, message, attachment_path, contacts):
+        """
+        Broadcast mode: forward the campaign's message, sent once to the self chat, to a batch of
+        contacts through the forward dialog. Returns {contact: SendResult}; contacts left out could not
+        be picked in the dialog (e.g. numbers that are not saved contacts) and should be sent directly.
+        """
+        if not self.driver:
+            return {}
+        picked = []
+        sending = False
+        try:
+            seed_xpath = self._open_forward_seed(key, message, attachment_path)
+            if not seed_xpath:
+                return {}
+            with self._step('forward_open'):
+                # the message menu only renders while the bubble is hovered
+                ActionChains(self.driver).move_to_element(self.driver.find_element(By.XPATH, seed_xpath)).perform()
+                failed_step = self.driver.execute_async_script(
+                    CLICK_SEQUENCE_JS,
+                    [seed_xpath + FORWARD_MESSAGE_MENU_XPATH, FORWARD_MENU_ITEM_XPATH, FORWARD_BUTTON_XPATH],
+                    5000
+                )
+            if failed_step != -1:
+                print("Could not open the forward dialog, sending directly instead")
+                self._dismiss()
+                return {}
+
+            for contact in contacts:
+                with self._step('forward_pick'):
+                    state = self.driver.execute_async_script(
+                        SELECT_FORWARD_TARGET_JS, FORWARD_SEARCH_XPATH, FORWARD_RESULT_XPATH,
+                        FORWARD_NO_RESULT_XPATH, contact, 5000
+                    )
+                if state == 'selected':
+                    picked.append(contact)
+            if not picked:
+                self._dismiss()
+                return {}
+
+            sending = True
+            with self._step('forward_send'):
+                clicked = self.driver.execute_async_script(CLICK_SEQUENCE_JS, [FORWARD_SEND_BUTTON_XPATH], 5000) == -1
+                closed = clicked and self.driver.execute_async_script(
+                    WAIT_FOR_XPATH_JS, FORWARD_DIALOG_XPATH, False, 10000
+                )
+            if closed:
+                print(f"✓ Forwarded to {len(picked)} contact(s)")
+                results = {contact: SendResult(SendOutcome.SENT) for contact in picked}
+            else:
+                self._dismiss()
+                results = {contact: SendResult(SendOutcome.ERROR, 'Forward dialog did not send') for contact in picked}
+        except Exception as e:
+            print(f"Forward failed: {str(e)}")
+            if not sending:
+                return {}
+            # the send may or may not have gone out; don't fall back to a direct send
+            results = {contact: SendResult(classify_exception(e), f"Forward error: {str(e)}") for contact in picked}
+        for result in results.values():
+            SENDS_TOTAL.inc(session=self.session_name, outcome=result.outcome)
+        return results
+
+    def _stage_attachment(self, file_path):
+        """Open the attach menu and upload the file until the preview's send button shows up."""
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext in ('.jpg', '.jpeg', '.png', '.gif', '.mp4'):
+            input_xpath = MEDIA_INPUT_XPATH
+        else:
+            input_xpath = FILE_INPUT_XPATH
+
+        scripted = self.scripted_enabled()
+        file_input = None
+        if scripted:
+            file_input = self._wait_scripted('attach_button', OPEN_ATTACH_MENU_JS, ATTACH_BUTTON_XPATH, input_xpath)
+        if file_input is None or file_input == 'no_button':
+            clip_btn = self._wait('attach_button', EC.element_to_be_clickable((By.XPATH, ATTACH_BUTTON_XPATH)))
+            clip_btn.click()
+            file_input = self.driver.find_element(By.XPATH, input_xpath)
+        elif file_input == 'no_input':
+            # the menu is already open; clicking the button again would close it
+            file_input = self.driver.find_element(By.XPATH, input_xpath)
             
-            if ext in ('.jpg', '.jpeg', '.png', '.gif', '.mp4','.pdf', '.doc', '.docx', '.xls', '.xlsx', '.txt') and caption:
+        file_input.send_keys(os.path.abspath(file_path))
+        try:
+            uploaded = None
+            if scripted:
+                uploaded = self._wait_scripted('upload', WAIT_FOR_XPATH_JS, SEND_BUTTON_XPATH, True)
+            if uploaded is None:
+                self._wait('upload', EC.presence_of_element_located((By.XPATH, SEND_BUTTON_XPATH)))
+            elif not uploaded:
+                raise TimeoutException('Attachment upload took too long')
+        except TimeoutException:
+            print("Error: Attachment upload took too long")
+            self.driver.find_element(By.XPATH,CLOSE_BUTTON_XPATH).click()
+            print("Attachment upload cancelled")
+            return SendResult(SendOutcome.UPLOAD_TIMEOUT, 'Attachment upload took too long')
+        return SendResult(SendOutcome.SENT)
+
+    def _send_attachment(self, file_path, caption, staged=False):
+        if not self.driver:
+            print("WebDriver not initialized")
+            return SendResult(SendOutcome.SESSION_LOST, 'WebDriver not initialized')
+        try:
+            ext = os.path.splitext(file_path)[1].lower()
+            if not staged:
+                result = self._stage_attachment(file_path)
+                if not result:
+                    return result
+            
+            with_caption = ext in ('.jpg', '.jpeg', '.png', '.gif', '.mp4','.pdf', '.doc', '.docx', '.xls', '.xlsx', '.txt') and caption
+            if self.scripted_enabled():
+                # caption and send click in one round-trip
+                status = self._run_script(INSERT_AND_SEND_JS, CAPTION_BOX_XPATH, SEND_BUTTON_XPATH,
+                                          caption if with_caption else '')
+                if status == 'sent':
+                    return SendResult(SendOutcome.SENT)
+                if status == 'no_send_button':
+                    with_caption = False  # already typed, only the click is left
+
+            if with_caption:
                 try:
                     caption_box = self.driver.find_element(By.XPATH, CAPTION_BOX_XPATH)
-                    pyperclip.copy(caption)
-                    caption_box.click()
-                    caption_box.send_keys(Keys.CONTROL + "v")
+                    self._insert_text(caption_box, caption)
 
                 except Exception as e:
                     print(f"Warning: Could not add caption, sending without it. Error: {str(e)}")
@@ -316,13 +678,12 @@ class WhatsAppBulkSender:
             
             send_btn = self.driver.find_element(By.XPATH, SEND_BUTTON_XPATH)
             send_btn.click()
-            time.sleep(int(self.config['delay_between_messages']))
-            return True
+            return SendResult(SendOutcome.SENT)
 
         except Exception as e:
             print("Attachment sending failed")
             print(f"Attachment error: {str(e)}")
-            return False
+            return SendResult(classify_exception(e), f"Attachment error: {str(e)}")
 
 
     #PREVIOS DOCUMENT ATTACHMENT CODE
@@ -400,79 +761,61 @@ class WhatsAppBulkSender:
             print(f"Text sending error: {str(e)}")
             return False'''
     
+    def _insert_text(self, element, text):
+        """
+        Type text into a contenteditable box through the browser itself (no OS clipboard),
+        so several sessions can run side by side and on headless servers.
+        Emoji are inserted as-is; newlines become Shift+Enter line breaks.
+        """
+        element.click()
+        lines = text.split('\n')
+        for i, line in enumerate(lines):
+            if i > 0:
+                element.send_keys(Keys.SHIFT + Keys.ENTER)
+            if not line:
+                continue
+            try:
+                # Chromium: CDP insertText behaves like an IME commit and keeps non-BMP characters
+                self.driver.execute_cdp_cmd('Input.insertText', {'text': line})
+            except Exception:
+                # Other drivers: scripted insert on the focused element fires the editor's input events
+                self.driver.execute_script(
+                    "arguments[0].focus(); document.execCommand('insertText', false, arguments[1]);",
+                    element, line
+                )
+
     def _send_text_message(self, message):
         if not self.driver:
             print("WebDriver not initialized")
-            return False
+            return SendResult(SendOutcome.SESSION_LOST, 'WebDriver not initialized')
         try:
-            pyperclip.copy(message)
+            if self.scripted_enabled():
+                # type and click send in one round-trip
+                status = self._run_script(INSERT_AND_SEND_JS, CHAT_INPUT_BOX_XPATH, CHAT_SEND_BUTTON_XPATH, message)
+                if status == 'sent':
+                    return SendResult(SendOutcome.SENT)
+                if status == 'no_send_button':
+                    # text is in the box, Enter sends it
+                    ActionChains(self.driver).send_keys(Keys.ENTER).perform()
+                    return SendResult(SendOutcome.SENT)
             text_box = self.driver.find_element(By.XPATH, CHAT_INPUT_BOX_XPATH)
-            text_box.send_keys(Keys.CONTROL + "v")
+            self._insert_text(text_box, message)
             text_box.send_keys(Keys.ENTER)
-            time.sleep(int(self.config['delay_between_messages']))
-            return True
+            return SendResult(SendOutcome.SENT)
         except Exception as e:
             print(f"Text sending error: {str(e)}")
-            return False
-
-    def process_recipients(self, recipients, attachment_path=None):
-        self.stats['start_time'] = datetime.now()
-        print("\nStarting to process recipients...")
-
-        for i, row in recipients.iterrows():
-            contact = row['Contact']
-            message = row['Message']
-            print(f"\nProcessing recipient {i+1}/{len(recipients)}: {contact}")
-
-            success = False
-            for attempt in range(self.config['max_retries']):
-                try:
-                    if self.send_message(contact, message, attachment_path):
-                        success = True
-                        self.stats['success'] += 1
-                        break
-                except Exception as e:
-                    time.sleep(2)
-
-            if not success:
-                self.stats['failures'] += 1
-
-            time.sleep(self.config['delay_between_messages'])
-
-        self.stats['end_time'] = datetime.now()
-        self._generate_report()
-
-    def _generate_report(self):
-        duration = self.stats['end_time'] - self.stats['start_time']
-        report = (
-            "\n=== WhatsApp Bulk Sender Report ==="
-            f"\nStart Time: {self.stats['start_time']}"
-            f"\nEnd Time: {self.stats['end_time']}"
-            f"\nDuration: {duration}"
-            f"\nContacts Processed: {self.stats['success'] + self.stats['failures']}"
-            f"\nSuccessful: {self.stats['success']}"
-            f"\nFailed: {self.stats['failures']}"
-            "\n==================================="
-        )
-        print(report)
-
-    def run(self):
-        try:
-            print("=== WhatsApp Bulk Sender ===")
-            excel_path = input("Enter path to Excel file: ").strip()
-            attachment_path = input("Enter attachment path (optional): ").strip() or None
+            return SendResult(classify_exception(e), f"Text sending error: {str(e)}")
 
-            if attachment_path and not os.path.exists(attachment_path):
-                print(f"File not found: {attachment_path}")
-                return
-
-            self.initialize_driver()
-            self.login_to_whatsapp()
-            recipients = self.load_recipient_data(excel_path)
-            self.process_recipients(recipients, attachment_path)
-        except Exception as e:
-            print(f"Critical error: {str(e)}")
-        finally:
-            if self.driver:
-                self.driver.quit()
-                print("WebDriver closed. Exiting.")
+    def run(self, recipients_path, message='', attachment_path=None, results_path=None):
+        """
+        Send `message` (a template) to every recipient in a file with this session, recording results
+        as JSONL. Non-interactive; `whatsflow-send` (whatsapp_sender.cli) runs the same over several sessions.
+        """
+        from .cli import run_batch
+
+        if attachment_path and not os.path.exists(attachment_path):
+            raise FileNotFoundError(attachment_path)
+        print("=== WhatsApp Bulk Sender ===")
+        summary = run_batch(recipients_path, [self], message, attachment_path, results_path)
+        print(f"Finished: {summary}")
+        return summary
@@ -0,0 +1,136 @@
+import json
+from string import Formatter
+
+# Placeholders are plain str.format style fields, e.g. "Hi {name}, your order {order_id} is ready".
+# Field names are matched case-insensitively against the recipient context; a field the context
+# does not have at all is left in the message as written.
+
+RENDER_BATCH_SIZE = 500
+RENDER_CACHE_SIZE = 10000
+_MISSING = object()
+
+
+class MessageTemplate:
+    """A campaign message compiled once and rendered per recipient."""
+
+    def __init__(self, source):
+        self.source = source or ''
+        self.parts = []
+        self.fields = ()
+        self._cache = {}
+        self._compile()
+
+    def _compile(self):
+        try:
+            parsed = list(Formatter().parse(self.source))
+        except ValueError:
+            # Unbalanced braces - treat the whole message as literal text
+            parsed = [(self.source, None, None, None)]
+
+        fields = []
+        for literal, field, spec, conversion in parsed:
+            if literal:
+                self.parts.append((literal, None, None))
+            if field is None:
+                continue
+            key = field.strip().lower()
+            if not key:
+                # "{}" has nothing to look up, keep it as written
+                self.parts.append(('{}', None, None))
+                continue
+            written = '{' + field + (f'!{conversion}' if conversion else '') + (f':{spec}' if spec else '') + '}'
+            self.parts.append((written, key, spec or None))
+            if key not in fields:
+                fields.append(key)
+        self.fields = tuple(fields)
+        self.constant = ''.join(p[0] for p in self.parts if p[1] is None)
+
+    @property
+    def is_static(self):
+        """True when the template has no placeholders to fill."""
+        return not self.fields
+
+    def _render_values(self, values):
+        lookup = dict(zip(self.fields, values))
+        out = []
+        for literal, key, spec in self.parts:
+            if key is None:
+                out.append(literal)
+                continue
+            value = lookup.get(key)
+            if value is _MISSING:
+                out.append(literal)
+                continue
+            if value is None:
+                continue
+            if spec:
+                try:
+                    out.append(format(value, spec))
+                    continue
+                except (TypeError, ValueError):
+                    pass
+            out.append(str(value))
+        return ''.join(out)
+
+    def render(self, context):
+        """Render the template for a single recipient context (dict)."""
+        if self.is_static:
+            return self.constant
+        values = tuple(_lookup(context, key) for key in self.fields)
+        cached = self._cache.get(values)
+        if cached is not None:
+            return cached
+        rendered = self._render_values(values)
+        if len(self._cache) >= RENDER_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[values] = rendered
+        return rendered
+
+    def render_many(self, contexts):
+        """Render a batch of recipient contexts, returning a list of messages."""
+        if self.is_static:
+            return [self.constant for _ in contexts]
+        return [self.render(ctx) for ctx in contexts]
+
+
+def _lookup(context, key):
+    value = context.get(key, _MISSING)
+    if value is None or value is _MISSING:
+        return value
+    # Keep cache keys hashable and stable
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True)
+    return value
+
+
+def build_context(name=None, phone=None, email=None, status=None, custom_fields=None):
+    """Build a lower-cased placeholder context for one recipient."""
+    context = {}
+    if custom_fields:
+        if isinstance(custom_fields, str):
+            try:
+                custom_fields = json.loads(custom_fields)
+            except ValueError:
+                custom_fields = {}
+        for key, value in (custom_fields or {}).items():
+            context[str(key).strip().lower()] = value
+    context.update({
+        'name': name or '',
+        'first_name': (name or '').split(' ')[0],
+        'phone': phone or '',
+        'email': email or '',
+        'status': status or '',
+    })
+    return context
+
+
+def render_in_batches(template, contexts, batch_size=RENDER_BATCH_SIZE):
+    """Yield rendered messages for an iterable of contexts, batch_size at a time."""
+    batch = []
+    for ctx in contexts:
+        batch.append(ctx)
+        if len(batch) >= batch_size:
+            yield from template.render_many(batch)
+            batch = []
+    if batch:
+        yield from template.render_many(batch)
@@ -0,0 +1,88 @@
+import threading
+from collections import deque
+
+from .metrics import WAIT_TIMEOUT_SECONDS
+
+
+# Wait steps of the send pipeline that have a configured ceiling
+WAIT_STEPS = ('chat_load', 'open_chat', 'input_box', 'attach_button', 'upload', 'confirm')
+
+
+def _enabled(value):
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+class TimeoutController:
+    """
+    Learns how long each WebDriver wait normally takes for one session and sizes the timeout to
+    a safety multiple of the rolling p95, clamped between the configured floor and ceiling.
+
+    Until enough samples are in, the configured (ceiling) timeout is used unchanged. A wait that
+    times out is recorded as a sample at the limit it hit (it took at least that long), so a slower
+    network widens the timeout again; after a run of consecutive timeouts the ceiling is used until
+    the next successful wait.
+    """
+
+    def __init__(self, config, session_name='default', window=200, min_samples=20):
+        self.config = config
+        self.session_name = session_name
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._misses = {}
+        self._window = window
+
+    def ceiling(self, step):
+        """Configured upper bound for a wait step, in seconds."""
+        defaults = {
+            'chat_load': self.config.get('chat_load_wait_timeout', 15),
+            'open_chat': self.config.get('chat_load_timeout', 50),
+            'input_box': self.config.get('chat_load_timeout', 50),
+            'attach_button': self.config.get('attach_button_timeout', 10),
+            'upload': self.config.get('upload_timeout', 60),
+            'confirm': self.config.get('confirm_timeout', 10),
+        }
+        return float(defaults.get(step, 10))
+
+    def max_ceiling(self):
+        """Longest configured wait of any step (in-page scripts must be allowed to run this long)."""
+        return max(self.ceiling(step) for step in WAIT_STEPS)
+
+    def observe(self, step, seconds):
+        """Record how long a successful wait took."""
+        with self._lock:
+            self._append(step, seconds)
+            self._misses[step] = 0
+
+    def observe_timeout(self, step, limit):
+        """Record a wait that gave up after `limit` seconds, as a (censored) sample at that limit."""
+        with self._lock:
+            self._append(step, limit)
+            self._misses[step] = self._misses.get(step, 0) + 1
+
+    def _append(self, step, seconds):
+        samples = self._samples.get(step)
+        if samples is None:
+            samples = self._samples[step] = deque(maxlen=self._window)
+        samples.append(seconds)
+
+    def p95(self, step):
+        with self._lock:
+            samples = sorted(self._samples.get(step, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def timeout_for(self, step):
+        ceiling = self.ceiling(step)
+        timeout = ceiling
+        if _enabled(self.config.get('adaptive_timeouts', 'true')):
+            p95 = self.p95(step)
+            with self._lock:
+                misses = self._misses.get(step, 0)
+            if p95 is not None and misses < int(self.config.get('timeout_misses_to_ceiling', 3)):
+                floor = min(float(self.config.get('min_wait_timeout', 2)), ceiling)
+                multiple = float(self.config.get('timeout_safety_multiple', 3))
+                timeout = min(max(p95 * multiple, floor), ceiling)
+        WAIT_TIMEOUT_SECONDS.set(round(timeout, 2), step=step, session=self.session_name)
+        return timeout
@@ -0,0 +1,242 @@
+"""
+Per-recipient span tracing of the send pipeline.
+
+Off unless TRACE_SENDS is set. Each recipient becomes one compact JSON line in traces/campaign_<id>.jsonl holding its nested spans
+(steps, waits and every WebDriver round-trip), aggregated by span path. Profile a finished run with:
+
+    python -m whatsapp_sender.tracing traces/campaign_12.jsonl [--top 20] [--collapsed]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from .config import CONFIG
+
+_local = threading.local()
+
+
+def tracing_enabled(config=None):
+    return str((config or CONFIG).get('trace_sends', 'false')).lower() in ('1', 'true', 'yes')
+
+
+class RecipientTrace:
+    """Spans collected for one recipient, keyed by path ("send;attach;upload")."""
+
+    def __init__(self, recipient, attempt=1):
+        self.recipient = recipient
+        self.attempt = attempt
+        self.outcome = None
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self._stack = []
+        self.spans = {}
+
+    def to_record(self, campaign_id):
+        return {
+            'campaign': campaign_id,
+            'recipient': self.recipient,
+            'attempt': self.attempt,
+            'start': round(self.start, 3),
+            'ms': round((time.perf_counter() - self._t0) * 1000, 1),
+            'outcome': self.outcome,
+            # [path, first start offset ms, total ms, calls]
+            'spans': [[path] + stats for path, stats in self.spans.items()],
+        }
+
+
+@contextmanager
+def span(name):
+    """Time a block as a child of the current span; a no-op when no recipient trace is active."""
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        yield
+        return
+    trace._stack.append(name)
+    path = ';'.join(trace._stack)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        stats = trace.spans.get(path)
+        if stats is None:
+            trace.spans[path] = [round((started - trace._t0) * 1000, 1), round(elapsed, 1), 1]
+        else:
+            stats[1] = round(stats[1] + elapsed, 1)
+            stats[2] += 1
+        trace._stack.pop()
+
+
+@contextmanager
+def detached():
+    """
+    Run a block outside the open spans: spans inside it are recorded from the root of the current
+    trace (e.g. pre-loading the next recipient while this one is paced).
+    """
+    trace = getattr(_local, 'trace', None)
+    if trace is None:
+        yield
+        return
+    stack, trace._stack = trace._stack, []
+    try:
+        yield
+    finally:
+        trace._stack = stack
+
+
+def traced_execute(execute):
+    """Wrap WebDriver.execute so every chromedriver round-trip shows up as a wd:<command> span."""
+    def wrapper(driver_command, params=None):
+        if getattr(_local, 'trace', None) is None:
+            return execute(driver_command, params)
+        with span(f'wd:{driver_command}'):
+            return execute(driver_command, params)
+    return wrapper
+
+
+class Tracer:
+    """Writes one JSON line per traced recipient to a per-campaign file."""
+
+    def __init__(self, campaign_id, path=None):
+        self.campaign_id = campaign_id
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self._file = open(path, 'a', encoding='utf-8')
+
+    @classmethod
+    def for_campaign(cls, campaign_id):
+        if not tracing_enabled():
+            return cls(campaign_id)
+        return cls(campaign_id, os.path.join(CONFIG.get('trace_dir', 'traces'), f'campaign_{campaign_id}.jsonl'))
+
+    @contextmanager
+    def recipient(self, recipient, attempt=1):
+        trace = RecipientTrace(recipient, attempt)
+        if self._file is None:
+            yield trace
+            return
+        _local.trace = trace
+        try:
+            with span('send'):
+                yield trace
+        finally:
+            _local.trace = None
+            line = json.dumps(trace.to_record(self.campaign_id), separators=(',', ':'), ensure_ascii=False)
+            with self._lock:
+                if self._file is not None:
+                    self._file.write(line + '\n')
+                    self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+# --- Offline report ---
+
+def load_traces(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def build_profile(records):
+    """Aggregate span totals by path plus per-recipient totals."""
+    totals = {}
+    recipients = []
+    outcomes = {}
+    for record in records:
+        recipients.append(record)
+        outcomes[record.get('outcome')] = outcomes.get(record.get('outcome'), 0) + 1
+        for path, _start, ms, calls in record['spans']:
+            agg = totals.setdefault(path, [0.0, 0])
+            agg[0] += ms
+            agg[1] += calls
+    # self time = total minus direct children
+    self_ms = {path: agg[0] for path, agg in totals.items()}
+    for path, agg in totals.items():
+        parent = path.rpartition(';')[0]
+        if parent in self_ms:
+            self_ms[parent] -= agg[0]
+    return totals, self_ms, recipients, outcomes
+
+
+def print_report(path, top=20, out=sys.stdout):
+    totals, self_ms, recipients, outcomes = build_profile(load_traces(path))
+    durations = [r['ms'] for r in recipients]
+    root_total = sum(durations) or 1.0
+
+    out.write(f"Trace: {path}\n")
+    out.write(f"Recipients: {len(recipients)}  Outcomes: {outcomes}\n")
+    out.write(
+        f"Per recipient ms: p50={_percentile(durations, 50):.0f} p95={_percentile(durations, 95):.0f} "
+        f"max={max(durations) if durations else 0:.0f}\n\n"
+    )
+
+    out.write(f"{'span':<48} {'total s':>9} {'%':>6} {'calls':>8} {'avg ms':>8} {'self s':>8}\n")
+
+    def children(parent):
+        prefix = parent + ';' if parent else ''
+        depth = parent.count(';') + 1 if parent else 0
+        kids = [p for p in totals if p.startswith(prefix) and p.count(';') == depth]
+        return sorted(kids, key=lambda p: -totals[p][0])
+
+    def walk(parent, depth):
+        for p in children(parent):
+            total, calls = totals[p]
+            name = ('  ' * depth) + p.rpartition(';')[2]
+            out.write(
+                f"{name:<48} {total / 1000:>9.1f} {100 * total / root_total:>5.1f}% {calls:>8} "
+                f"{total / calls:>8.1f} {self_ms[p] / 1000:>8.1f}\n"
+            )
+            walk(p, depth + 1)
+
+    walk('', 0)
+
+    out.write(f"\nSlowest {top} recipients:\n")
+    for r in sorted(recipients, key=lambda r: -r['ms'])[:top]:
+        worst = max((s for s in r['spans'] if s[0] != 'send'), key=lambda s: s[2], default=None)
+        detail = f"{worst[0]} {worst[2]:.0f}ms" if worst else ''
+        out.write(f"  {r['recipient']:<18} {r['ms']:>9.0f}ms  {r.get('outcome') or '':<15} {detail}\n")
+
+
+def print_collapsed(path, out=sys.stdout):
+    """Self time per stack in the collapsed format read by flamegraph.pl / speedscope."""
+    _totals, self_ms, _recipients, _outcomes = build_profile(load_traces(path))
+    for stack, ms in sorted(self_ms.items()):
+        if ms > 0:
+            out.write(f"{stack} {int(ms)}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile report for a campaign send trace")
+    parser.add_argument('trace', help="Path to a campaign_<id>.jsonl trace file")
+    parser.add_argument('--top', type=int, default=20, help="Number of slowest recipients to list")
+    parser.add_argument('--collapsed', action='store_true', help="Emit collapsed stacks for flame graph tools")
+    args = parser.parse_args(argv)
+    if args.collapsed:
+        print_collapsed(args.trace)
+    else:
+        print_report(args.trace, top=args.top)
+
+
+if __name__ == '__main__':
+    main()
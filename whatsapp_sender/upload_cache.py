@@ -0,0 +1,133 @@
+import hashlib
+import os
+import threading
+import uuid
+
+import pandas as pd
+
+from .config import CONFIG
+
+
+class ParsedUploadCache:
+    """
+    Parsed recipient sheets stored as Parquet files named by the SHA-256 of the uploaded bytes, so a
+    workbook seen before loads without parsing Excel again. Least recently used files are evicted
+    once the directory grows past max_bytes (0 disables the cache).
+    """
+
+    SUFFIX = '.parquet'
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config.get('parse_cache_dir', os.path.join('uploads', 'parsed')),
+            float(config.get('parse_cache_mb', 256)) * 1024 * 1024,
+        )
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @staticmethod
+    def key_for(data):
+        return hashlib.sha256(data).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def get(self, key):
+        """The cached DataFrame for `key`, or None. A hit marks the entry as recently used."""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            df = pd.read_parquet(path)
+        except (OSError, ValueError, ImportError) as e:
+            print(f"Dropping unreadable parse cache entry {path}: {str(e)}")
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return df
+
+    def put(self, key, df):
+        """Store a DataFrame that has been through _normalise."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+        finally:
+            self._remove(tmp)
+        self._evict()
+
+    def load(self, data, parse):
+        """
+        DataFrame for the uploaded bytes `data`: from the cache, or parse() it and cache the result.
+        Either way it comes back normalised (see _normalise), so hits and misses look the same.
+        """
+        if not self.enabled:
+            return _normalise(parse())
+        key = self.key_for(data)
+        df = self.get(key)
+        if df is not None:
+            self.hits += 1
+            return df
+        self.misses += 1
+        df = _normalise(parse())
+        try:
+            self.put(key, df)
+        except (OSError, ValueError, TypeError, ImportError) as e:
+            # a sheet Parquet can't hold (or no Parquet engine) just isn't cached
+            print(f"Could not cache parsed upload: {str(e)}")
+        return df
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if not name.endswith(self.SUFFIX):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            # oldest first, always keeping the entry just written
+            for _, size, path in entries[:-1]:
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _normalise(df):
+    """Parquet needs string column names and one type per column: mixed text columns become str."""
+    df.columns = [str(c).strip() for c in df.columns]
+    for column in df.columns:
+        if df[column].dtype == object:
+            df[column] = df[column].map(lambda v: None if pd.isna(v) else str(v))
+    return df
+
+
+UPLOAD_CACHE = ParsedUploadCache.from_config(CONFIG)
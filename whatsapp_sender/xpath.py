@@ -7,6 +7,7 @@ XPATHS = {
     "chat": {
         "input_box": '//div[@role="textbox" and @contenteditable="true" and @aria-label="Type a message"]',
         "invalid_number": '//div[contains(text(), "not on WhatsApp")]',
+        "send_button": '//footer//*[@aria-label="Send"]',
     },
     "attachment": {
         "attach_button": '//button[@title="Attach" and @type="button"]',
@@ -15,6 +16,25 @@ XPATHS = {
         "send_button": "//div[@role='button' and @aria-label='Send']",
         "caption_box": '//div[@role="textbox" and @contenteditable="true" and @aria-label="Add a caption"]',
         "close_button": '//div[@role="button" and @aria-label="Close"]'
+    },
+    "message": {
+        "outgoing_row": '//div[@id="main"]//div[starts-with(@data-id, "true_")]',
+        "status_icon": './/span[starts-with(@data-icon, "msg-")]'
+    },
+    "chat_list": {
+        "row": '//div[@id="pane-side"]//div[@role="listitem" or @role="row"]',
+        "title": './/span[@title]',
+        "tick_icon": './/span[contains(@data-icon, "check") or contains(@data-icon, "time")]'
+    },
+    "forward": {
+        "message_menu": '//span[@data-icon="down-context"]',
+        "menu_item": '//li[@role="button"]//div[@aria-label="Forward"]',
+        "forward_button": '//div[@id="main"]//span[@data-icon="forward"]',
+        "dialog": '//div[@role="dialog"]',
+        "search_box": '//div[@role="dialog"]//div[@role="textbox" and @contenteditable="true"]',
+        "result": '//div[@role="dialog"]//div[@role="listitem"]//div[@role="checkbox"]',
+        "no_result": '//div[@role="dialog"]//*[contains(text(), "No results") or contains(text(), "No chats")]',
+        "send_button": '//div[@role="dialog"]//span[@data-icon="send"]'
     }
 }
 PANE_SIDE_ID = "pane-side"
@@ -23,10 +43,24 @@ QR_CODE_XPATH = XPATHS["login"]["qr_code"]
 PROGRESS_PAGE_XPATH = XPATHS["login"]["progress_page"]
 CHAT_INPUT_BOX_XPATH = XPATHS["chat"]["input_box"]
 CHAT_INVALID_NUMBER_XPATH = XPATHS["chat"]["invalid_number"]
+CHAT_SEND_BUTTON_XPATH = XPATHS["chat"]["send_button"]
 ATTACH_BUTTON_XPATH = XPATHS["attachment"]["attach_button"]
 FILE_INPUT_XPATH = XPATHS["attachment"]["file_input"]
 MEDIA_INPUT_XPATH = XPATHS["attachment"]["media_input"]
 SEND_BUTTON_XPATH = XPATHS["attachment"]["send_button"]
 CAPTION_BOX_XPATH = XPATHS["attachment"]["caption_box"]
 CLOSE_BUTTON_XPATH = XPATHS["attachment"]["close_button"]
+OUTGOING_ROW_XPATH = XPATHS["message"]["outgoing_row"]
+MESSAGE_STATUS_ICON_XPATH = XPATHS["message"]["status_icon"]
+CHAT_LIST_ROW_XPATH = XPATHS["chat_list"]["row"]
+CHAT_LIST_TITLE_XPATH = XPATHS["chat_list"]["title"]
+CHAT_LIST_TICK_XPATH = XPATHS["chat_list"]["tick_icon"]
+FORWARD_MESSAGE_MENU_XPATH = XPATHS["forward"]["message_menu"]
+FORWARD_MENU_ITEM_XPATH = XPATHS["forward"]["menu_item"]
+FORWARD_BUTTON_XPATH = XPATHS["forward"]["forward_button"]
+FORWARD_DIALOG_XPATH = XPATHS["forward"]["dialog"]
+FORWARD_SEARCH_XPATH = XPATHS["forward"]["search_box"]
+FORWARD_RESULT_XPATH = XPATHS["forward"]["result"]
+FORWARD_NO_RESULT_XPATH = XPATHS["forward"]["no_result"]
+FORWARD_SEND_BUTTON_XPATH = XPATHS["forward"]["send_button"]
 